@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Invitation, BusinessInquiry
+from django.utils.html import format_html, format_html_join
+from .models import Invitation, BusinessInquiry, ProfileReport, SlowQuery
 
 @admin.register(Invitation)
 class InvitationAdmin(admin.ModelAdmin):
@@ -48,3 +49,63 @@ class BusinessInquiryAdmin(admin.ModelAdmin):
             from django.utils import timezone
             obj.contacted_at = timezone.now()
         super().save_model(request, obj, form, change)
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ('path', 'url_name', 'status_code', 'total_ms', 'sql_count', 'sql_ms', 'template_ms', 'user', 'created_at')
+    list_filter = ('url_name', 'status_code', 'created_at')
+    search_fields = ('path', 'url_name')
+    ordering = ('-total_ms',)
+    readonly_fields = (
+        'created_at', 'user', 'method', 'path', 'url_name', 'status_code',
+        'total_ms', 'sql_count', 'sql_ms', 'template_ms', 'function_table', 'query_table',
+    )
+    fieldsets = (
+        ('Request', {
+            'fields': ('created_at', 'user', 'method', 'path', 'url_name', 'status_code')
+        }),
+        ('Timing', {
+            'fields': ('total_ms', 'sql_count', 'sql_ms', 'template_ms')
+        }),
+        ('Profile (by cumulative time)', {
+            'fields': ('function_table',)
+        }),
+        ('SQL', {
+            'fields': ('query_table',)
+        }),
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def function_table(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+            ((f['calls'], f['tottime_ms'], f['cumtime_ms'], f['function']) for f in obj.functions),
+        )
+        return format_html(
+            '<table><tr><th>calls</th><th>own ms</th><th>cumulative ms</th><th>function</th></tr>{}</table>', rows,
+        )
+    function_table.short_description = 'Functions'
+
+    def query_table(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+            ((q['ms'], q['origin'], q['sql']) for q in obj.queries),
+        )
+        return format_html('<table><tr><th>ms</th><th>origin</th><th>sql</th></tr>{}</table>', rows)
+    query_table.short_description = 'Queries'
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('fingerprint', 'origin', 'calls', 'total_ms', 'max_ms', 'full_scans', 'last_seen')
+    search_fields = ('sql', 'origin', 'full_scans')
+    readonly_fields = (
+        'fingerprint', 'sql', 'origin', 'params_count', 'calls', 'total_ms', 'max_ms',
+        'plan', 'full_scans', 'first_seen', 'last_seen',
+    )
+
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'home'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from petcrm import slowlog
+        connection_created.connect(slowlog.install, dispatch_uid='petcrm.slowlog')
@@ -0,0 +1,351 @@
+"""
+Synthetic multi-tenant data for load and performance testing.
+
+Rows are generated one business and one chunk of tutors at a time and written with
+bulk_create in fixed-size batches (the pet <-> tutor M2M through its through
+table), so memory stays bounded by --batch-size however large the dataset is.
+Everything is drawn from one random.Random(seed): the same arguments and --today
+produce the same data.
+
+  python manage.py generate_load_data --businesses 1000 --tutors 50 --pets 2 --days 30 --woofs-per-day 0.34
+  (about 100k pets, 1M woofs including replies)
+"""
+import random
+import threading
+import time as timer
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from pets.models import Business, Pet, Staff, Tutor
+from reservations.models import CheckIn, LiveOccupancy, PetAttendance, Service, ServiceBooking, ServiceSlot
+from reservations.schedule import SLOT_CONFIG
+from reservations.utils import rebuild_daily_occupancy
+from tutor.models import GlobalWoof, TimelineEntry, Woof
+
+SPECIES = [('Dog', ['Labrador', 'Beagle', 'Poodle', 'Border Collie', 'Mixed']), ('Cat', ['Siamese', 'Persian', 'Mixed'])]
+PET_NAMES = ['Max', 'Luna', 'Bella', 'Charlie', 'Milo', 'Nala', 'Rocky', 'Coco', 'Toby', 'Lola', 'Simba', 'Daisy']
+TUTOR_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eva', 'Filipe', 'Gabriela', 'Hugo', 'Ines', 'Joao']
+WOOF_MESSAGES = [
+    '{pet} had a great time at the park today! 🐾',
+    '{pet} ate all their lunch 🍖',
+    '{pet} made a new friend during playtime',
+    '{pet} is napping after a long walk 😴',
+    'Quick update: {pet} is doing great!',
+    '{pet} practised sit and stay today 🎾',
+]
+REPLY_MESSAGES = ['Thanks! ❤️', 'So happy to hear that!', 'Love it, thank you!', 'Great news 🐶']
+GLOBAL_MESSAGES = [
+    'Reminder: we close early on Friday',
+    'New grooming slots are open next week ✂️',
+    'Please bring a spare leash for the group walks',
+    'Thank you all for a fantastic month! 🎉',
+]
+# Fraction of pets shared by two tutors of the same chunk
+CO_OWNED = 0.1
+
+
+def batched(iterable, size):
+    """Consecutive lists of at most `size` items"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+_timestamps_lock = threading.Lock()
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Let bulk_create keep the created_at values we generate instead of auto_now_add.
+    This flips the model fields for the whole process, so it is only allowed on the
+    main thread of this command (`manage.py generate_load_data` runs nothing else),
+    never from a server thread or a test running concurrent requests.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        raise CommandError('generate_load_data rewrites auto_now_add fields: run it from the main thread')
+    with _timestamps_lock:
+        for field in fields:
+            field.auto_now_add = False
+        try:
+            yield
+        finally:
+            for field in fields:
+                field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic synthetic dataset (businesses, tutors, pets, woofs, bookings, attendance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=10)
+        parser.add_argument('--tutors', type=int, default=20, help='Tutors per business')
+        parser.add_argument('--pets', type=int, default=2, help='Pets per tutor')
+        parser.add_argument('--staff', type=int, default=2, help='Staff users per business (the first is a manager)')
+        parser.add_argument('--tutor-logins', type=int, default=5, help='Tutors per business that get a user account')
+        parser.add_argument('--days', type=int, default=30, help='Days of history: woofs, attendance and past bookings')
+        parser.add_argument('--future-days', type=int, default=14, help='Days ahead that get slots and bookings')
+        parser.add_argument('--woofs-per-day', type=float, default=0.3, help='Staff woofs per pet per day')
+        parser.add_argument('--reply-rate', type=float, default=0.25, help='Share of woofs answered by a tutor')
+        parser.add_argument('--global-woofs-per-day', type=float, default=1.0, help='Announcements per business per day')
+        parser.add_argument('--bookings-per-pet', type=int, default=3)
+        parser.add_argument('--attendance-rate', type=float, default=0.3, help='Chance a pet attended on a past day')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--today', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                            help='Anchor date (YYYY-MM-DD, default today); fix it for identical reruns')
+        parser.add_argument('--prefix', default='load', help='Business names and usernames start with this')
+        parser.add_argument('--password', default='LoadTest123!', help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT and pets per chunk')
+        parser.add_argument('--clear', action='store_true', help='Delete data from a previous run with the same prefix first')
+        parser.add_argument('--skip-occupancy', action='store_true', help="Don't rebuild the DailyOccupancy rollup")
+        parser.add_argument('--skip-timelines', action='store_true',
+                            help="Don't build tutor timelines (run backfill_timelines later)")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['pets'] < 1 or options['tutors'] < 1:
+            raise CommandError('--batch-size, --tutors and --pets must be positive')
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.today = options['today'] or timezone.localdate()
+        self.now = timezone.make_aware(datetime.combine(self.today, time(18, 0)))
+        self.first_day = self.today - timedelta(days=options['days'])
+        self.password = make_password(options['password'])  # Hashed once, shared by every user
+        self.services = {
+            service_type: Service.objects.get_or_create(type=service_type)[0] for service_type in SLOT_CONFIG
+        }
+        self.totals = {}
+        prefix = options['prefix']
+
+        if options['clear']:
+            self.clear(prefix)
+
+        started = timer.perf_counter()
+        self.stdout.write(f'🚀 Generating {options["businesses"]} businesses (seed {options["seed"]}, today {self.today})')
+        businesses = []
+        for n in range(options['businesses']):
+            with transaction.atomic():
+                businesses.append(self.generate_business(f'{prefix}-{n:04d}'))
+            if (n + 1) % 10 == 0 or n + 1 == options['businesses']:
+                self.stdout.write(
+                    f'  ✓ {n + 1} businesses, {self.totals.get("pets", 0)} pets, '
+                    f'{self.totals.get("woofs", 0)} woofs ({timer.perf_counter() - started:.1f}s)'
+                )
+
+        if not options['skip_occupancy']:
+            self.stdout.write('📊 Rebuilding the daily occupancy rollup...')
+            for group in batched(businesses, 50):
+                rebuild_daily_occupancy(group, self.first_day, self.today + timedelta(days=options['future_days']))
+        # Pets and check-ins were bulk inserted, which the live counters don't see
+        LiveOccupancy.reconcile([business.id for business in businesses])
+
+        if not options['skip_timelines']:
+            self.stdout.write('📰 Building tutor timelines...')
+            for business in businesses:
+                with transaction.atomic():
+                    tutor_ids = Tutor.objects.filter(business=business).values_list('id', flat=True)
+                    self.count('timeline entries', TimelineEntry.objects.rebuild(tutor_ids))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Done in {timer.perf_counter() - started:.1f}s'))
+        for name, count in self.totals.items():
+            self.stdout.write(f'  {name}: {count}')
+
+    def clear(self, prefix):
+        """One business at a time, so each cascade stays small"""
+        self.stdout.write(f'🗑️  Clearing previous {prefix!r} data...')
+        for business_id in list(Business.objects.filter(name__startswith=f'{prefix}-').values_list('id', flat=True)):
+            Business.objects.filter(id=business_id).delete()
+        User.objects.filter(username__startswith=f'{prefix}-').delete()
+
+    def insert(self, model, rows, counter=None):
+        """bulk_create `rows` (any iterable) batch by batch; returns the created objects"""
+        created = []
+        for batch in batched(rows, self.batch_size):
+            created += model.objects.bulk_create(batch)
+        self.count(counter or model._meta.verbose_name_plural, len(created))
+        return created
+
+    def count(self, name, n):
+        self.totals[name] = self.totals.get(name, 0) + n
+
+    def users(self, usernames):
+        return self.insert(User, (
+            User(username=username, email=username, password=self.password, date_joined=self.now)
+            for username in usernames
+        ))
+
+    def random_time(self, day):
+        """A timestamp during opening hours on `day` days after first_day"""
+        moment = datetime.combine(self.first_day + timedelta(days=day), time(8, 0))
+        return timezone.make_aware(moment + timedelta(seconds=self.rng.randrange(10 * 3600)))
+
+    def generate_business(self, name):
+        options, rng = self.options, self.rng
+        business = Business.objects.create(name=name)
+        self.count('businesses', 1)
+
+        staff_users = self.users(f'{name}-staff{n}@example.com' for n in range(options['staff']))
+        self.insert(Staff, (
+            Staff(user=user, business=business, role='manager' if n == 0 else 'staff')
+            for n, user in enumerate(staff_users)
+        ))
+
+        # Every SLOT_CONFIG slot on every day of the window; booked_count is filled in at the end
+        days = options['days'] + options['future_days'] + 1
+        grid = [(self.services[service_type], start, end, capacity)
+                for service_type, slots in SLOT_CONFIG.items() for start, end, capacity in slots]
+        slots = self.insert(ServiceSlot, (
+            ServiceSlot(business=business, service=service, date=self.first_day + timedelta(days=day),
+                        start_time=start, end_time=end, max_capacity=capacity)
+            for day in range(days) for service, start, end, capacity in grid
+        ))
+
+        logins = iter(self.users(f'{name}-tutor{n}@example.com' for n in range(min(options['tutor_logins'], options['tutors']))))
+        tutors_per_chunk = max(1, self.batch_size // options['pets'])
+        for first in range(0, options['tutors'], tutors_per_chunk):
+            count = min(tutors_per_chunk, options['tutors'] - first)
+            self.generate_chunk(business, first, count, logins, staff_users, slots)
+
+        # One UPDATE per distinct count is far cheaper than bulk_update's CASE per row
+        by_count = {}
+        for slot in slots:
+            if slot.booked_count:
+                by_count.setdefault(slot.booked_count, []).append(slot.id)
+        for booked_count, ids in by_count.items():
+            for batch in batched(ids, self.batch_size):
+                ServiceSlot.objects.filter(id__in=batch).update(booked_count=booked_count)
+        with explicit_timestamps(GlobalWoof._meta.get_field('created_at')):
+            announcements = int(options['days'] * options['global_woofs_per_day'])
+            self.insert(GlobalWoof, (
+                GlobalWoof(business=business, staff=rng.choice(staff_users), message=rng.choice(GLOBAL_MESSAGES),
+                           created_at=self.random_time(rng.randrange(options['days'] + 1)))
+                for _ in range(announcements)
+            ), 'global woofs')
+        return business
+
+    def generate_chunk(self, business, first, count, logins, staff_users, slots):
+        """Tutors [first, first + count) of a business with their pets and all pet history"""
+        options, rng = self.options, self.rng
+        tutors = self.insert(Tutor, (
+            Tutor(name=f'{rng.choice(TUTOR_NAMES)} {business.name}-{first + n}', business=business,
+                  email=f'{business.name}-tutor{first + n}@example.com', phone=f'+351 9{rng.randrange(10 ** 8):08d}',
+                  user=next(logins, None))
+            for n in range(count)
+        ))
+        pets = []
+        for _ in tutors:
+            for _ in range(options['pets']):
+                species, breeds = rng.choice(SPECIES)
+                pets.append(Pet(
+                    name=rng.choice(PET_NAMES), business=business, species=species, breed=rng.choice(breeds),
+                    sex=rng.choice(('male', 'female')), neutered=rng.random() < 0.6,
+                    birthday=self.today - timedelta(days=rng.randrange(180, 15 * 365)),
+                ))
+        pets = self.insert(Pet, pets)
+        owners = [tutors[i // options['pets']] for i in range(len(pets))]
+        owner_of = {pet.id: owner for pet, owner in zip(pets, owners)}
+
+        Through = Pet.tutors.through
+        links = []
+        for pet, owner in zip(pets, owners):
+            links.append(Through(pet_id=pet.id, tutor_id=owner.id))
+            if len(tutors) > 1 and rng.random() < CO_OWNED:
+                other = rng.choice(tutors)
+                if other is not owner:
+                    links.append(Through(pet_id=pet.id, tutor_id=other.id))
+        self.insert(Through, links, 'pet tutors')
+
+        # Attendance history, and today's check-in state derived from it
+        attended_today = set()
+        attendance = []
+        for pet in pets:
+            for day in range(options['days'] + 1):
+                if rng.random() < options['attendance_rate']:
+                    arrived = time(rng.randrange(7, 10), rng.randrange(60))
+                    attendance.append(PetAttendance(
+                        pet=pet, date=self.first_day + timedelta(days=day), checkin_time=arrived,
+                        checkout_time=time(rng.randrange(16, 19), rng.randrange(60)),
+                    ))
+                    if day == options['days']:
+                        attended_today.add(pet.id)
+            if len(attendance) >= self.batch_size:
+                self.insert(PetAttendance, attendance, 'attendance records')
+                attendance = []
+        self.insert(PetAttendance, attendance, 'attendance records')
+        self.insert(CheckIn, (
+            CheckIn(pet=pet, is_present=pet.id in attended_today,
+                    checkin_time=self.now - timedelta(hours=rng.randrange(1, 9)) if pet.id in attended_today else None,
+                    checkout_time=None if pet.id in attended_today else self.now - timedelta(days=rng.randrange(1, 8)))
+            for pet in pets
+        ), 'check-ins')
+
+        with explicit_timestamps(Woof._meta.get_field('created_at')):
+            woofs = (woof for pet in pets for woof in self.pet_woofs(business, pet, staff_users))
+            for batch in batched(woofs, self.batch_size):
+                # Bulk inserts skip Woof.save(): thread fields are set here
+                replies = []
+                for parent in batch:
+                    if rng.random() < options['reply_rate']:
+                        parent.reply_count = 1
+                        replies.append(Woof(
+                            business=business, pet_id=parent.pet_id, tutor=owner_of[parent.pet_id],
+                            parent_woof=parent, root=parent, depth=1,
+                            message=rng.choice(REPLY_MESSAGES), visibility=parent.visibility,
+                            created_at=min(self.now, parent.created_at + timedelta(minutes=rng.randrange(5, 240))),
+                        ))
+                parents = Woof.objects.bulk_create(batch)
+                self.count('woofs', len(parents))
+                self.insert(Woof, replies, 'woofs')
+
+        self.generate_bookings(business, pets, owners, slots)
+
+    def pet_woofs(self, business, pet, staff_users):
+        options, rng = self.options, self.rng
+        expected = options['days'] * options['woofs_per_day']
+        # Stochastic rounding keeps the average at woofs_per_day without per-day draws
+        count = int(expected) + (rng.random() < expected - int(expected))
+        for _ in range(count):
+            yield Woof(
+                business=business, pet=pet, staff=rng.choice(staff_users),
+                message=rng.choice(WOOF_MESSAGES).format(pet=pet.name),
+                visibility='private' if rng.random() < 0.1 else 'public',
+                created_at=self.random_time(rng.randrange(options['days'] + 1)),
+            )
+
+    def generate_bookings(self, business, pets, owners, slots):
+        """
+        Bookings on distinct random slots per pet. Past slots are confirmed while they
+        have room (else cancelled); future ones are pending or confirmed. Slot
+        booked_count is tracked on the slot objects and written once per business.
+        """
+        options, rng = self.options, self.rng
+        today_index = options['days']
+        bookings = []
+        with explicit_timestamps(ServiceBooking._meta.get_field('requested_at')):
+            for pet, owner in zip(pets, owners):
+                for slot in rng.sample(slots, min(options['bookings_per_pet'], len(slots))):
+                    day = (slot.date - self.first_day).days
+                    requested_at = self.random_time(max(0, day - rng.randrange(1, 15)))
+                    fits = slot.booked_count < slot.max_capacity
+                    if day < today_index:
+                        status = 'confirmed' if fits and rng.random() < 0.9 else 'cancelled'
+                    else:
+                        status = 'confirmed' if fits and rng.random() < 0.5 else 'pending'
+                    if status == 'confirmed':
+                        slot.booked_count += 1
+                    requested_at = min(requested_at, self.now)
+                    decided_at = min(requested_at + timedelta(hours=rng.randrange(1, 24)), self.now)
+                    bookings.append(ServiceBooking(
+                        slot=slot, business=business, pet=pet, tutor=owner, status=status, requested_at=requested_at,
+                        confirmed_at=decided_at if status == 'confirmed' else None,
+                        cancelled_at=decided_at if status == 'cancelled' else None,
+                    ))
+                if len(bookings) >= self.batch_size:
+                    self.insert(ServiceBooking, bookings, 'bookings')
+                    bookings = []
+            self.insert(ServiceBooking, bookings, 'bookings')
@@ -0,0 +1,342 @@
+"""
+Replay a realistic traffic mix against the WSGI application, in process.
+
+Simulated clients are cheap schedule entries; a small thread pool serves them from
+a shared timeline, so hundreds of tablets can be simulated with a handful of
+worker threads:
+
+  staff tablet   GET staff:dashboard every 30s, GET staff:feed (JSON poll) every 25s
+  tutor browser  GET tutor:dashboard and tutor:availability every 30s,
+                 POST tutor:book_service every --booking-interval seconds
+
+Every request goes through petcrm.wsgi.application with a real session cookie
+and CSRF token, so middleware, sessions and templates cost what they cost in
+production. --speedup divides every interval to compress a long session into a
+short run. Run it against a database built by generate_load_data.
+"""
+import heapq
+import io
+import json
+import math
+import random
+import secrets
+import string
+import threading
+import time as timer
+from dataclasses import dataclass, field
+from datetime import timedelta
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlencode
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.urls import reverse
+from django.utils import timezone
+from pets.models import Staff, Tutor
+from reservations.models import ServiceSlot
+
+STAFF_DASHBOARD_INTERVAL = 30
+FEED_POLL_INTERVAL = 25
+TUTOR_DASHBOARD_INTERVAL = 30
+PERCENTILES = (50, 95, 99)
+
+
+def session_cookies(user):
+    """Cookies of a logged-in browser for `user`: a stored session plus a CSRF secret"""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    # An unmasked secret is accepted both as the cookie and as the X-CSRFToken header
+    csrf = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
+    return {settings.SESSION_COOKIE_NAME: session.session_key, settings.CSRF_COOKIE_NAME: csrf}
+
+
+class WSGIClient:
+    """Minimal cookie-keeping client that calls a WSGI application directly"""
+
+    def __init__(self, application, cookies, host='localhost'):
+        self.application = application
+        self.cookies = dict(cookies)
+        self.host = host
+
+    def request(self, method, path, query=None, data=None):
+        body = urlencode(data or {}, doseq=True).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(query or {}),
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': '; '.join(f'{k}={v}' for k, v in self.cookies.items()),
+            'HTTP_X_CSRFTOKEN': self.cookies.get(settings.CSRF_COOKIE_NAME, ''),
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    for morsel in SimpleCookie(value).values():
+                        self.cookies[morsel.key] = morsel.value
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0], content
+
+
+@dataclass(order=True)
+class Event:
+    due: float
+    seq: int
+    client: object = field(compare=False)
+    action: str = field(compare=False)
+
+
+class StaffTablet:
+    def __init__(self, client):
+        self.client = client
+        self.feed_since = None
+
+    def actions(self, options):
+        return {'dashboard': STAFF_DASHBOARD_INTERVAL, 'feed': FEED_POLL_INTERVAL}
+
+    def run(self, action, rng):
+        if action == 'dashboard':
+            return 'staff:dashboard', self.client.request('GET', reverse('staff:dashboard'))
+        query = {'format': 'json'}
+        if self.feed_since:
+            query['since'] = self.feed_since
+        result = self.client.request('GET', reverse('staff:feed'), query)
+        self.feed_since = timezone.now().isoformat()
+        return 'staff:feed_json', result
+
+
+class TutorBrowser:
+    def __init__(self, client, pet_ids, slot_ids):
+        self.client = client
+        self.pet_ids = pet_ids
+        self.slot_ids = slot_ids
+
+    def actions(self, options):
+        actions = {'dashboard': TUTOR_DASHBOARD_INTERVAL, 'availability': TUTOR_DASHBOARD_INTERVAL}
+        if self.pet_ids and self.slot_ids and options['booking_interval']:
+            actions['book'] = options['booking_interval']
+        return actions
+
+    def run(self, action, rng):
+        if action == 'dashboard':
+            return 'tutor:dashboard', self.client.request('GET', reverse('tutor:dashboard'))
+        if action == 'availability':
+            return 'tutor:availability', self.client.request('GET', reverse('tutor:availability'))
+        return 'tutor:book_service', self.client.request('POST', reverse('tutor:dashboard'), data={
+            'action': 'book_service',
+            'pet_id': rng.choice(self.pet_ids),
+            'selected_slots': json.dumps([rng.choice(self.slot_ids)]),
+        })
+
+
+class Command(BaseCommand):
+    help = 'Replay staff tablet and tutor traffic against the WSGI app and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff-clients', type=int, default=20, help='Simulated staff tablets')
+        parser.add_argument('--tutor-clients', type=int, default=50, help='Simulated tutor browsers')
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads serving the clients')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+        parser.add_argument('--speedup', type=float, default=1.0, help='Divide every client interval by this')
+        parser.add_argument('--booking-interval', type=float, default=300,
+                            help='Seconds between booking POSTs per tutor (0 disables bookings)')
+        parser.add_argument('--prefix', help='Only use businesses whose name starts with this (e.g. load-)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        from petcrm.wsgi import application
+
+        if settings.DEBUG:
+            self.stdout.write(self.style.WARNING('⚠️  DEBUG is on: every query is logged, latencies will be inflated'))
+        # Every simulated client logs in with a stored session: none may outlive the run
+        self.session_keys = []
+        try:
+            self.simulate(application, options)
+        finally:
+            self.delete_sessions()
+
+    def simulate(self, application, options):
+        rng = random.Random(options['seed'])
+        clients = self.build_clients(application, options, rng)
+        if not clients:
+            raise CommandError('No staff or tutor users to simulate; run generate_load_data first')
+
+        # Spread first requests over one interval so clients don't arrive in lockstep
+        timeline, seq = [], 0
+        start = timer.perf_counter()
+        for client in clients:
+            for action, interval in client.actions(options).items():
+                heapq.heappush(timeline, Event(start + rng.uniform(0, interval / options['speedup']), seq, client, action))
+                seq += 1
+        stop_at = start + options['duration']
+        lock = threading.Lock()
+        samples, errors, lag = {}, {}, []
+        state = {'seq': seq}
+
+        def worker(worker_rng):
+            try:
+                while True:
+                    with lock:
+                        # Checked before sleeping: an event due after the end is never waited for
+                        if not timeline or timeline[0].due >= stop_at or timer.perf_counter() >= stop_at:
+                            return
+                        event = heapq.heappop(timeline)
+                    wait = event.due - timer.perf_counter()
+                    if wait > 0:
+                        timer.sleep(wait)
+                    began = timer.perf_counter()
+                    try:
+                        name, (status, _) = event.client.run(event.action, worker_rng)
+                    except Exception as exc:
+                        name, status = f'{type(event.client).__name__}.{event.action}', repr(exc)
+                    elapsed = timer.perf_counter() - began
+                    interval = event.client.actions(options)[event.action] / options['speedup']
+                    with lock:
+                        samples.setdefault(name, []).append(elapsed)
+                        lag.append(max(0.0, began - event.due))
+                        # Booking POSTs redirect back to the dashboard; a redirected GET means the session was lost
+                        if status != (302 if event.action == 'book' else 200):
+                            errors.setdefault(name, {}).setdefault(status, 0)
+                            errors[name][status] += 1
+                        state['seq'] += 1
+                        heapq.heappush(timeline, Event(event.due + interval, state['seq'], event.client, event.action))
+            finally:
+                connections.close_all()
+
+        self.stdout.write(
+            f'🚦 {len(clients)} clients on {options["threads"]} threads for {options["duration"]:.0f}s '
+            f'(speedup x{options["speedup"]:g})'
+        )
+        threads = [
+            threading.Thread(target=worker, args=(random.Random(rng.random()),), daemon=True)
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = timer.perf_counter() - start
+        self.report(samples, errors, lag, wall, options)
+
+    def build_clients(self, application, options, rng):
+        """Staff tablets and tutor browsers, round-robin over the users available"""
+        close_old_connections()
+        staff = Staff.objects.select_related('user', 'business').order_by('id')
+        tutors = Tutor.objects.filter(user__isnull=False).select_related('user').order_by('id')
+        if options['prefix']:
+            staff = staff.filter(business__name__startswith=options['prefix'])
+            tutors = tutors.filter(business__name__startswith=options['prefix'])
+        staff, tutors = list(staff), list(tutors)
+
+        clients = []
+        if staff:
+            for n in range(options['staff_clients']):
+                member = staff[n % len(staff)]
+                clients.append(StaffTablet(WSGIClient(application, self.login(member.user))))
+        if tutors:
+            business_ids = {tutor.business_id for tutor in tutors}
+            today = timezone.localdate()
+            free_slots = {}
+            for slot_id, business_id in ServiceSlot.objects.filter(
+                business_id__in=business_ids, date__gt=today, date__lte=today + timedelta(days=14), is_available=True,
+            ).values_list('id', 'business_id'):
+                free_slots.setdefault(business_id, []).append(slot_id)
+            pets = {}
+            for tutor_id, pet_id in Tutor.pets.through.objects.filter(
+                tutor__in=tutors,
+            ).values_list('tutor_id', 'pet_id'):
+                pets.setdefault(tutor_id, []).append(pet_id)
+            for n in range(options['tutor_clients']):
+                tutor = tutors[n % len(tutors)]
+                clients.append(TutorBrowser(
+                    WSGIClient(application, self.login(tutor.user)),
+                    pets.get(tutor.id, []),
+                    free_slots.get(tutor.business_id, []),
+                ))
+        rng.shuffle(clients)
+        return clients
+
+    def login(self, user):
+        cookies = session_cookies(user)
+        self.session_keys.append(cookies[settings.SESSION_COOKIE_NAME])
+        return cookies
+
+    def delete_sessions(self):
+        close_old_connections()
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        for key in self.session_keys:
+            store.delete(key)
+        if self.session_keys:
+            self.stdout.write(f'🧹 {len(self.session_keys)} simulated sessions deleted')
+
+    def report(self, samples, errors, lag, wall, options):
+        total = sum(len(times) for times in samples.values())
+        self.stdout.write(f'\n{"url name":<22} {"reqs":>7} {"errors":>7} {"req/s":>8} {"mean":>8} '
+                          + ' '.join(f'{"p" + str(p):>8}' for p in PERCENTILES) + f' {"max":>8}')
+        results = {'duration': wall, 'requests': total, 'throughput': total / wall, 'urls': {}}
+        for name in sorted(samples):
+            times = sorted(samples[name])
+            stats = {
+                'requests': len(times),
+                'errors': sum(errors.get(name, {}).values()),
+                'throughput': len(times) / wall,
+                'mean_ms': sum(times) / len(times) * 1000,
+                'max_ms': times[-1] * 1000,
+                **{f'p{p}_ms': percentile(times, p) * 1000 for p in PERCENTILES},
+            }
+            results['urls'][name] = stats
+            self.stdout.write(
+                f'{name:<22} {stats["requests"]:>7} {stats["errors"]:>7} {stats["throughput"]:>8.2f} '
+                f'{stats["mean_ms"]:>7.1f}ms '
+                + ' '.join(f'{stats[f"p{p}_ms"]:>6.1f}ms' for p in PERCENTILES)
+                + f' {stats["max_ms"]:>6.1f}ms'
+            )
+        lag.sort()
+        results['schedule_lag_p95_ms'] = percentile(lag, 95) * 1000 if lag else 0.0
+        self.stdout.write(
+            f'\n📈 {total} requests in {wall:.1f}s = {total / wall:.1f} req/s; '
+            f'p95 schedule lag {results["schedule_lag_p95_ms"]:.0f}ms'
+        )
+        if lag and results['schedule_lag_p95_ms'] > 1000:
+            self.stdout.write(self.style.WARNING(
+                '⚠️  Workers fell behind the client schedule: the app is saturated at this load'
+            ))
+        for name, by_status in sorted(errors.items()):
+            self.stdout.write(self.style.ERROR(f'  {name}: {by_status}'))
+        if options['json_path']:
+            results['errors'] = {name: {str(k): v for k, v in by.items()} for name, by in errors.items()}
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'📝 Results written to {options["json_path"]}')
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from home.models import SlowQuery
+from petcrm.slowlog import WATCHED_TABLES
+
+
+class Command(BaseCommand):
+    help = 'Rank slow-query fingerprints by total time and flag full scans on the hot tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--sql-width', type=int, default=120, help='Characters of normalised SQL to show')
+        parser.add_argument('--reset', action='store_true', help='Delete every logged fingerprint and exit')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any logged query scans a watched table')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(f'🗑️  Deleted {deleted} slow-query fingerprints')
+            return
+
+        ranked = list(SlowQuery.objects.order_by('-total_ms')[:options['limit']])
+        if not ranked:
+            self.stdout.write('No slow queries logged yet')
+            return
+        self.stdout.write(f'{"#":>3} {"calls":>7} {"total ms":>10} {"mean ms":>9} {"max ms":>9}  origin')
+        for rank, query in enumerate(ranked, start=1):
+            watched = [t for t in query.full_scans.split(',') if t in WATCHED_TABLES]
+            self.stdout.write(
+                f'{rank:>3} {query.calls:>7} {query.total_ms:>10.1f} {query.mean_ms:>9.1f} {query.max_ms:>9.1f}  '
+                f'{query.origin or "?"}'
+                + (self.style.ERROR(f'  ⚠️ FULL SCAN {", ".join(watched)}') if watched else '')
+            )
+            self.stdout.write(f'    {query.sql[:options["sql_width"]]}')
+
+        # Every fingerprint counts here, not just the ones shown above
+        flagged = [
+            query for query in SlowQuery.objects.exclude(full_scans='').order_by('-total_ms')
+            if any(t in WATCHED_TABLES for t in query.full_scans.split(','))
+        ]
+        if flagged:
+            self.stdout.write(self.style.WARNING(f'\n⚠️  {len(flagged)} fingerprints scan {", ".join(WATCHED_TABLES)}:'))
+            for query in flagged:
+                self.stdout.write(f'  {query.fingerprint[:12]} {query.origin or "?"} ({query.total_ms:.0f}ms total)')
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'      {line}')
+            if options['fail_on_scan']:
+                raise CommandError('Full table scans on watched tables')
@@ -55,3 +55,59 @@ class BusinessInquiry(models.Model):
     
     def __str__(self):
         return f"{self.business_name} - {self.email}"
+
+
+class ProfileReport(models.Model):
+    """
+    One request profiled on demand by petcrm.middleware.ProfilingMiddleware: wall time,
+    the cProfile function table, every SQL statement and template render time.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='profile_reports')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    url_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    total_ms = models.FloatField()  # Wall time of everything below the middleware
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    template_ms = models.FloatField(default=0)
+    # [{'calls', 'tottime_ms', 'cumtime_ms', 'function'}, ...] sorted by cumulative time
+    functions = models.JSONField(default=list)
+    # [{'sql', 'ms', 'origin'}, ...] in execution order
+    queries = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.total_ms:.0f}ms)"
+
+
+class SlowQuery(models.Model):
+    """
+    Queries slower than SLOW_QUERY_MS, aggregated by normalised SQL fingerprint
+    (petcrm.slowlog). The plan is SQLite's EXPLAIN QUERY PLAN from the latest sighting.
+    """
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()  # Normalised: literals and placeholders replaced by ?
+    origin = models.CharField(max_length=300, blank=True)  # Project file:line in function of the latest sighting
+    params_count = models.PositiveIntegerField(default=0)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    full_scans = models.CharField(max_length=300, blank=True)  # Tables read by a full scan, comma separated
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-total_ms']
+        verbose_name_plural = "Slow queries"
+
+    def __str__(self):
+        return f"{self.fingerprint} ({self.calls} calls, {self.total_ms:.0f}ms)"
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
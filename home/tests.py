@@ -0,0 +1,156 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from petcrm import metrics, slowlog
+from pets.models import Pet
+from reservations.models import ServiceBooking
+from tutor.models import GlobalWoof, Woof
+from .management.commands.generate_load_data import explicit_timestamps
+from .models import ProfileReport, SlowQuery
+
+
+class MetricsDirectoryTests(SimpleTestCase):
+    """Totals shared through METRICS_DIR: exited processes are folded, never lost or counted twice"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        for patch in (mock.patch.object(metrics, 'METRICS_DIR', self.dir),
+                      mock.patch.object(metrics, 'REGISTRY', metrics.Registry())):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def write_exited(self, value):
+        # A pid that has just exited
+        child = subprocess.Popen([sys.executable, '-c', 'pass'])
+        child.wait()
+        with open(os.path.join(self.dir, f'{child.pid}-test.json'), 'w') as f:
+            json.dump({'counters': [['petcrm_checkins_total', [['business', '1']], value]], 'histograms': []}, f)
+
+    def total(self):
+        counters, _ = metrics.collect()
+        return counters.get(('petcrm_checkins_total', (('business', '1'),)), 0)
+
+    def test_exited_processes_are_folded(self):
+        metrics.inc('petcrm_checkins_total', business=1)
+        self.write_exited(2)
+        self.write_exited(3)
+        self.assertEqual(self.total(), 6)
+        self.assertEqual(
+            sorted(os.listdir(self.dir)),
+            sorted(['.retire.lock', metrics.RETIRED, os.path.basename(metrics.REGISTRY._path)]),
+        )
+        self.assertEqual(self.total(), 6)
+        self.write_exited(4)
+        self.assertEqual(self.total(), 10)
+
+    def test_commands_write_nothing(self):
+        metrics.inc('petcrm_checkins_total', business=1)
+        metrics.REGISTRY.close()
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+class SlowLogParsingTests(SimpleTestCase):
+    def test_normalize(self):
+        self.assertEqual(
+            slowlog.normalize("SELECT * FROM t WHERE name = 'O''Neil' AND id IN (1, 2,  3) LIMIT 20"),
+            'SELECT * FROM t WHERE name = ? AND id IN (?+) LIMIT ?',
+        )
+        self.assertEqual(
+            slowlog.normalize('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (?+)',
+        )
+        # Placeholders and literals share a fingerprint
+        self.assertEqual(slowlog.normalize('SELECT 1 FROM t WHERE id = %s'), slowlog.normalize('SELECT 7 FROM t WHERE id = 42'))
+
+    def test_full_scans(self):
+        sql = 'SELECT * FROM "tutor_woof" U0 INNER JOIN "pets_pet" U1 ON (U0."pet_id" = U1."id")'
+        plan = ['SCAN U0', 'SEARCH U1 USING INTEGER PRIMARY KEY (rowid=?)', 'SCAN CONSTANT ROW', 'SCAN TABLE tutor_woof']
+        self.assertEqual(slowlog.full_scans(sql, plan), ['tutor_woof'])
+        self.assertEqual(slowlog.full_scans('SELECT 1', ['SEARCH pets_pet USING INDEX x (id=?)']), [])
+
+
+class SlowLogRecordingTests(TestCase):
+    """Slow queries are recorded outside the caller's transaction, never while queries are counted"""
+
+    def run_slow(self, *wrappers):
+        with connection.execute_wrapper(slowlog.SlowQueryLog(0)):
+            for wrapper in wrappers:
+                connection.execute_wrappers.append(wrapper)
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1 FROM pets_pet WHERE id = %s', [1])
+            finally:
+                for wrapper in wrappers:
+                    connection.execute_wrappers.remove(wrapper)
+
+    def test_recorded_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.run_slow()
+            self.assertFalse(SlowQuery.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        entry = SlowQuery.objects.get()
+        self.assertEqual((entry.sql, entry.calls, entry.params_count), ('SELECT ? FROM pets_pet WHERE id = ?', 1, 1))
+        self.assertIn('home/tests.py', entry.origin)
+
+    def test_not_recorded_while_counting(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.run_slow(metrics.QueryCounter())
+        self.assertEqual(callbacks, [])
+        self.assertFalse(SlowQuery.objects.exists())
+
+
+class ProfilingFlagTests(TestCase):
+    def test_only_true_values_profile(self):
+        self.client.force_login(User.objects.create_superuser('profiler', 'profiler@example.com', 'x'))
+        for value in ('0', 'false', 'no', ''):
+            self.assertNotIn('X-Profile-Report', self.client.get('/', {'_profile': value}))
+            self.assertNotIn('X-Profile-Report', self.client.get('/', HTTP_X_PROFILE=value))
+        self.assertFalse(ProfileReport.objects.exists())
+        for value in ('1', 'true', 'True'):
+            self.assertIn('X-Profile-Report', self.client.get('/', {'_profile': value}))
+        self.assertIn('X-Profile-Report', self.client.get('/', HTTP_X_PROFILE='1'))
+
+
+class GenerateLoadDataTests(TestCase):
+    def test_smoke(self):
+        today = date(2026, 1, 15)
+        call_command(
+            'generate_load_data', businesses=1, tutors=3, pets=2, staff=1, tutor_logins=1, days=5, future_days=2,
+            woofs_per_day=1, bookings_per_pet=2, batch_size=4, today=today, stdout=StringIO(),
+        )
+        self.assertEqual(Pet.objects.count(), 6)
+        self.assertEqual(ServiceBooking.objects.count(), 12)
+        # Generated timestamps were kept, and auto_now_add works again afterwards
+        woof_days = {d.date() for d in Woof.objects.values_list('created_at', flat=True)}
+        self.assertTrue(woof_days)
+        self.assertTrue(all(today - timedelta(days=5) <= d <= today for d in woof_days))
+        self.assertTrue(GlobalWoof._meta.get_field('created_at').auto_now_add)
+        woof = Woof.objects.create(pet=Pet.objects.first(), message='Now')
+        self.assertGreater(woof.created_at.date(), today)
+
+    def test_timestamps_only_on_main_thread(self):
+        errors = []
+
+        def run():
+            try:
+                with explicit_timestamps(Woof._meta.get_field('created_at')):
+                    pass
+            except CommandError as e:
+                errors.append(e)
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(Woof._meta.get_field('created_at').auto_now_add)
@@ -0,0 +1,305 @@
+"""
+Application metrics in Prometheus text format.
+
+Each process aggregates counters and histograms in memory under one lock; a
+recording is a dict update, a few microseconds. Processes share their numbers
+through METRICS_DIR (off by default): every process that serves requests
+periodically writes its own totals to <dir>/<pid>-<token>.json (atomic rename) and
+/metrics sums every file it finds, so any worker of a multi-process server reports
+the whole deployment. Management commands that serve no requests write nothing.
+Files of processes that have exited are folded into <dir>/retired.json on the next
+scrape, so counters stay monotonic while the directory stays small; pids are only
+meaningful on one host, so give every host its own directory. With
+METRICS_DIR = None metrics are per process only.
+
+    from petcrm import metrics
+    metrics.inc('petcrm_woofs_created_total', business=woof.business_id)
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time as timer
+import uuid
+from bisect import bisect_left
+try:
+    import fcntl
+except ImportError:  # Windows: exited processes' files are left in place
+    fcntl = None
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1_000, 5_000, 20_000, 50_000, 100_000, 250_000, 1_000_000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# name: help text. Counters are the only metrics that can be incremented.
+COUNTERS = {
+    'petcrm_db_query_seconds_total': 'Time spent in SQL queries, by URL name',
+    'petcrm_checkins_total': 'Pets checked in or out, by business and direction',
+    'petcrm_woofs_created_total': 'Woofs posted (staff updates and replies), by business',
+    'petcrm_booking_transitions_total': 'Bookings entering a status, by business and status',
+    'petcrm_slots_generated_total': 'Service slots materialized, by business and source',
+    'petcrm_feed_cache_requests_total': 'Feed page cache lookups, by audience and hit/miss',
+}
+# name: (help text, bucket upper bounds)
+HISTOGRAMS = {
+    'petcrm_http_request_duration_seconds': ('Request latency, by URL name, method and status', LATENCY_BUCKETS),
+    'petcrm_http_response_size_bytes': ('Response body size, by URL name', SIZE_BUCKETS),
+    'petcrm_db_queries_per_request': ('SQL queries per request, by URL name', QUERY_BUCKETS),
+}
+
+METRICS_DIR = settings.METRICS_DIR
+# Seconds between writes of this process's totals to METRICS_DIR
+FLUSH_INTERVAL = settings.METRICS_FLUSH_INTERVAL
+# Totals of exited processes, in METRICS_DIR
+RETIRED = 'retired.json'
+
+
+class Registry:
+    """Thread-safe in-process totals: counters and cumulative histograms keyed by (name, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}  # key -> [count per bucket..., +Inf, sum]
+        self._flushed_at = 0.0
+        self._path = None
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(series)] for (name, labels), series in self._histograms.items()],
+            }
+
+    def maybe_flush(self):
+        """Cheap enough for every request: only writes every FLUSH_INTERVAL seconds"""
+        if METRICS_DIR and timer.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not METRICS_DIR:
+            return
+        self._flushed_at = timer.monotonic()
+        if self._path is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            # pids are reused across restarts; the token keeps an old process's file intact
+            self._path = os.path.join(METRICS_DIR, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        data = self.snapshot()
+        tmp = f'{self._path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path)
+
+    def close(self):
+        """At exit: a last write, for processes that have written before (served requests)"""
+        if self._path is not None:
+            self.flush()
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.close)
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def collect():
+    """Totals of every process sharing METRICS_DIR (or just this one) as (counters, histograms)"""
+    if METRICS_DIR:
+        REGISTRY.flush()
+        _retire_exited()
+        snapshots = [s for s in map(_read, glob.glob(os.path.join(METRICS_DIR, '*.json'))) if s is not None]
+    else:
+        snapshots = [REGISTRY.snapshot()]
+    return _merge(snapshots)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # Being replaced, truncated or folded; the next scrape will see it
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot.get('histograms', []):
+            if name not in HISTOGRAMS or len(series) != len(HISTOGRAMS[name][1]) + 2:
+                continue  # Written with other buckets by an older deployment
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+    return counters, histograms
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return True
+
+
+def _retire_exited():
+    """Fold the files of exited processes into RETIRED and delete them, under a lock shared by all scrapers"""
+    if fcntl is None:
+        return
+    exited = []
+    for path in glob.glob(os.path.join(METRICS_DIR, '*-*.json')):
+        pid = os.path.basename(path).split('-', 1)[0]
+        if pid.isdigit() and not _alive(int(pid)):
+            exited.append(path)
+    if not exited:
+        return
+    retired_path = os.path.join(METRICS_DIR, RETIRED)
+    with open(os.path.join(METRICS_DIR, '.retire.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        snapshots = [_read(path) for path in exited]
+        folded = [path for path, snapshot in zip(exited, snapshots) if snapshot is not None]
+        if not folded:
+            return  # Another scrape folded them first
+        counters, histograms = _merge([_read(retired_path) or {}] + [s for s in snapshots if s is not None])
+        data = {
+            'counters': [[name, [list(l) for l in labels], value] for (name, labels), value in counters.items()],
+            'histograms': [[name, [list(l) for l in labels], series] for (name, labels), series in histograms.items()],
+        }
+        tmp = f'{retired_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, retired_path)
+        for path in folded:
+            os.remove(path)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = collect()
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_labels(labels)} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, labels), series in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), series):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {series[-1]}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Scrape endpoint. Allowed for superusers and for requests carrying
+    'Authorization: Bearer <METRICS_TOKEN>' when that setting is configured.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = bool(token) and constant_time_compare(header, f'Bearer {token}')
+    if not authorized and not request.user.is_superuser:
+        # Plain text for scrapers rather than the HTML error page
+        return HttpResponseForbidden('Forbidden\n', content_type='text/plain; charset=utf-8')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class QueryCounter:
+    """
+    execute_wrapper counting round trips without keeping the SQL around, for query
+    budgets and benchmarks. CaptureQueriesContext can't be used around client
+    requests: request_started resets the query log it slices.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = timer.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += timer.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Latency, response size and SQL query count/time per URL name for every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryTimer()
+        started = timer.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = timer.perf_counter() - started
+
+        match = request.resolver_match
+        # Unresolved paths share one label so scanners can't blow up the series count
+        view = match.view_name if match else 'unresolved'
+        REGISTRY.observe('petcrm_http_request_duration_seconds', elapsed,
+                         (('method', request.method), ('status', str(response.status_code)), ('view', view)))
+        if not response.streaming:
+            REGISTRY.observe('petcrm_http_response_size_bytes', len(response.content), (('view', view),))
+        REGISTRY.observe('petcrm_db_queries_per_request', queries.count, (('view', view),))
+        REGISTRY.inc('petcrm_db_query_seconds_total', queries.seconds, (('view', view),))
+        REGISTRY.maybe_flush()
+        return response
@@ -1,3 +1,10 @@
+import cProfile
+import os
+import pstats
+import sys
+import time as timer
+from django.conf import settings
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse
 
@@ -30,3 +37,149 @@ class AdminAccessMiddleware:
         
         response = self.get_response(request)
         return response
+
+
+# Query flag and header that switch profiling on for one request (superusers only)
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+# Values of the query parameter or header that turn profiling on; anything else is off
+PROFILE_ON = ('1', 'true')
+# Rows of the cProfile table kept per report, and reports kept in the store
+PROFILE_FUNCTIONS = 150
+PROFILE_REPORTS_KEEP = 200
+# Frames in this package (wsgi, middleware, metrics) never issue application queries
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_TEMPLATE_RENDER = (os.path.join('django', 'template', 'backends', 'django.py'), 'render')
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request on demand: a superuser adds ?_profile=1 or an
+    X-Profile: 1 header (or true; any other value is off) and the rest of the stack
+    runs under cProfile with every SQL statement timed and traced back to the
+    project line that issued it. The report is saved as a home.ProfileReport
+    (browsable in the admin) and its id is returned in the X-Profile-Report
+    response header.
+
+    Requests without the flag only pay for the flag lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        flag = request.GET.get(PROFILE_QUERY_PARAM) or request.META.get(PROFILE_HEADER) or ''
+        if flag.strip().lower() not in PROFILE_ON:
+            return self.get_response(request)
+        if not request.user.is_superuser:
+            return self.get_response(request)
+
+        queries = []
+        profiler = cProfile.Profile()
+        recorder = _QueryRecorder(queries)
+        started = timer.perf_counter()
+        with _ExecuteWrappers(recorder):
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (a debugger, coverage) already owns this thread
+                profiler = None
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        total_ms = (timer.perf_counter() - started) * 1000
+
+        report = _save_report(request, response, total_ms, profiler, queries)
+        response['X-Profile-Report'] = str(report.pk)
+        return response
+
+
+class _ExecuteWrappers:
+    """Install one execute_wrapper on every configured connection"""
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+        self.contexts = []
+
+    def __enter__(self):
+        for alias in connections:
+            context = connections[alias].execute_wrapper(self.wrapper)
+            context.__enter__()
+            self.contexts.append(context)
+
+    def __exit__(self, *exc_info):
+        for context in reversed(self.contexts):
+            context.__exit__(*exc_info)
+
+
+class _QueryRecorder:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        started = timer.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': round((timer.perf_counter() - started) * 1000, 3),
+                'origin': query_origin(),
+            })
+
+
+def query_origin():
+    """
+    'path/to/file.py:123 in function' of the innermost project frame on the stack,
+    skipping this package (middleware, metrics and other instrumentation) and manage.py.
+    Walks frame objects directly: much cheaper than building a traceback.
+    """
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(base) and 'site-packages' not in filename
+                and os.path.dirname(filename) != _PACKAGE_DIR and os.path.basename(filename) != 'manage.py'):
+            return f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+
+def _save_report(request, response, total_ms, profiler, queries):
+    from home.models import ProfileReport
+
+    functions, template_ms = [], 0.0
+    if profiler:
+        stats = pstats.Stats(profiler).stats
+        for (filename, lineno, name), (_, calls, tottime, cumtime, _) in stats.items():
+            if filename.endswith(_TEMPLATE_RENDER[0]) and name == _TEMPLATE_RENDER[1]:
+                template_ms += cumtime * 1000
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_FUNCTIONS]
+        functions = [
+            {
+                'calls': calls,
+                'tottime_ms': round(tottime * 1000, 3),
+                'cumtime_ms': round(cumtime * 1000, 3),
+                'function': f'{filename}:{lineno}({name})',
+            }
+            for (filename, lineno, name), (_, calls, tottime, cumtime, _) in rows
+        ]
+    match = getattr(request, 'resolver_match', None)
+    report = ProfileReport.objects.create(
+        user_id=request.user.pk,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        url_name=(match.view_name if match else '')[:200],
+        status_code=response.status_code,
+        total_ms=total_ms,
+        sql_count=len(queries),
+        sql_ms=sum(q['ms'] for q in queries),
+        template_ms=template_ms,
+        functions=functions,
+        queries=queries,
+    )
+    stale = ProfileReport.objects.order_by('-created_at').values_list('id', flat=True)[PROFILE_REPORTS_KEEP:]
+    ProfileReport.objects.filter(id__in=list(stale)).delete()
+    return report
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,9 +46,11 @@ INSTALLED_APPS = [
     'staff', # Staffing app
     'reservations', # Reservations app
     'tutor', # Tutor app
+    'search', # Full-text search (SQLite FTS5)
 ]
 
 MIDDLEWARE = [
+    'petcrm.metrics.MetricsMiddleware',  # Latency, size and query histograms for /metrics
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'petcrm.middleware.AdminAccessMiddleware',  # Restrict admin to superusers only
+    'petcrm.middleware.ProfilingMiddleware',  # ?_profile=1 or X-Profile: 1 (superusers) saves a ProfileReport
 ]
 
 ROOT_URLCONF = 'petcrm.urls'
@@ -156,3 +160,34 @@ ACCOUNT_RATE_LIMITS = {
 
 # Email settings - use console backend for development (prints to terminal)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Cache for LiveOccupancy counters and rendered feed pages (tutor.feed). Local memory
+# is per process: with several worker processes set PETCRM_CACHE_DIR so that the
+# invalidation of a feed by one worker reaches the others.
+if os.environ.get('PETCRM_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['PETCRM_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 20_000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'petcrm',
+            'OPTIONS': {'MAX_ENTRIES': 20_000},
+        },
+    }
+
+# Metrics (petcrm.metrics): worker processes of the server share totals through
+# files in this directory, one per host (None keeps them per process). /metrics is
+# open to superusers and to scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_DIR = os.environ.get('PETCRM_METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 2.0
+METRICS_TOKEN = os.environ.get('PETCRM_METRICS_TOKEN', '')
+
+# Slow-query log (petcrm.slowlog): statements slower than this many milliseconds are
+# aggregated into home.SlowQuery; set PETCRM_SLOW_QUERY_MS=off to disable
+SLOW_QUERY_MS = None if os.environ.get('PETCRM_SLOW_QUERY_MS') == 'off' else float(os.environ.get('PETCRM_SLOW_QUERY_MS', '100'))
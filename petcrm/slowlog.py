@@ -0,0 +1,184 @@
+"""
+Slow-query log. An execute_wrapper, installed on every new connection by the home
+app, times each statement; those over settings.SLOW_QUERY_MS are aggregated into
+home.SlowQuery by a normalised fingerprint, with the project line that issued them,
+the parameter count and (on SQLite) EXPLAIN QUERY PLAN. `manage.py slow_queries`
+ranks the fingerprints.
+
+Fast queries only pay for two perf_counter() calls. A slow query's origin and plan
+are read when it runs, but the entry is never written inside the caller's
+transaction: outside one it is written straight away, inside one after it commits
+(on_commit); sightings of a transaction that rolled back are written with the next
+entry. Queries run under a QueryCounter (query budgets, benchmarks) are not logged.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time as timer
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .metrics import QueryCounter
+from .middleware import query_origin
+
+logger = logging.getLogger(__name__)
+
+# Tables where a full scan on a hot path is a bug: slow_queries flags them
+WATCHED_TABLES = ('tutor_woof', 'reservations_serviceslot', 'reservations_servicebooking')
+# Only data statements are logged: BEGIN/SAVEPOINT/RELEASE run while the connection
+# is between transaction states and must not be followed by our own writes
+LOGGED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+# Statements worth asking the planner about
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\?\+\)(?:\s*,\s*\(\?\+\))+')
+_SPACE = re.compile(r'\s+')
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+_local = threading.local()
+
+
+def normalize(sql):
+    """SQL with literals and placeholders as ?, IN lists and VALUES rows collapsed to (?+)"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _LIST.sub('(?+)', sql)
+    sql = _ROWS.sub('(?+)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+def full_scans(sql, plan_rows):
+    """Tables (not aliases) read with SCAN in an EXPLAIN QUERY PLAN result"""
+    aliases = {alias: table for table, alias in _ALIAS.findall(sql)}
+    tables = []
+    for detail in plan_rows:
+        match = _SCAN.match(detail)
+        if match and match.group(1) != 'CONSTANT':
+            table = aliases.get(match.group(1), match.group(1))
+            if table not in tables:
+                tables.append(table)
+    return tables
+
+
+def explain(connection, sql, params):
+    """EXPLAIN QUERY PLAN detail lines on SQLite; [] elsewhere or for other statements"""
+    if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith(EXPLAINED):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[3] for row in cursor.fetchall()]
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'recording', False):
+            return execute(sql, params, many, context)
+        started = timer.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed_ms = (timer.perf_counter() - started) * 1000
+        if elapsed_ms >= self.threshold_ms and sql.lstrip()[:6].upper().startswith(LOGGED):
+            connection = context['connection']
+            if any(isinstance(wrapper, QueryCounter) for wrapper in connection.execute_wrappers):
+                # Our own writes would be counted against the budget being measured
+                return result
+            _local.recording = True
+            try:
+                pending = _pending(connection.alias)
+                pending.append(sighting(connection, sql, params, many, elapsed_ms))
+                if connection.in_atomic_block:
+                    transaction.on_commit(lambda: flush(connection.alias), using=connection.alias)
+                else:
+                    flush(connection.alias)
+            except Exception:
+                # The log must never fail the query it is watching
+                logger.exception('Could not record a slow query')
+            finally:
+                _local.recording = False
+        return result
+
+
+def _pending(alias):
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}
+    return _local.pending.setdefault(alias, [])
+
+
+def sighting(connection, sql, params, many, elapsed_ms):
+    """What has to be read while the query is current: its origin on the stack and its plan"""
+    first_params = params[0] if many and params else params
+    plan = [] if many else explain(connection, sql, params)
+    return {
+        'sql': sql,
+        'elapsed_ms': elapsed_ms,
+        'origin': query_origin()[:300],
+        'params_count': len(first_params or ()),
+        'plan': plan,
+    }
+
+
+def flush(alias):
+    """Write the sightings waiting on connection `alias`; called outside its transactions"""
+    pending = _pending(alias)
+    recording = getattr(_local, 'recording', False)
+    _local.recording = True
+    try:
+        while pending:
+            record(connections[alias], **pending.pop(0))
+    except Exception:
+        logger.exception('Could not record a slow query')
+    finally:
+        _local.recording = recording
+
+
+def record(connection, sql, elapsed_ms, origin, params_count, plan):
+    from home.models import SlowQuery
+
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    fields = {
+        'origin': origin,
+        'params_count': params_count,
+        'plan': '\n'.join(plan),
+        'full_scans': ','.join(full_scans(sql, plan))[:300],
+    }
+    aggregates = SlowQuery.objects.using(connection.alias).filter(fingerprint=key)
+    update = dict(
+        fields,
+        calls=F('calls') + 1,
+        total_ms=F('total_ms') + elapsed_ms,
+        max_ms=Greatest('max_ms', Value(elapsed_ms)),
+        last_seen=timezone.now(),
+    )
+    if aggregates.update(**update):
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            SlowQuery.objects.using(connection.alias).create(
+                fingerprint=key, sql=normalized, calls=1, total_ms=elapsed_ms, max_ms=elapsed_ms, **fields,
+            )
+    except IntegrityError:
+        # Another worker logged the same fingerprint first
+        aggregates.update(**update)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: put the slow-query wrapper on the new connection"""
+    threshold = settings.SLOW_QUERY_MS
+    if threshold is not None and not any(isinstance(w, SlowQueryLog) for w in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, SlowQueryLog(threshold))
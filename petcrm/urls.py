@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from home import views as home_views
+from petcrm import metrics
 
 urlpatterns = [
     path('', include('home.urls')),
@@ -26,6 +27,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('staff/', include('staff.urls')),
     path('tutor/', include('tutor.urls')),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
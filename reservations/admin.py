@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CheckIn, PetAttendance, PetReservation, TutorSchedule, Service, ServiceSlot, ServiceBooking, BusinessUnavailableDay
+from .models import CheckIn, PetAttendance, PetReservation, TutorSchedule, Service, ServiceSlot, ServiceBooking, BusinessUnavailableDay, SlotHorizon, SlotTemplate, ScheduleConfig, WaitlistEntry, DailyOccupancy
 
 @admin.register(CheckIn)
 class CheckInAdmin(admin.ModelAdmin):
@@ -36,16 +36,45 @@ class ServiceSlotAdmin(admin.ModelAdmin):
     search_fields = ('service__type', 'business__name')
     readonly_fields = ('booked_count',)
 
+@admin.register(SlotTemplate)
+class SlotTemplateAdmin(admin.ModelAdmin):
+    list_display = ('service', 'business', 'weekday', 'start_time', 'end_time', 'max_capacity', 'is_active')
+    list_filter = ('service', 'business', 'weekday', 'is_active')
+    search_fields = ('service__type', 'business__name')
+
+@admin.register(ScheduleConfig)
+class ScheduleConfigAdmin(admin.ModelAdmin):
+    list_display = ('business', 'opens_at', 'closes_at', 'half_day_closes_at', 'open_weekdays', 'eager_slots', 'version', 'updated_at')
+    readonly_fields = ('version', 'updated_at')
+
 @admin.register(ServiceBooking)
 class ServiceBookingAdmin(admin.ModelAdmin):
-    list_display = ('pet', 'tutor', 'slot', 'status', 'requested_at')
-    list_filter = ('status', 'slot__service', 'slot__date')
+    list_display = ('pet', 'tutor', 'slot', 'business', 'status', 'requested_at')
+    list_filter = ('status', 'business', 'slot__service', 'slot__date')
     search_fields = ('pet__name', 'tutor__name')
     readonly_fields = ('requested_at', 'confirmed_at', 'cancelled_at')
 
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('pet', 'tutor', 'slot', 'position', 'created_at')
+    list_filter = ('slot__service', 'slot__date')
+    search_fields = ('pet__name', 'tutor__name')
+    readonly_fields = ('position', 'created_at')
+
 @admin.register(BusinessUnavailableDay)
 class BusinessUnavailableDayAdmin(admin.ModelAdmin):
     list_display = ('business', 'date', 'type', 'reason')
     list_filter = ('business', 'date', 'type')
     search_fields = ('business__name', 'reason', 'notes')
     ordering = ('-date',)
+
+@admin.register(SlotHorizon)
+class SlotHorizonAdmin(admin.ModelAdmin):
+    list_display = ('business', 'materialized_through', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+@admin.register(DailyOccupancy)
+class DailyOccupancyAdmin(admin.ModelAdmin):
+    list_display = ('business', 'date', 'service', 'capacity', 'booked', 'pending', 'confirmed', 'cancelled', 'updated_at')
+    list_filter = ('business', 'service', 'date')
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,103 @@
+"""Slot availability computed from the compiled Schedule plus concrete ServiceSlot overrides"""
+from datetime import datetime, timedelta
+from .models import ServiceSlot
+from .schedule import get_schedule
+
+
+class VirtualSlot:
+    """
+    A slot computed from a schedule SlotSpec for a specific date that has no
+    ServiceSlot row yet. Exposes the same attributes the calendar and booking code
+    read from ServiceSlot; its id is a string reference that resolve_slot() understands.
+    """
+    booked_count = 0
+    is_available = True
+
+    def __init__(self, business_id, spec, date):
+        self.spec = spec
+        self.business_id = business_id
+        self.service = spec.service
+        self.service_id = spec.service_id
+        self.date = date
+        self.start_time = spec.start_time
+        self.end_time = spec.end_time
+        self.max_capacity = spec.max_capacity
+
+    @property
+    def id(self):
+        return f't{self.spec.template_id}-{self.date:%Y%m%d}'
+
+    def is_fully_booked(self):
+        return self.booked_count >= self.max_capacity
+
+    def available_spots(self):
+        return self.max_capacity - self.booked_count
+
+
+def get_service_slots(business, start_date, end_date, available_only=True):
+    """
+    Slots for a business between two dates (inclusive), ordered by date and time.
+
+    Concrete ServiceSlot rows win over template slots with the same
+    (service, date, start_time); a row with is_available=False therefore hides the
+    template slot for that day. Returns a mix of ServiceSlot and VirtualSlot.
+    """
+    schedule = get_schedule(business)
+    concrete = ServiceSlot.objects.filter(
+        business=business,
+        date__gte=start_date,
+        date__lte=end_date,
+    ).select_related('service')
+    overrides = {(s.service_id, s.date, s.start_time): s for s in concrete}
+
+    slots = []
+    date = start_date
+    while date <= end_date:
+        for spec in schedule.slots_on(date):
+            if (spec.service_id, date, spec.start_time) not in overrides:
+                slots.append(VirtualSlot(business.id, spec, date))
+        date += timedelta(days=1)
+    slots.extend(s for s in overrides.values() if s.is_available or not available_only)
+    slots.sort(key=lambda s: (s.date, s.start_time, s.service_id))
+    return slots
+
+
+def parse_template_ref(slot_ref):
+    """'t<template_id>-<YYYYMMDD>' -> (template_id, date), or None for a concrete slot id"""
+    if isinstance(slot_ref, str) and slot_ref.startswith('t'):
+        try:
+            template_id, day = slot_ref[1:].split('-')
+            return int(template_id), datetime.strptime(day, '%Y%m%d').date()
+        except ValueError:
+            raise ServiceSlot.DoesNotExist(f'Malformed slot reference {slot_ref!r}')
+    return None
+
+
+def materialize_slot(business, spec, date):
+    """Create (or fetch) the concrete ServiceSlot for a schedule spec on a given date"""
+    slot, _ = ServiceSlot.objects.get_or_create(
+        business=business,
+        service=spec.service,
+        date=date,
+        start_time=spec.start_time,
+        defaults={
+            'end_time': spec.end_time,
+            'max_capacity': spec.max_capacity,
+        },
+    )
+    return slot
+
+
+def resolve_slot(business, slot_ref):
+    """
+    Turn a calendar slot id into a concrete ServiceSlot, materializing template slots.
+    Raises ServiceSlot.DoesNotExist for unknown references, closed days or templates of other businesses.
+    """
+    parsed = parse_template_ref(slot_ref)
+    if parsed is None:
+        return ServiceSlot.objects.select_related('service').get(id=slot_ref)
+    template_id, date = parsed
+    spec = get_schedule(business).spec_for(template_id, date)
+    if spec is None or date < datetime.now().date():
+        raise ServiceSlot.DoesNotExist(f'Slot reference {slot_ref!r} is not bookable')
+    return materialize_slot(business, spec, date)
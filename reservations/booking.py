@@ -0,0 +1,296 @@
+"""Batched tutor booking: a constant number of queries however many slots are selected"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from petcrm import metrics
+from .availability import parse_template_ref
+from .models import AvailabilityVersion, CapacityMismatch, DailyOccupancy, DashboardChange, ServiceBooking, ServiceSlot, WaitlistEntry
+from .schedule import get_schedule
+
+# Pending requests shown per page of the staff queue
+PENDING_PAGE_SIZE = 50
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _label(slot):
+    return f'{slot.start_time} - {slot.end_time}'
+
+
+def load_slots(business, slot_refs):
+    """
+    {slot_ref: ServiceSlot or None} for calendar slot ids. Concrete ids are loaded with
+    in_bulk; template references are materialized with one bulk insert and read back
+    in one query. Unknown, malformed or closed-day references map to None.
+    """
+    resolved = {}
+    concrete_ids, wanted = [], {}
+    today = datetime.now().date()
+    schedule = None
+    for ref in slot_refs:
+        try:
+            parsed = parse_template_ref(ref)
+        except ServiceSlot.DoesNotExist:
+            resolved[ref] = None
+            continue
+        if parsed is None:
+            try:
+                concrete_ids.append(int(ref))
+            except (TypeError, ValueError):
+                resolved[ref] = None
+            continue
+        template_id, date = parsed
+        schedule = schedule or get_schedule(business)
+        spec = schedule.spec_for(template_id, date)
+        if spec is None or date < today:
+            resolved[ref] = None
+        else:
+            wanted[ref] = (spec, date)
+
+    by_id = ServiceSlot.objects.select_related('service').in_bulk(concrete_ids) if concrete_ids else {}
+    for ref in slot_refs:
+        if ref not in resolved and ref not in wanted:
+            resolved[ref] = by_id.get(int(ref))
+
+    if wanted:
+        ServiceSlot.objects.bulk_create(
+            [
+                ServiceSlot(
+                    business=business,
+                    service=spec.service,
+                    date=date,
+                    start_time=spec.start_time,
+                    end_time=spec.end_time,
+                    max_capacity=spec.max_capacity,
+                )
+                for spec, date in wanted.values()
+            ],
+            ignore_conflicts=True,
+        )
+        # Counts attempts: a slot created concurrently by another request is counted twice
+        metrics.inc('petcrm_slots_generated_total', len(wanted), business=business.id, source='on_demand')
+        materialized = ServiceSlot.objects.filter(
+            business=business,
+            date__in={date for _, date in wanted.values()},
+        ).select_related('service')
+        by_key = {(s.service_id, s.date, s.start_time): s for s in materialized}
+        for ref, (spec, date) in wanted.items():
+            resolved[ref] = by_key.get((spec.service_id, date, spec.start_time))
+    return resolved
+
+
+def book_slots(business, tutor, pet, slot_refs, notes=''):
+    """
+    Request bookings for one pet on many slots in one transaction.
+
+    Ownership, capacity and duplicate checks run against data loaded up front, and all
+    accepted bookings are written with a single bulk_create (plus one UPDATE when
+    cancelled bookings are re-requested, since (slot, pet) is unique). Full slots put
+    the pet on the slot's waitlist instead; slots a concurrent submit booked for the
+    pet first are reported as failed.
+    Returns (booked_count, failed_slots, waitlisted_slots) where failed_slots keeps a
+    reason per slot.
+    """
+    slots = load_slots(business, slot_refs)
+    slot_ids = [s.id for s in slots.values() if s is not None]
+    existing = {
+        b.slot_id: b
+        for b in ServiceBooking.objects.filter(pet=pet, slot_id__in=slot_ids).only('id', 'slot_id', 'status')
+    }
+
+    failed_slots = []
+    to_create, to_revive, to_waitlist, seen = [], [], [], set()
+    occupancy = []  # (date, service_id, from_status, to_status, count) for the daily rollup
+    for ref in slot_refs:
+        slot = slots.get(ref)
+        if slot is None:
+            failed_slots.append('Unknown slot')
+            continue
+        # SECURITY: Verify slot belongs to this business!
+        if slot.business_id != business.id:
+            failed_slots.append(f'{_label(slot)} (business mismatch)')
+            continue
+        booking = existing.get(slot.id)
+        if slot.id in seen or (booking and booking.status != 'cancelled'):
+            failed_slots.append(_label(slot))
+            continue
+        seen.add(slot.id)
+        if slot.is_fully_booked():
+            to_waitlist.append(slot)
+        elif booking:
+            to_revive.append(booking.id)
+            occupancy.append((slot.date, slot.service_id, 'cancelled', 'pending', 1))
+        else:
+            to_create.append(ServiceBooking(slot=slot, business=business, pet=pet, tutor=tutor, notes=notes, status='pending'))
+
+    with transaction.atomic():
+        if to_create:
+            to_create, taken = insert_bookings(to_create)
+            # Requested by a concurrent submit since `existing` was read
+            failed_slots += [_label(b.slot) for b in taken]
+            occupancy += [(b.slot.date, b.slot.service_id, None, 'pending', 1) for b in to_create]
+        if to_revive:
+            ServiceBooking.objects.filter(id__in=to_revive, status='cancelled').update(
+                status='pending',
+                tutor=tutor,
+                notes=notes,
+                requested_at=timezone.now(),
+                confirmed_at=None,
+                cancelled_at=None,
+            )
+        if to_waitlist:
+            queued = join_waitlists(to_waitlist, tutor, pet, notes)
+            failed_slots += [_label(s) for s in to_waitlist if s not in queued]
+            to_waitlist = queued
+        if to_create or to_revive:
+            DailyOccupancy.objects.record_many(business.id, occupancy)
+            AvailabilityVersion.bump(business.id)
+            DashboardChange.record(business.id, 'booking', [b.id for b in to_create] + to_revive)
+    return len(to_create) + len(to_revive), failed_slots, [_label(s) for s in to_waitlist]
+
+
+def insert_bookings(bookings):
+    """
+    bulk_create new bookings of one pet. Slots the pet was booked on concurrently
+    (unique slot and pet) are left out rather than failing the whole request.
+    Returns (created, taken).
+    """
+    taken = []
+    while bookings:
+        try:
+            with transaction.atomic():
+                return ServiceBooking.objects.bulk_create(bookings), taken
+        except IntegrityError:
+            booked = set(
+                ServiceBooking.objects.filter(pet=bookings[0].pet, slot__in=[b.slot for b in bookings])
+                .values_list('slot_id', flat=True)
+            )
+            if not booked:
+                raise
+            taken += [b for b in bookings if b.slot_id in booked]
+            bookings = [b for b in bookings if b.slot_id not in booked]
+    return [], taken
+
+
+def join_waitlists(slots, tutor, pet, notes=''):
+    """
+    Queue a pet on several full slots: one grouped MAX(position) read, one bulk insert
+    and one read of what was queued. ignore_conflicts also drops an entry whose
+    position a concurrent join took; those slots are joined one by one, retrying the
+    position (WaitlistEntry.objects.join). Returns the slots the pet is queued on.
+    """
+    last = dict(
+        WaitlistEntry.objects.filter(slot__in=slots)
+        .values('slot_id').annotate(last=Max('position')).values_list('slot_id', 'last')
+    )
+    WaitlistEntry.objects.bulk_create(
+        [
+            WaitlistEntry(slot=slot, pet=pet, tutor=tutor, notes=notes, position=last.get(slot.id, 0) + 1)
+            for slot in slots
+        ],
+        ignore_conflicts=True,  # already queued for that slot, or lost the position
+    )
+    queued = set(WaitlistEntry.objects.filter(pet=pet, slot__in=slots).values_list('slot_id', flat=True))
+    for slot in slots:
+        if slot.id not in queued:
+            try:
+                WaitlistEntry.objects.join(slot, pet, tutor, notes)
+                queued.add(slot.id)
+            except IntegrityError:
+                pass  # Still racing after every retry: reported as failed
+    return [slot for slot in slots if slot.id in queued]
+
+
+def decide_bookings(business, booking_ids, decision):
+    """
+    Confirm or reject many pending bookings of one business in one transaction.
+
+    Bookings are grouped by slot: each slot gets one conditional capacity UPDATE for
+    as many bookings as still fit (in request order) and one compare-and-set status
+    UPDATE, so the cost is a few queries per slot rather than per booking, and
+    capacity can never be oversold by concurrent decisions.
+    Returns {'done': n, 'full': n, 'skipped': n}; skipped bookings were not pending
+    (or not this business's) any more.
+    """
+    if decision not in ('confirm', 'reject'):
+        raise ValueError(f'Unknown booking decision {decision!r}')
+    booking_ids = set(booking_ids)
+    summary = {'done': 0, 'full': 0, 'skipped': 0}
+    now = timezone.now()
+    occupancy = []
+    with transaction.atomic():
+        pending = ServiceBooking.objects.filter(
+            business=business, id__in=booking_ids, status='pending',
+        ).order_by('requested_at', 'id').values_list('id', 'slot_id')
+        by_slot = {}
+        for booking_id, slot_id in pending:
+            by_slot.setdefault(slot_id, []).append(booking_id)
+        slots = ServiceSlot.objects.in_bulk(list(by_slot))
+
+        for slot_id, ids in by_slot.items():
+            slot = slots[slot_id]
+            if decision == 'reject':
+                done = ServiceBooking.objects.filter(id__in=ids, status='pending').update(
+                    status='cancelled', cancelled_at=now,
+                )
+                occupancy.append((slot.date, slot.service_id, 'pending', 'cancelled', done))
+            else:
+                take = _reserve_up_to(slot, len(ids))
+                done = ServiceBooking.objects.filter(id__in=ids[:take], status='pending').update(
+                    status='confirmed', confirmed_at=now,
+                ) if take else 0
+                if done < take:
+                    # Some were decided concurrently: give their spots back
+                    if not ServiceSlot.objects.release(slot_id, take - done):
+                        raise CapacityMismatch(f'Slot {slot_id} lost {take - done} of the spots just reserved')
+                occupancy.append((slot.date, slot.service_id, 'pending', 'confirmed', done))
+                summary['full'] += len(ids) - take
+            summary['done'] += done
+
+        summary['skipped'] = len(booking_ids) - summary['done'] - summary['full']
+        if summary['done']:
+            DailyOccupancy.objects.record_many(business.id, occupancy)
+            AvailabilityVersion.bump(business.id)
+            # Candidates rather than exactly the rows updated: the feed re-reads their status
+            DashboardChange.record(business.id, 'booking', [i for ids in by_slot.values() for i in ids])
+    return summary
+
+
+def _reserve_up_to(slot, wanted):
+    """Reserve as many of `wanted` spots as fit, retrying if the count moved underneath us"""
+    while True:
+        free = min(wanted, slot.max_capacity - slot.booked_count)
+        if free <= 0:
+            return 0
+        if ServiceSlot.objects.reserve(slot.id, free):
+            return free
+        slot.refresh_from_db(fields=['booked_count', 'max_capacity'])
+
+
+def pending_queue(business, cursor=None, limit=PENDING_PAGE_SIZE):
+    """
+    One page of a business's pending requests, newest first, read through the
+    (business, status, requested_at) index. Keyset pagination: `cursor` is the
+    opaque value returned for the previous page, so deep pages cost the same as
+    the first. Returns (bookings, next_cursor or None).
+    """
+    queue = ServiceBooking.objects.filter(business=business, status='pending')
+    position = _parse_cursor(cursor)
+    if position:
+        requested_at, booking_id = position
+        queue = queue.filter(Q(requested_at__lt=requested_at) | Q(requested_at=requested_at, id__lt=booking_id))
+    page = list(
+        queue.select_related('pet', 'tutor', 'slot__service').order_by('-requested_at', '-id')[:limit + 1]
+    )
+    if len(page) <= limit:
+        return page, None
+    last = page[limit - 1]
+    return page[:limit], f'{(last.requested_at - _EPOCH) // timedelta(microseconds=1)}-{last.id}'
+
+
+def _parse_cursor(cursor):
+    try:
+        micros, booking_id = (int(part) for part in cursor.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return _EPOCH + timedelta(microseconds=micros), booking_id
@@ -0,0 +1,291 @@
+"""
+Demand forecasting and capacity simulation over booking history.
+
+History is loaded column-wise into NumPy arrays (one query per table) and every
+statistic is computed with vectorized grouping: slots are grouped by
+(business, service, weekday, start time) and demand, fill-rate percentiles and
+projected overflow for candidate capacities are reduced per group without
+per-row Python loops.
+
+Demand for a slot is every booking request made for it (whatever its final
+status, so rejections for lack of space still count) plus pets still queued on
+its waitlist. Slots of the schedule that nobody booked count with zero demand. Attendance comes from PetAttendance, the per-day check-in history;
+CheckIn only keeps each pet's latest visit.
+"""
+from dataclasses import dataclass
+import numpy as np
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, ExtractMinute
+from pets.models import Business
+from .models import PetAttendance, ServiceBooking, ServiceSlot, WaitlistEntry
+from .schedule import get_schedules, unavailable_days
+
+DEFAULT_PERCENTILES = (50, 90, 95)
+DEFAULT_CANDIDATES = (1, 2, 3, 5, 8, 10)
+# Highest overflow rate a recommended capacity may still have
+DEFAULT_TARGET_OVERFLOW = 0.05
+
+
+@dataclass
+class SlotHistory:
+    """Column arrays for historical slots, one entry per slot offered (booked or not)"""
+    business_id: np.ndarray
+    service_id: np.ndarray
+    weekday: np.ndarray       # Monday = 0
+    start_minute: np.ndarray  # Minutes after midnight
+    capacity: np.ndarray
+    demand: np.ndarray
+
+
+@dataclass
+class Forecast:
+    """Per-group results; row i of every array describes group keys[i]"""
+    keys: np.ndarray            # (G, 4) business_id, service_id, weekday, start_minute
+    slots_observed: np.ndarray  # (G,)
+    current_capacity: np.ndarray  # (G,) most recent max_capacity seen for the group
+    mean_demand: np.ndarray     # (G,)
+    peak_demand: np.ndarray     # (G,)
+    percentiles: tuple
+    fill_percentiles: np.ndarray  # (G, P) fill rate at the capacity each slot had
+    current_overflow: np.ndarray  # (G,) share of slots where demand exceeded that capacity
+    candidates: np.ndarray      # (K,)
+    overflow_rate: np.ndarray   # (G, K) share of slots where demand exceeds the candidate
+    turned_away: np.ndarray     # (G, K) share of requested spots that would not fit
+    recommended: np.ndarray     # (G,) smallest candidate within the target, or -1
+
+    def rows(self):
+        """Group results as dicts, for templates and command output"""
+        for i, (business_id, service_id, weekday, start_minute) in enumerate(self.keys.tolist()):
+            yield {
+                'business_id': business_id,
+                'service_id': service_id,
+                'weekday': weekday,
+                'start_minute': start_minute,
+                'start_time': f'{start_minute // 60:02d}:{start_minute % 60:02d}',
+                'slots_observed': int(self.slots_observed[i]),
+                'current_capacity': int(self.current_capacity[i]),
+                'mean_demand': float(self.mean_demand[i]),
+                'peak_demand': int(self.peak_demand[i]),
+                'fill_percentiles': dict(zip(self.percentiles, self.fill_percentiles[i].tolist())),
+                'current_overflow': float(self.current_overflow[i]),
+                'overflow': dict(zip(self.candidates.tolist(), self.overflow_rate[i].tolist())),
+                'turned_away': dict(zip(self.candidates.tolist(), self.turned_away[i].tolist())),
+                'recommended': int(self.recommended[i]) if self.recommended[i] >= 0 else None,
+            }
+
+
+def _column_array(queryset, fields):
+    rows = np.array(list(queryset.values_list(*fields)), dtype=np.int64)
+    return rows.reshape(-1, len(fields))
+
+
+def _epoch_days(year, month, day):
+    """Days since 1970-01-01 from year/month/day columns"""
+    months = (year - 1970) * 12 + month - 1
+    return months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + day - 1
+
+
+def load_slot_history(business_ids, start_date, end_date):
+    """
+    Every slot offered in a date range and its demand, as column arrays in date order.
+
+    Concrete ServiceSlots only exist once a slot is booked or edited, so the slots
+    nobody asked for are enumerated from each business's schedule (_scheduled_slots)
+    and count as zero-demand observations; a concrete row replaces the template slot
+    it materializes. Demand of the concrete rows is a bincount of the booking and
+    waitlist slot ids mapped onto the slot array.
+    """
+    slots = ServiceSlot.objects.filter(
+        business_id__in=business_ids, date__gte=start_date, date__lte=end_date,
+    ).order_by().annotate(
+        start_minute=ExtractHour('start_time') * 60 + ExtractMinute('start_time'),
+    )
+    columns = _column_array(
+        slots, ('id', 'business_id', 'service_id', 'date__year', 'date__month', 'date__day', 'start_minute', 'max_capacity'),
+    )
+    slot_ids = columns[:, 0]
+
+    requested = np.concatenate([
+        _column_array(
+            model.objects.filter(
+                slot__business_id__in=business_ids, slot__date__gte=start_date, slot__date__lte=end_date,
+            ).order_by(),
+            ('slot_id',),
+        )[:, 0]
+        for model in (ServiceBooking, WaitlistEntry)
+    ])
+    # Map each request's slot id to its row through a sorted view of the ids
+    by_id = np.argsort(slot_ids)
+    rows = by_id[np.searchsorted(slot_ids[by_id], requested)]
+    demand = np.bincount(rows, minlength=len(slot_ids))
+
+    business_id, service_id = columns[:, 1], columns[:, 2]
+    day = _epoch_days(columns[:, 3], columns[:, 4], columns[:, 5])
+    start_minute, capacity = columns[:, 6], columns[:, 7]
+
+    # A business's history starts at its first concrete slot: days before it took
+    # bookings through this system are not empty slots
+    businesses, which = np.unique(business_id, return_inverse=True)
+    first_day = np.full(len(businesses), np.iinfo(np.int64).max)
+    np.minimum.at(first_day, which.ravel(), day)
+    scheduled = _scheduled_slots(dict(zip(businesses.tolist(), first_day.tolist())), start_date, end_date)
+
+    first = np.datetime64(start_date, 'D').astype(np.int64)
+    span = np.datetime64(end_date, 'D').astype(np.int64) - first + 1
+    services = int(max(service_id.max(initial=0), scheduled[1].max(initial=0))) + 1
+
+    def packed(business, service, days, minute):
+        return ((business * services + service) * span + days - first) * 1440 + minute
+
+    empty = ~np.isin(packed(*scheduled[:4]), packed(business_id, service_id, day, start_minute))
+    business_id, service_id, day, start_minute, capacity = (
+        np.concatenate([column, extra[empty]])
+        for column, extra in zip((business_id, service_id, day, start_minute, capacity), scheduled)
+    )
+    demand = np.concatenate([demand, np.zeros(int(empty.sum()), dtype=demand.dtype)])
+    order = np.lexsort((start_minute, day))
+
+    return SlotHistory(
+        business_id=business_id[order],
+        service_id=service_id[order],
+        # 1970-01-01 was a Thursday
+        weekday=(day[order] + 3) % 7,
+        start_minute=start_minute[order],
+        capacity=capacity[order],
+        demand=demand[order],
+    )
+
+
+def _scheduled_slots(first_day, start_date, end_date):
+    """
+    Template slots offered from each business's first_day (days since the epoch)
+    through end_date: (business_id, service_id, day, start_minute, capacity) columns.
+    Uses the current templates and opening days with the closures and half days
+    recorded in the range (compiled schedules only keep upcoming ones).
+    """
+    columns = [[] for _ in range(5)]
+    if first_day:
+        closed, half_days = unavailable_days(list(first_day), start_date, end_date)
+
+        last = np.datetime64(end_date, 'D').astype(np.int64)
+        schedules = get_schedules(Business(id=business_id) for business_id in first_day)
+        for business_id, schedule in schedules.items():
+            days = np.arange(max(first_day[business_id], np.datetime64(start_date, 'D').astype(np.int64)), last + 1)
+            days = days[~np.isin(days, np.array(sorted(closed.get(business_id, ())), dtype='datetime64[D]').astype(np.int64))]
+            half = np.isin(days, np.array(sorted(half_days.get(business_id, ())), dtype='datetime64[D]').astype(np.int64))
+            weekdays = (days + 3) % 7
+            for weekday, specs in enumerate(schedule.weekly):
+                for spec in specs:
+                    on = weekdays == weekday
+                    if spec.end_time > schedule.half_day_closes_at:
+                        on &= ~half
+                    n = int(on.sum())
+                    columns[0].append(np.full(n, business_id))
+                    columns[1].append(np.full(n, spec.service_id))
+                    columns[2].append(days[on])
+                    columns[3].append(np.full(n, spec.start_time.hour * 60 + spec.start_time.minute))
+                    columns[4].append(np.full(n, spec.max_capacity))
+    return tuple(np.concatenate(c).astype(np.int64) if c else np.zeros(0, dtype=np.int64) for c in columns)
+
+
+def compute_forecast(history, candidates=DEFAULT_CANDIDATES, percentiles=DEFAULT_PERCENTILES,
+                     target_overflow=DEFAULT_TARGET_OVERFLOW):
+    """Vectorized demand curves, fill-rate percentiles and overflow simulation"""
+    candidates = np.asarray(sorted(set(candidates)), dtype=np.int64)
+    if not len(history.demand):
+        empty = np.zeros(0)
+        return Forecast(
+            keys=np.zeros((0, 4), dtype=np.int64), slots_observed=empty, current_capacity=empty,
+            mean_demand=empty, peak_demand=empty, percentiles=tuple(percentiles),
+            fill_percentiles=np.zeros((0, len(percentiles))), current_overflow=empty, candidates=candidates,
+            overflow_rate=np.zeros((0, len(candidates))), turned_away=np.zeros((0, len(candidates))),
+            recommended=np.zeros(0, dtype=np.int64),
+        )
+    # Pack (business, service, weekday, minute) into one int64 so grouping is a 1-D unique
+    services = int(history.service_id.max()) + 1
+    packed = ((history.business_id * services + history.service_id) * 7 + history.weekday) * 1440 + history.start_minute
+    unique_packed, group = np.unique(packed, return_inverse=True)
+    group_keys = np.stack([
+        unique_packed // (1440 * 7 * services),
+        unique_packed // (1440 * 7) % services,
+        unique_packed // 1440 % 7,
+        unique_packed % 1440,
+    ], axis=1)
+    n_groups = len(group_keys)
+    demand = history.demand.astype(np.float64)
+    capacity = history.capacity
+
+    counts = np.bincount(group, minlength=n_groups)
+    mean_demand = np.bincount(group, weights=demand, minlength=n_groups) / counts
+    peak_demand = np.zeros(n_groups, dtype=np.int64)
+    np.maximum.at(peak_demand, group, history.demand)
+
+    # Sort once by (group, fill) so each group's values are a contiguous, ordered run
+    fill = np.minimum(demand, capacity) / np.maximum(capacity, 1)
+    order = np.lexsort((fill, group))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ranks = np.floor(np.outer(counts - 1, np.asarray(percentiles) / 100)).astype(np.int64)
+    fill_percentiles = fill[order][starts[:, None] + ranks]
+    current_overflow = np.bincount(group, weights=demand > capacity, minlength=n_groups) / counts
+
+    # Rows are in date order, so a group's highest row index is its most recent slot
+    latest = np.zeros(n_groups, dtype=np.int64)
+    np.maximum.at(latest, group, np.arange(len(group)))
+    current_capacity = capacity[latest]
+
+    # (N, K) simulation: how each slot would have fared at every candidate capacity
+    excess = demand[:, None] - candidates[None, :]
+    overflowed = np.add.reduceat((excess > 0).astype(np.int64)[order], starts, axis=0)
+    turned = np.add.reduceat(np.clip(excess, 0, None)[order], starts, axis=0)
+    total_demand = np.bincount(group, weights=demand, minlength=n_groups)
+    overflow_rate = overflowed / counts[:, None]
+    turned_away = np.divide(turned, total_demand[:, None], out=np.zeros_like(turned), where=total_demand[:, None] > 0)
+
+    within = overflow_rate <= target_overflow
+    recommended = np.where(within.any(axis=1), candidates[np.argmax(within, axis=1)], -1)
+
+    return Forecast(
+        keys=group_keys,
+        slots_observed=counts,
+        current_capacity=current_capacity,
+        mean_demand=mean_demand,
+        peak_demand=peak_demand,
+        percentiles=tuple(percentiles),
+        fill_percentiles=fill_percentiles,
+        current_overflow=current_overflow,
+        candidates=candidates,
+        overflow_rate=overflow_rate,
+        turned_away=turned_away,
+        recommended=recommended,
+    )
+
+
+def attendance_curve(business_ids, start_date, end_date, percentiles=DEFAULT_PERCENTILES):
+    """
+    Daily attendance per (business, weekday): mean and percentiles of pets present,
+    from PetAttendance rows loaded as one column array. Returns (keys, mean, pct).
+    """
+    rows = _column_array(
+        PetAttendance.objects.filter(
+            pet__business_id__in=business_ids, date__gte=start_date, date__lte=end_date,
+        ).order_by().annotate(weekday=ExtractIsoWeekDay('date') - 1),
+        ('pet__business_id', 'weekday', 'date__year', 'date__month', 'date__day'),
+    )
+    if not len(rows):
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0), np.zeros((0, len(percentiles)))
+    # Pets present per calendar day, then days grouped by (business, weekday)
+    day_keys, per_day = np.unique(rows, axis=0, return_counts=True)
+    group_keys, group = np.unique(day_keys[:, :2], axis=0, return_inverse=True)
+    group = group.ravel()
+    counts = np.bincount(group)
+    mean = np.bincount(group, weights=per_day) / counts
+    order = np.lexsort((per_day, group))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ranks = np.floor(np.outer(counts - 1, np.asarray(percentiles) / 100)).astype(np.int64)
+    return group_keys, mean, per_day[order][starts[:, None] + ranks]
+
+
+def forecast_capacity(business_ids, start_date, end_date, candidates=DEFAULT_CANDIDATES,
+                      percentiles=DEFAULT_PERCENTILES, target_overflow=DEFAULT_TARGET_OVERFLOW):
+    """Load history for the businesses and date range and run the simulation"""
+    history = load_slot_history(business_ids, start_date, end_date)
+    return compute_forecast(history, candidates, percentiles, target_overflow)
@@ -0,0 +1,80 @@
+import time as timer
+from datetime import datetime, timedelta
+import numpy as np
+from django.core.management.base import BaseCommand
+from pets.models import Business
+from reservations.forecast import SlotHistory, compute_forecast, load_slot_history
+from reservations.schedule import SLOT_CONFIG
+
+
+def synthetic_history(businesses, days, seed=0):
+    """
+    Slot history shaped like the default schedule grid: every SLOT_CONFIG slot on
+    every day for each business, with Poisson demand that varies per weekday.
+    """
+    rng = np.random.default_rng(seed)
+    grid = [
+        (service_id, start.hour * 60 + start.minute, capacity)
+        for service_id, slots in enumerate(SLOT_CONFIG.values(), start=1)
+        for start, _, capacity in slots
+    ]
+    grid = np.array(grid, dtype=np.int64)
+    per_day = len(grid)
+    n = businesses * days * per_day
+
+    business_id = np.repeat(np.arange(1, businesses + 1), days * per_day)
+    day = np.tile(np.repeat(np.arange(days), per_day), businesses)
+    slot = np.tile(np.arange(per_day), businesses * days)
+    weekday = day % 7
+    capacity = grid[slot, 2]
+    # Busier towards the weekend, with a per-business scale
+    scale = rng.uniform(0.5, 1.5, businesses + 1)[business_id]
+    demand = rng.poisson(capacity * scale * (0.6 + 0.1 * weekday))
+    return SlotHistory(
+        business_id=business_id,
+        service_id=grid[slot, 0],
+        weekday=weekday,
+        start_minute=grid[slot, 1],
+        capacity=capacity,
+        demand=demand,
+    ), n
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized capacity forecast on synthetic multi-year history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, nargs='+', default=[10, 100, 300])
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best is reported')
+        parser.add_argument('--live', action='store_true',
+                            help='Also time loading and forecasting the history stored in this database')
+
+    def handle(self, *args, **options):
+        days = options['years'] * 365
+        self.stdout.write(f'📊 Forecast benchmark ({options["years"]} years of history)')
+        self.stdout.write(f'{"businesses":>10} {"slots":>11} {"groups":>8} {"seconds":>9} {"slots/s":>12}')
+        for businesses in options['businesses']:
+            history, n = synthetic_history(businesses, days)
+            best = None
+            for _ in range(options['repeat']):
+                started = timer.perf_counter()
+                forecast = compute_forecast(history)
+                elapsed = timer.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(
+                f'{businesses:>10} {n:>11} {len(forecast.keys):>8} {best:>9.3f} {n / best:>12,.0f}'
+            )
+
+        if options['live']:
+            business_ids = list(Business.objects.values_list('id', flat=True))
+            end = datetime.now().date()
+            started = timer.perf_counter()
+            history = load_slot_history(business_ids, end - timedelta(days=days), end)
+            loaded = timer.perf_counter()
+            forecast = compute_forecast(history)
+            done = timer.perf_counter()
+            self.stdout.write(
+                f'\n🗄️  Database: {len(history.demand)} slots, {len(forecast.keys)} groups, '
+                f'load {loaded - started:.3f}s, compute {done - loaded:.3f}s'
+            )
@@ -0,0 +1,89 @@
+import time as timer
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from petcrm.metrics import QueryCounter
+from pets.models import Business
+from reservations.models import Service, ServiceSlot
+from reservations.schedule import SLOT_CONFIG
+from reservations.utils import SLOT_HORIZON_DAYS, materialize_service_slots
+
+
+class Rollback(Exception):
+    pass
+
+
+
+def legacy_materialize(businesses, start_date, days):
+    """The previous per-slot get_or_create loop, kept here for comparison only"""
+    created = 0
+    services = Service.objects.all()
+    for biz in businesses:
+        for i in range(days):
+            date = start_date + timedelta(days=i)
+            for service in services:
+                for start_time, end_time, capacity in SLOT_CONFIG.get(service.type, []):
+                    _, was_created = ServiceSlot.objects.get_or_create(
+                        business=biz,
+                        service=service,
+                        date=date,
+                        start_time=start_time,
+                        defaults={'end_time': end_time, 'max_capacity': capacity},
+                    )
+                    created += was_created
+    return created
+
+
+class Command(BaseCommand):
+    help = 'Benchmark legacy vs set-based service slot generation (runs in a rolled-back transaction)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 500],
+                            help='Number of businesses for each run')
+        parser.add_argument('--days', type=int, default=SLOT_HORIZON_DAYS)
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help='Only measure the set-based engine')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        self.stdout.write(f'📊 Slot materialization benchmark ({days} days)')
+        self.stdout.write(f'{"businesses":>10} {"engine":>8} {"created":>9} {"queries":>9} {"seconds":>9}')
+        for size in options['sizes']:
+            engines = [('set', self._run_set_based)]
+            if not options['skip_legacy']:
+                engines.insert(0, ('legacy', self._run_legacy))
+            for name, runner in engines:
+                created, queries, elapsed = self._measure(size, days, runner)
+                self.stdout.write(f'{size:>10} {name:>8} {created:>9} {queries:>9} {elapsed:>9.3f}')
+            # Second pass with everything already present: the steady state on a dashboard load
+            created, queries, elapsed = self._measure(size, days, self._run_set_based, warm=True)
+            self.stdout.write(f'{size:>10} {"set/warm":>8} {created:>9} {queries:>9} {elapsed:>9.3f}')
+
+    def _run_legacy(self, businesses, start_date, days):
+        return legacy_materialize(businesses, start_date, days)
+
+    def _run_set_based(self, businesses, start_date, days):
+        return sum(materialize_service_slots(businesses, start_date, days).values())
+
+    def _measure(self, size, days, runner, warm=False):
+        result = {}
+        try:
+            with transaction.atomic():
+                for service_type in SLOT_CONFIG:
+                    Service.objects.get_or_create(type=service_type)
+                businesses = Business.objects.bulk_create(
+                    [Business(name=f'Bench Business {i}') for i in range(size)]
+                )
+                start_date = datetime.now().date() + timedelta(days=3650)
+                if warm:
+                    materialize_service_slots(businesses, start_date, days)
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = timer.perf_counter()
+                    result['created'] = runner(businesses, start_date, days)
+                    result['elapsed'] = timer.perf_counter() - started
+                result['queries'] = counter.count
+                raise Rollback()
+        except Rollback:
+            pass
+        return result['created'], result['queries'], result['elapsed']
@@ -5,10 +5,9 @@ class Command(BaseCommand):
     help = 'Create service slots for the next 30 days'
 
     def handle(self, *args, **options):
-        result = ensure_service_slots_exist()
+        created = ensure_service_slots_exist()
         
-        if result:
-            self.stdout.write('✓ Created new service slots for next 30 days')
+        if created:
+            self.stdout.write(f'✓ Created {created} new service slots for next 30 days')
         else:
             self.stdout.write('✓ Service slots already exist for next 30 days (no new slots created)')
-
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from pets.models import Business
+from reservations.forecast import (
+    DEFAULT_CANDIDATES, DEFAULT_TARGET_OVERFLOW, attendance_curve, forecast_capacity,
+)
+from reservations.models import Service
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+class Command(BaseCommand):
+    help = ('Demand curves, fill-rate percentiles and projected overflow for candidate '
+            'max_capacity settings, computed from booking history')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, nargs='*', help='Business ids (default: all businesses)')
+        parser.add_argument('--days', type=int, default=365, help='Days of history up to today')
+        parser.add_argument('--candidates', type=int, nargs='+', default=list(DEFAULT_CANDIDATES),
+                            help='Capacities to simulate')
+        parser.add_argument('--target', type=float, default=DEFAULT_TARGET_OVERFLOW,
+                            help='Highest acceptable overflow rate for a recommendation')
+        parser.add_argument('--all', action='store_true',
+                            help='List every slot group, not only those whose capacity should change')
+
+    def handle(self, *args, **options):
+        business_ids = options['business'] or list(Business.objects.values_list('id', flat=True))
+        if not business_ids:
+            raise CommandError('No businesses to forecast')
+        end = datetime.now().date()
+        start = end - timedelta(days=options['days'])
+
+        forecast = forecast_capacity(business_ids, start, end, options['candidates'], target_overflow=options['target'])
+        services = dict(Service.objects.values_list('id', 'type'))
+        names = dict(Business.objects.filter(id__in=business_ids).values_list('id', 'name'))
+
+        self.stdout.write(
+            f'📊 {len(forecast.keys)} slot groups across {len(business_ids)} businesses, '
+            f'{int(forecast.slots_observed.sum())} slots from {start} to {end}'
+        )
+        self.stdout.write(
+            f'{"business":<24} {"service":<10} {"day":<4} {"time":<6} {"slots":>6} {"demand":>7} '
+            f'{"p90 fill":>9} {"overflow":>9} {"capacity":>9} {"suggest":>8}'
+        )
+        for row in forecast.rows():
+            if not options['all'] and row['recommended'] == row['current_capacity']:
+                continue
+            p90 = row['fill_percentiles'].get(90)
+            self.stdout.write(
+                f'{names.get(row["business_id"], row["business_id"])!s:<24.24} '
+                f'{services.get(row["service_id"], row["service_id"])!s:<10} '
+                f'{WEEKDAY_NAMES[row["weekday"]]:<4} {row["start_time"]:<6} {row["slots_observed"]:>6} '
+                f'{row["mean_demand"]:>7.2f} {"" if p90 is None else f"{p90:.0%}":>9} '
+                f'{row["current_overflow"]:>9.0%} {row["current_capacity"]:>9} '
+                f'{row["recommended"] if row["recommended"] is not None else "-":>8}'
+            )
+
+        keys, mean, pct = attendance_curve(business_ids, start, end)
+        if len(keys):
+            self.stdout.write('\n🐕 Daycare attendance per weekday (mean / p90 pets present)')
+            for (business_id, weekday), avg, p in zip(keys.tolist(), mean.tolist(), pct.tolist()):
+                self.stdout.write(
+                    f'  {names.get(business_id, business_id)!s:<24.24} {WEEKDAY_NAMES[weekday]:<4} {avg:>6.1f} / {p[1]:.0f}'
+                )
@@ -0,0 +1,38 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from pets.models import Business
+from reservations.models import ServiceSlot
+from reservations.utils import horizon_target, rebuild_daily_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyOccupancy rollup from bookings and slots (backfill or after schedule changes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help='Business id (default: all businesses)')
+        parser.add_argument('--start', help='First date, YYYY-MM-DD (default: earliest slot)')
+        parser.add_argument('--end', help='Last date, YYYY-MM-DD (default: end of the slot horizon)')
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.all()
+        if options['business']:
+            businesses = businesses.filter(id=options['business'])
+            if not businesses.exists():
+                raise CommandError(f'Business {options["business"]} not found')
+        try:
+            start = self.parse_date(options['start'])
+            end = self.parse_date(options['end']) or horizon_target()
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+        if start is None:
+            earliest = ServiceSlot.objects.filter(business__in=businesses).aggregate(d=Min('date'))['d']
+            start = min(earliest or end, datetime.now().date())
+
+        total = 0
+        for business in businesses.iterator():
+            total += rebuild_daily_occupancy([business], start, end)
+        self.stdout.write(f'✓ Rebuilt {total} occupancy rows from {start} to {end}')
+
+    def parse_date(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from pets.models import Business
+from reservations.models import LiveOccupancy
+
+
+class Command(BaseCommand):
+    help = 'Recompute live occupancy counters from CheckIn.is_present and pet counts (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help='Business id (default: all businesses)')
+
+    def handle(self, *args, **options):
+        business_ids = None
+        if options['business']:
+            if not Business.objects.filter(id=options['business']).exists():
+                raise CommandError(f'Business {options["business"]} not found')
+            business_ids = [options['business']]
+
+        drift = LiveOccupancy.reconcile(business_ids)
+        for business_id, (old, new) in sorted(drift.items()):
+            if old is not None:
+                self.stdout.write(
+                    f'  business {business_id}: {old[0]}/{old[1]} -> {new[0]}/{new[1]} in house/pets'
+                )
+        created = sum(1 for old, _ in drift.values() if old is None)
+        corrected = len(drift) - created
+        self.stdout.write(f'✓ Reconciled live occupancy: {corrected} corrected, {created} created')
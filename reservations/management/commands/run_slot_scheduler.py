@@ -0,0 +1,41 @@
+import time as timer
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from reservations.schedule import seed_defaults
+from reservations.utils import extend_slot_horizon, horizon_target
+
+
+class Command(BaseCommand):
+    help = ('Rolling-horizon scheduler: once per day, save the default schedule of businesses '
+            'that have none and extend the slot horizon of businesses with eager_slots')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+        parser.add_argument('--interval', type=int, default=None,
+                            help='Seconds between passes (default: wake up just after midnight)')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_pass()
+            if options['once']:
+                return
+            timer.sleep(options['interval'] or self.seconds_until_tomorrow())
+
+    def run_pass(self):
+        close_old_connections()
+        # Businesses bulk inserted (no signals) or created before their services
+        seeded = seed_defaults()
+        # Only businesses that opted in: everyone else gets slot rows when booked
+        created = extend_slot_horizon()
+        total = sum(created.values())
+        self.stdout.write(
+            f'✓ {datetime.now():%Y-%m-%d %H:%M} horizon through {horizon_target()}: '
+            f'{seeded} templates seeded, {len(created)} eager businesses extended, {total} slots created'
+        )
+        close_old_connections()
+
+    def seconds_until_tomorrow(self):
+        now = datetime.now()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return max(60, (tomorrow - now).total_seconds() + 60)
@@ -0,0 +1,128 @@
+"""
+Multi-threaded stress run of ServiceBooking.confirm/cancel against one slot.
+
+Runs in a throwaway test database (created and destroyed like `manage.py
+testserver` does), never the real one; on SQLite it is a temporary file, since an
+in-memory database locks whole tables instead of waiting for the writer.
+Reports confirmations per second and fails if booked_count ever exceeds
+max_capacity or disagrees with the confirmed rows.
+reservations.tests runs a small stress() as part of the suite.
+"""
+import os
+import tempfile
+import threading
+import time as timer
+from datetime import date, time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from pets.models import Business, Pet, Tutor
+from reservations.models import Service, ServiceBooking, ServiceSlot
+
+
+def stress(threads, bookings, capacity, cancel_every=5):
+    """
+    `threads` workers race to confirm `bookings` pending bookings of one slot with
+    `capacity` spots, each cancelling every `cancel_every`th one it confirmed (0
+    never). Returns counters, the elapsed seconds and the slot's final state.
+    """
+    business = Business.objects.create(name='Stress Test Business')
+    service, _ = Service.objects.get_or_create(type='daycare')
+    slot = ServiceSlot.objects.create(business=business, service=service, date=date(2030, 1, 1),
+                                      start_time=time(8, 0), end_time=time(12, 0), max_capacity=capacity)
+    tutor = Tutor.objects.create(name='Stress Tutor', business=business)
+    pets = Pet.objects.bulk_create([Pet(name=f'Stress Pet {n}', business=business) for n in range(bookings)])
+    booking_ids = [b.id for b in ServiceBooking.objects.bulk_create(
+        [ServiceBooking(slot=slot, business=business, pet=pet, tutor=tutor) for pet in pets]
+    )]
+
+    stats = {'confirmed': 0, 'full': 0, 'cancelled': 0, 'locked': 0}
+    errors = []
+    lock = threading.Lock()
+    # Every thread works through the whole list so confirmations really collide
+    barrier = threading.Barrier(threads)
+
+    def worker(offset):
+        local = dict.fromkeys(stats, 0)
+        try:
+            # Loaded before the race: only confirm() and cancel() run concurrently
+            loaded = ServiceBooking.objects.in_bulk(booking_ids)
+            barrier.wait()
+            for n, booking_id in enumerate(booking_ids[offset:] + booking_ids[:offset]):
+                booking = loaded[booking_id]
+                try:
+                    if booking.confirm():
+                        local['confirmed'] += 1
+                        if cancel_every and n % cancel_every == 0 and booking.cancel():
+                            local['cancelled'] += 1
+                    elif booking.status == 'pending':
+                        local['full'] += 1
+                except OperationalError:
+                    # SQLite "database is locked": a retryable miss, never a wrong count
+                    local['locked'] += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+            with lock:
+                for key, value in local.items():
+                    stats[key] += value
+
+    workers = [threading.Thread(target=worker, args=(i * bookings // threads,)) for i in range(threads)]
+    started = timer.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = timer.perf_counter() - started
+
+    slot.refresh_from_db()
+    return dict(
+        stats,
+        errors=errors,
+        elapsed=elapsed,
+        booked_count=slot.booked_count,
+        max_capacity=slot.max_capacity,
+        confirmed_rows=ServiceBooking.objects.filter(slot=slot, status='confirmed').count(),
+    )
+
+
+class Command(BaseCommand):
+    help = ('Multi-threaded stress test for ServiceBooking.confirm/cancel in a throwaway test database: '
+            'asserts that booked_count never exceeds max_capacity and reports confirmations per second')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--bookings', type=int, default=200, help='Pending bookings competing for the slot')
+        parser.add_argument('--capacity', type=int, default=50)
+        parser.add_argument('--cancel-every', type=int, default=5,
+                            help='Each thread cancels every Nth booking it confirmed (0 disables)')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'stress.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                result = stress(options['threads'], options['bookings'], options['capacity'], options['cancel_every'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(
+            f'📊 {options["threads"]} threads, {options["bookings"]} bookings, capacity {result["max_capacity"]}\n'
+            f'  confirmations: {result["confirmed"]} ({result["confirmed"] / result["elapsed"]:.1f}/s)\n'
+            f'  cancellations: {result["cancelled"]}\n'
+            f'  rejected (full): {result["full"]}\n'
+            f'  lock timeouts: {result["locked"]}\n'
+            f'  booked_count={result["booked_count"]}, confirmed rows={result["confirmed_rows"]}, '
+            f'elapsed {result["elapsed"]:.2f}s'
+        )
+        if result['errors']:
+            raise CommandError(f'Workers failed: {result["errors"]!r}')
+        if result['booked_count'] > result['max_capacity']:
+            raise CommandError(f'Overbooked: {result["booked_count"]} > {result["max_capacity"]}')
+        if result['booked_count'] != result['confirmed_rows']:
+            raise CommandError(
+                f'Lost update: booked_count={result["booked_count"]} but {result["confirmed_rows"]} confirmed bookings'
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Capacity invariant held'))
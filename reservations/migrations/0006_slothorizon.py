@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0005_alter_serviceslot_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHorizon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('materialized_through', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='slot_horizon', to='pets.business')),
+            ],
+        ),
+    ]
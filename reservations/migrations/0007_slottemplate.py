@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0006_slothorizon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('max_capacity', models.IntegerField(default=1)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_templates', to='pets.business')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='templates', to='reservations.service')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+                'unique_together': {('business', 'service', 'weekday', 'start_time')},
+            },
+        ),
+    ]
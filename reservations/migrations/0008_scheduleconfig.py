@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:24
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0007_slottemplate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slottemplate',
+            name='end_time',
+            field=models.TimeField(blank=True, help_text='Leave blank to use the service duration', null=True),
+        ),
+        migrations.CreateModel(
+            name='ScheduleConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opens_at', models.TimeField(default=datetime.time(8, 0))),
+                ('closes_at', models.TimeField(default=datetime.time(18, 0))),
+                ('half_day_closes_at', models.TimeField(default=datetime.time(13, 0), help_text='Closing time on half-day unavailable days')),
+                ('open_weekdays', models.CharField(default='0123456', help_text="Weekdays the business opens (Monday=0), e.g. '01234'", max_length=7)),
+                ('version', models.PositiveIntegerField(default=1, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_config', to='pets.business')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0008_scheduleconfig'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='pets.pet')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='reservations.serviceslot')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='pets.tutor')),
+            ],
+            options={
+                'ordering': ['slot', 'position'],
+                'indexes': [models.Index(fields=['slot', 'position'], name='waitlist_slot_position_idx')],
+                'unique_together': {('slot', 'pet')},
+            },
+        ),
+    ]
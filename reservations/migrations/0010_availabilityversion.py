@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0009_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityVersion',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='availability_version', serialize=False, to='pets.business')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
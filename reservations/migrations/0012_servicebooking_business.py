@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_slot_business(apps, schema_editor):
+    ServiceBooking = apps.get_model('reservations', 'ServiceBooking')
+    ServiceSlot = apps.get_model('reservations', 'ServiceSlot')
+    # Slots saved without a business belong to the business of the pets booked on them
+    ServiceSlot.objects.filter(business__isnull=True).update(
+        business=Subquery(
+            ServiceBooking.objects.filter(slot_id=OuterRef('pk')).order_by('id').values('pet__business_id')[:1]
+        )
+    )
+    ServiceBooking.objects.filter(business__isnull=True).update(
+        business=Subquery(ServiceSlot.objects.filter(pk=OuterRef('slot_id')).values('business_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0011_dailyoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicebooking',
+            name='business',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='service_bookings', to='pets.business'),
+        ),
+        migrations.RunPython(copy_slot_business, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='servicebooking',
+            name='business',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_bookings', to='pets.business'),
+        ),
+        migrations.AddIndex(
+            model_name='servicebooking',
+            index=models.Index(fields=['business', 'status', 'requested_at'], name='booking_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0012_servicebooking_business'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveOccupancy',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='live_occupancy', serialize=False, to='pets.business')),
+                ('in_house', models.IntegerField(default=0)),
+                ('pets', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Live occupancy',
+            },
+        ),
+    ]
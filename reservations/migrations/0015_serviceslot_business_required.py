@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_unowned_slots(apps, schema_editor):
+    # 0012 gave booked slots the business of their pets: slots still without one
+    # were never booked, and no business can see them
+    ServiceSlot = apps.get_model('reservations', 'ServiceSlot')
+    ServiceSlot.objects.filter(business__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0014_dashboardchange'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_unowned_slots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='serviceslot',
+            name='business',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_slots', to='pets.business'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def renumber_positions(apps, schema_editor):
+    # Concurrent joins could share a position: keep their order (position, then id)
+    # and renumber only the slots that have duplicates. The constraint comes after this
+    WaitlistEntry = apps.get_model('reservations', 'WaitlistEntry')
+    duplicated = (
+        WaitlistEntry.objects.values('slot_id', 'position').order_by()
+        .annotate(n=models.Count('id')).filter(n__gt=1).values_list('slot_id', flat=True)
+    )
+    for slot_id in set(duplicated):
+        entries = list(WaitlistEntry.objects.filter(slot_id=slot_id).order_by('position', 'id'))
+        for position, entry in enumerate(entries, start=1):
+            entry.position = position
+        WaitlistEntry.objects.bulk_update(entries, ['position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0015_serviceslot_business_required'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_positions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='waitlistentry',
+            name='waitlist_slot_position_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(fields=('slot', 'position'), name='waitlist_slot_position_uniq'),
+        ),
+    ]
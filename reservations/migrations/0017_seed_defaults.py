@@ -0,0 +1,58 @@
+from datetime import time
+from django.db import migrations
+
+# reservations.schedule.SLOT_CONFIG as of this migration: frozen, so later edits to
+# the live grid don't change what this migration does
+SLOT_CONFIG = {
+    'daycare': [(time(8, 0), time(12, 0), 5), (time(14, 0), time(18, 0), 5)],
+    'grooming': [
+        (time(9, 0), time(11, 0), 1), (time(11, 0), time(13, 0), 1),
+        (time(14, 0), time(16, 0), 1), (time(16, 0), time(18, 0), 1),
+    ],
+    'training': [(time(10, 0), time(11, 0), 2), (time(14, 0), time(15, 0), 2), (time(15, 0), time(16, 0), 2)],
+    'walk': [
+        (time(8, 0), time(9, 0), 3), (time(10, 0), time(11, 0), 3),
+        (time(14, 0), time(15, 0), 3), (time(16, 0), time(17, 0), 3),
+    ],
+}
+
+
+def seed_defaults(apps, schema_editor):
+    # The default schedule config and template grid used to be saved on the first
+    # read of a business's schedule; from now on that happens on creation (see
+    # reservations.schedule.seed_defaults), so save them for every business never read
+    Business = apps.get_model('pets', 'Business')
+    ScheduleConfig = apps.get_model('reservations', 'ScheduleConfig')
+    Service = apps.get_model('reservations', 'Service')
+    SlotTemplate = apps.get_model('reservations', 'SlotTemplate')
+    ScheduleConfig.objects.bulk_create(
+        [
+            ScheduleConfig(business_id=business_id)
+            for business_id in Business.objects.filter(schedule_config__isnull=True).values_list('id', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    services = [s for s in Service.objects.all() if SLOT_CONFIG.get(s.type)]
+    SlotTemplate.objects.bulk_create(
+        [
+            SlotTemplate(business_id=business_id, service=service, weekday=weekday,
+                         start_time=start_time, end_time=end_time, max_capacity=capacity)
+            for business_id in Business.objects.filter(slot_templates__isnull=True).values_list('id', flat=True)
+            for service in services
+            for weekday in range(7)
+            for start_time, end_time, capacity in SLOT_CONFIG[service.type]
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('reservations', '0016_waitlist_position_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_defaults, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0017_seed_defaults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleconfig',
+            name='eager_slots',
+            field=models.BooleanField(default=False, help_text='Store every slot of the rolling horizon ahead of time (run_slot_scheduler); otherwise a slot row is created only when booked'),
+        ),
+    ]
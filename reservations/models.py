@@ -1,6 +1,9 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+from petcrm import metrics
 
 class CheckIn(models.Model):
     pet = models.OneToOneField('pets.Pet', on_delete=models.CASCADE)  # ✅ String reference
@@ -17,6 +20,29 @@ class CheckIn(models.Model):
             return f"✅ In since {self.checkin_time.strftime('%H:%M') if self.checkin_time else 'Now'}"
         else:
             return f"❌ Out since {self.checkout_time.strftime('%H:%M') if self.checkout_time else 'Never'}"
+    
+    @classmethod
+    def set_presence(cls, pet, present):
+        """
+        Check a pet in (present=True) or out. The CheckIn row and the business's
+        LiveOccupancy counter change in one transaction, and only when the state
+        actually flips (compare-and-set), so a double tap can't skew the count.
+        Returns (checkin, created, changed); created means the pet's first CheckIn row.
+        """
+        now = timezone.now()
+        fields = {'checkin_time': now, 'checkout_time': None} if present else {'checkout_time': now}
+        with transaction.atomic():
+            checkin, created = cls.objects.get_or_create(pet=pet)
+            changed = cls.objects.filter(pk=checkin.pk, is_present=not present).update(is_present=present, **fields) == 1
+            if changed:
+                LiveOccupancy.adjust(pet.business_id, in_house=1 if present else -1)
+                DashboardChange.record(pet.business_id, 'checkin', [pet.id])
+        if changed:
+            checkin.is_present = present
+            for field, value in fields.items():
+                setattr(checkin, field, value)
+            metrics.inc('petcrm_checkins_total', business=pet.business_id, direction='in' if present else 'out')
+        return checkin, created, changed
 
 
 class PetAttendance(models.Model):
@@ -64,9 +90,29 @@ class Service(models.Model):
         return dict(self.SERVICE_TYPES).get(self.type, self.type)
 
 
+class ServiceSlotQuerySet(models.QuerySet):
+    def reserve(self, slot_id, spots=1):
+        """
+        Take spots on a slot with one conditional UPDATE. The capacity check runs in
+        the database, so concurrent confirmations can never push booked_count past
+        max_capacity. Returns True if the spots were taken.
+        """
+        return self.filter(
+            id=slot_id,
+            booked_count__lte=models.F('max_capacity') - spots,
+        ).update(booked_count=models.F('booked_count') + spots) == 1
+    
+    def release(self, slot_id, spots=1):
+        """Give spots back; never drops booked_count below zero. Returns False if fewer were booked"""
+        return self.filter(
+            id=slot_id,
+            booked_count__gte=spots,
+        ).update(booked_count=models.F('booked_count') - spots) == 1
+
+
 class ServiceSlot(models.Model):
     """Available time slots for services that can be booked"""
-    business = models.ForeignKey('pets.Business', on_delete=models.CASCADE, related_name='service_slots', null=True, blank=True)
+    business = models.ForeignKey('pets.Business', on_delete=models.CASCADE, related_name='service_slots')
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='slots')
     date = models.DateField()
     start_time = models.TimeField()
@@ -76,6 +122,8 @@ class ServiceSlot(models.Model):
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ServiceSlotQuerySet.as_manager()
+    
     class Meta:
         ordering = ['date', 'start_time']
         unique_together = ('business', 'service', 'date', 'start_time')
@@ -90,6 +138,70 @@ class ServiceSlot(models.Model):
         return self.max_capacity - self.booked_count
 
 
+class SlotTemplate(models.Model):
+    """Weekly recurring slot for a service; concrete ServiceSlots are created from it on demand"""
+    WEEKDAYS = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    business = models.ForeignKey('pets.Business', on_delete=models.CASCADE, related_name='slot_templates')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='templates')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField(null=True, blank=True, help_text="Leave blank to use the service duration")
+    max_capacity = models.IntegerField(default=1)
+    is_active = models.BooleanField(default=True)  # Deactivate instead of deleting to stop re-seeding
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        unique_together = ('business', 'service', 'weekday', 'start_time')
+    
+    def __str__(self):
+        return f"{self.business.name} - {self.service.type.title()} {self.get_weekday_display()} {self.start_time}"
+
+
+class ScheduleConfig(models.Model):
+    """Per-business opening hours; compiled together with the SlotTemplates into a cached Schedule"""
+    business = models.OneToOneField('pets.Business', on_delete=models.CASCADE, related_name='schedule_config')
+    opens_at = models.TimeField(default=time(8, 0))
+    closes_at = models.TimeField(default=time(18, 0))
+    half_day_closes_at = models.TimeField(default=time(13, 0), help_text="Closing time on half-day unavailable days")
+    open_weekdays = models.CharField(max_length=7, default='0123456', help_text="Weekdays the business opens (Monday=0), e.g. '01234'")
+    eager_slots = models.BooleanField(default=False, help_text="Store every slot of the rolling horizon ahead of time (run_slot_scheduler); otherwise a slot row is created only when booked")
+    version = models.PositiveIntegerField(default=1, editable=False)  # Bumped on every change that affects the schedule
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.business.name} - {self.opens_at}-{self.closes_at} (v{self.version})"
+    
+    def save(self, *args, **kwargs):
+        # F() so concurrent bumps from template/closure changes are never lost
+        bump = self.pk is not None
+        if bump:
+            self.version = models.F('version') + 1
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
+    
+    def is_open_on(self, weekday):
+        return str(weekday) in self.open_weekdays
+
+
+class SlotFull(Exception):
+    """Raised inside a booking transition to roll it back when the slot has no spots left"""
+
+
+class CapacityMismatch(Exception):
+    """Raised to roll back a transition that gives back more spots than the slot has booked"""
+
+
 class ServiceBooking(models.Model):
     """Booking request from tutor for a service"""
     STATUS_CHOICES = [
@@ -100,6 +212,8 @@ class ServiceBooking(models.Model):
     ]
     
     slot = models.ForeignKey(ServiceSlot, on_delete=models.CASCADE, related_name='bookings')
+    # Copy of slot.business so the pending queue is one index range scan
+    business = models.ForeignKey('pets.Business', on_delete=models.CASCADE, related_name='service_bookings')
     pet = models.ForeignKey('pets.Pet', on_delete=models.CASCADE, related_name='service_bookings')
     tutor = models.ForeignKey('pets.Tutor', on_delete=models.CASCADE, related_name='service_bookings')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -111,28 +225,172 @@ class ServiceBooking(models.Model):
     class Meta:
         ordering = ['-requested_at']
         unique_together = ('slot', 'pet')  # Each pet can only book a slot once
+        indexes = [
+            models.Index(fields=['business', 'status', 'requested_at'], name='booking_queue_idx'),
+        ]
     
     def __str__(self):
         return f"{self.pet.name} - {self.slot.service.type.title()} on {self.slot.date} ({self.status})"
     
+    def save(self, *args, **kwargs):
+        if self.business_id is None and self.slot_id is not None:
+            self.business_id = self.slot.business_id
+        super().save(*args, **kwargs)
+    
     def confirm(self):
-        """Staff confirms the booking"""
-        if self.status == 'pending':
-            self.status = 'confirmed'
-            self.confirmed_at = timezone.now()
-            self.slot.booked_count += 1
-            self.slot.save()
-            self.save()
+        """
+        Staff confirms the booking. The status change and the capacity reservation
+        commit together or not at all. Returns False if the booking was no longer
+        pending (self.status is refreshed) or the slot is full (status stays pending).
+        """
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                if not self._transition(['pending'], 'confirmed', confirmed_at=now):
+                    self.refresh_from_db(fields=['status'])
+                    return False
+                if not ServiceSlot.objects.reserve(self.slot_id):
+                    raise SlotFull()
+                DailyOccupancy.objects.record(self.slot, 'pending', 'confirmed')
+                AvailabilityVersion.bump_for_slot(self.slot_id)
+        except SlotFull:
+            return False
+        self.status = 'confirmed'
+        self.confirmed_at = now
+        return True
     
     def cancel(self):
-        """Cancel the booking (whether pending or confirmed)"""
-        if self.status in ['pending', 'confirmed']:
-            if self.status == 'confirmed':
-                self.slot.booked_count -= 1
-                self.slot.save()
-            self.status = 'cancelled'
-            self.cancelled_at = timezone.now()
-            self.save()
+        """
+        Cancel the booking (whether pending or confirmed). Cancelling a confirmed booking
+        promotes the head of the slot's waitlist. Returns False if it was neither.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            if self._transition(['confirmed'], 'cancelled', cancelled_at=now):
+                if not ServiceSlot.objects.release(self.slot_id):
+                    raise CapacityMismatch(f'Slot {self.slot_id} has no booked spot for confirmed booking {self.pk}')
+                DailyOccupancy.objects.record(self.slot, 'confirmed', 'cancelled')
+                # The freed spot goes to the head of the waitlist in this same transaction
+                WaitlistEntry.objects.promote(self.slot_id)
+            elif self._transition(['pending'], 'cancelled', cancelled_at=now):
+                DailyOccupancy.objects.record(self.slot, 'pending', 'cancelled')
+            else:
+                self.refresh_from_db(fields=['status'])
+                return False
+            AvailabilityVersion.bump_for_slot(self.slot_id)
+        self.status = 'cancelled'
+        self.cancelled_at = now
+        return True
+    
+    def _transition(self, from_statuses, to_status, **fields):
+        """Compare-and-set on status so two staff members can't apply the same transition"""
+        changed = ServiceBooking.objects.filter(
+            pk=self.pk,
+            status__in=from_statuses,
+        ).update(status=to_status, **fields) == 1
+        if changed:
+            DashboardChange.record(self.business_id, 'booking', [self.pk])
+        return changed
+
+
+# Joins racing for the same queue position before one gives up
+JOIN_ATTEMPTS = 5
+
+
+class WaitlistQuerySet(models.QuerySet):
+    def join(self, slot, pet, tutor, notes=''):
+        """
+        Append to the slot queue. Positions only grow, so FIFO order is position order.
+        (slot, position) is unique: when a concurrent join takes the position read
+        here, the next one is read again.
+        """
+        for attempt in range(JOIN_ATTEMPTS):
+            last = self.filter(slot=slot).order_by('-position').values_list('position', flat=True).first()
+            try:
+                with transaction.atomic():
+                    entry, _ = self.get_or_create(
+                        slot=slot,
+                        pet=pet,
+                        defaults={'tutor': tutor, 'notes': notes, 'position': (last or 0) + 1},
+                    )
+                return entry
+            except IntegrityError:
+                if attempt == JOIN_ATTEMPTS - 1:
+                    raise
+    
+    def promote(self, slot_id):
+        """
+        Move waitlisted pets into freed spots as confirmed bookings. Promotion skips
+        the pending step on purpose: the spot is reserved here, and tutors are told on
+        joining that they will be booked automatically. Staff can still cancel it.
+        Each step reads the head through the (slot, position) index and reserves
+        capacity with the same conditional UPDATE as confirm(), so it is O(log n) in
+        the queue length. Returns the bookings created.
+        """
+        promoted = []
+        slot = None
+        while True:
+            head = self.filter(slot_id=slot_id).order_by('position', 'id').first()
+            if head is None or not ServiceSlot.objects.reserve(slot_id):
+                return promoted
+            slot = slot or ServiceSlot.objects.only('business_id', 'service_id', 'date').get(pk=slot_id)
+            now = timezone.now()
+            booking, created = ServiceBooking.objects.get_or_create(
+                slot_id=slot_id,
+                pet_id=head.pet_id,
+                defaults={
+                    'business_id': slot.business_id, 'tutor_id': head.tutor_id, 'notes': head.notes,
+                    'status': 'confirmed', 'confirmed_at': now,
+                },
+            )
+            if created:
+                DailyOccupancy.objects.record(slot, None, 'confirmed')
+            elif booking.status == 'confirmed':
+                # Already holds a spot: hand the one we just reserved back
+                if not ServiceSlot.objects.release(slot_id):
+                    raise CapacityMismatch(f'Slot {slot_id} lost the spot reserved for booking {booking.pk}')
+            else:
+                ServiceBooking.objects.filter(pk=booking.pk).update(
+                    status='confirmed', tutor_id=head.tutor_id, confirmed_at=now, cancelled_at=None,
+                )
+                DailyOccupancy.objects.record(slot, booking.status, 'confirmed')
+                booking.status = 'confirmed'
+            head.delete()
+            DashboardChange.record(slot.business_id, 'booking', [booking.pk])
+            promoted.append(booking)
+    
+    def with_positions(self):
+        """Annotate each entry with its 1-based place in its slot's queue"""
+        ahead = WaitlistEntry.objects.filter(
+            slot_id=models.OuterRef('slot_id'),
+            position__lt=models.OuterRef('position'),
+        ).order_by().values('slot_id').annotate(n=models.Count('id')).values('n')
+        return self.annotate(
+            queue_position=Coalesce(models.Subquery(ahead), 0) + 1
+        )
+
+
+class WaitlistEntry(models.Model):
+    """A pet queued for a full ServiceSlot; promoted to a confirmed booking when a spot frees up"""
+    slot = models.ForeignKey(ServiceSlot, on_delete=models.CASCADE, related_name='waitlist')
+    pet = models.ForeignKey('pets.Pet', on_delete=models.CASCADE, related_name='waitlist_entries')
+    tutor = models.ForeignKey('pets.Tutor', on_delete=models.CASCADE, related_name='waitlist_entries')
+    position = models.PositiveIntegerField()
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = WaitlistQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['slot', 'position']
+        unique_together = ('slot', 'pet')
+        constraints = [
+            # Also the index promote() reads the head through
+            models.UniqueConstraint(fields=['slot', 'position'], name='waitlist_slot_position_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pet.name} - #{self.position} for {self.slot}"
 
 
 class PetReservation(models.Model):
@@ -210,3 +468,388 @@ class BusinessUnavailableDay(models.Model):
     
     def __str__(self):
         return f"{self.business.name} - {self.date} ({self.get_type_display()})"
+
+
+class SlotHorizon(models.Model):
+    """Per-business watermark: service slots are materialized up to and including this date"""
+    business = models.OneToOneField('pets.Business', on_delete=models.CASCADE, related_name='slot_horizon')
+    materialized_through = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.business.name} - slots through {self.materialized_through}"
+    
+    def is_stale(self, target_date):
+        return self.materialized_through < target_date
+
+
+class AvailabilityVersion(models.Model):
+    """
+    Per-business counter bumped whenever slots or bookings change. The tutor
+    availability endpoint derives its ETag from it, so unchanged calendars are
+    answered with 304 Not Modified.
+    """
+    business = models.OneToOneField('pets.Business', on_delete=models.CASCADE, primary_key=True, related_name='availability_version')
+    version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.business.name} - v{self.version}"
+    
+    @classmethod
+    def current(cls, business_id):
+        version = cls.objects.filter(business_id=business_id).values_list('version', flat=True).first()
+        if version is None:
+            # Create the row so later bump_for_slot() updates have something to hit
+            version = cls.objects.get_or_create(business_id=business_id)[0].version
+        return version
+    
+    @classmethod
+    def bump(cls, business_id):
+        if business_id is None:
+            return
+        if not cls.objects.filter(business_id=business_id).update(version=models.F('version') + 1):
+            obj, created = cls.objects.get_or_create(business_id=business_id, defaults={'version': 1})
+            if not created:
+                cls.objects.filter(business_id=business_id).update(version=models.F('version') + 1)
+    
+    @classmethod
+    def bump_for_slot(cls, slot_id):
+        """Bump the slot's business without loading the slot (one UPDATE with a subquery)"""
+        business = ServiceSlot.objects.filter(id=slot_id).values('business_id')[:1]
+        cls.objects.filter(business_id=models.Subquery(business)).update(version=models.F('version') + 1)
+
+
+class DashboardVersion(models.Model):
+    """Per-business counter behind the staff dashboard delta feed: the latest DashboardChange version"""
+    business = models.OneToOneField('pets.Business', on_delete=models.CASCADE, primary_key=True, related_name='dashboard_version')
+    version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.business.name} - v{self.version}"
+    
+    @classmethod
+    def current(cls, business_id):
+        return cls.objects.filter(business_id=business_id).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def allocate(cls, business_id, count):
+        """
+        Add `count` to the counter and return the new value. The UPDATE keeps the row
+        locked until the caller commits, so versions commit in order. One statement
+        where the backend has UPDATE ... RETURNING (it runs on every check-in).
+        """
+        if connection.vendor == 'postgresql' or (connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {connection.ops.quote_name(cls._meta.db_table)} SET version = version + %s '
+                    f'WHERE business_id = %s RETURNING version',
+                    [count, business_id],
+                )
+                row = cursor.fetchone()
+            if row:
+                return row[0]
+        elif cls.objects.filter(business_id=business_id).update(version=models.F('version') + count):
+            return cls.current(business_id)
+        obj, created = cls.objects.get_or_create(business_id=business_id, defaults={'version': count})
+        return count if created else cls.allocate(business_id, count)
+
+
+class DashboardChange(models.Model):
+    """
+    One entry per change the staff dashboard shows live: a pet checked in or out, or a
+    booking changing status. Versions are contiguous per business (allocated from
+    DashboardVersion in the writer's transaction), so a client polling with the last
+    version it saw reads only newer entries and can tell when entries it missed have
+    been pruned.
+    """
+    KIND_CHOICES = [
+        ('checkin', 'Check-in'),  # object_id is the pet
+        ('booking', 'Booking'),   # object_id is the booking
+    ]
+    
+    business = models.ForeignKey('pets.Business', on_delete=models.CASCADE, related_name='dashboard_changes')
+    version = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    # Entries kept per business; clients further behind reload the whole page
+    KEEP = 1000
+    
+    class Meta:
+        ordering = ['business', 'version']
+        unique_together = ('business', 'version')
+    
+    def __str__(self):
+        return f"{self.business.name} v{self.version}: {self.kind} {self.object_id}"
+    
+    @classmethod
+    def record(cls, business_id, kind, object_ids):
+        """
+        Append one entry per object with the business's next versions. Call it inside
+        the transaction making the change, so both commit or roll back together.
+        """
+        object_ids = list(dict.fromkeys(object_ids))
+        if business_id is None or not object_ids:
+            return
+        count = len(object_ids)
+        last = DashboardVersion.allocate(business_id, count)
+        cls.objects.bulk_create([
+            cls(business_id=business_id, version=last - count + 1 + i, kind=kind, object_id=object_id)
+            for i, object_id in enumerate(object_ids)
+        ])
+        if last // cls.KEEP != (last - count) // cls.KEEP:
+            cls.objects.filter(business_id=business_id, version__lte=last - cls.KEEP).delete()
+    
+    @classmethod
+    def since(cls, business_id, version, limit):
+        """
+        Entries after `version`, oldest first, read with one range scan of the
+        (business, version) index. None when the client has to reload instead:
+        the entries it needs were pruned, there are more than `limit`, or it is
+        ahead of the log (a version this business never reached).
+        """
+        entries = list(cls.objects.filter(business_id=business_id, version__gte=version).order_by('version')[:limit + 2])
+        if version > 0:
+            # The scan starts at the client's own entry: pruning always keeps the
+            # newest ones, so it is missing only if the client is ahead (or far behind)
+            if not entries or entries[0].version != version:
+                return None
+            entries = entries[1:]
+        if entries and (entries[0].version != version + 1 or len(entries) > limit):
+            return None
+        return entries
+
+
+class DailyOccupancyQuerySet(models.QuerySet):
+    # Counter deltas per booking status transition (from_status, to_status);
+    # 'booked' counts spots held, i.e. confirmed bookings
+    TRANSITIONS = {
+        (None, 'pending'): {'pending': 1},
+        (None, 'confirmed'): {'confirmed': 1, 'booked': 1},
+        ('pending', 'confirmed'): {'pending': -1, 'confirmed': 1, 'booked': 1},
+        ('pending', 'cancelled'): {'pending': -1, 'cancelled': 1},
+        ('confirmed', 'cancelled'): {'confirmed': -1, 'booked': -1, 'cancelled': 1},
+        ('cancelled', 'pending'): {'cancelled': -1, 'pending': 1},
+        ('cancelled', 'confirmed'): {'cancelled': -1, 'confirmed': 1, 'booked': 1},
+    }
+    COUNTERS = ('booked', 'pending', 'confirmed', 'cancelled')
+    
+    def for_range(self, business, start_date, end_date):
+        """One range scan on the (business, date, service) unique index"""
+        return self.filter(business=business, date__gte=start_date, date__lte=end_date).select_related('service')
+    
+    def record(self, slot, from_status, to_status, count=1):
+        """Apply one booking status transition on a slot to its day's rollup row"""
+        self.record_many(slot.business_id, [(slot.date, slot.service_id, from_status, to_status, count)])
+    
+    def record_many(self, business_id, changes):
+        """
+        Apply (date, service_id, from_status, to_status, count) changes for one business
+        with a single UPDATE of F() + CASE deltas. Rows that don't exist yet are created
+        (capacity taken from the compiled schedule) and the deltas re-applied to them.
+        """
+        deltas = {}
+        for date, service_id, from_status, to_status, count in changes:
+            if count:
+                metrics.inc('petcrm_booking_transitions_total', count, business=business_id, status=to_status)
+            key_deltas = deltas.setdefault((date, service_id), dict.fromkeys(self.COUNTERS, 0))
+            for field, delta in self.TRANSITIONS.get((from_status, to_status), {}).items():
+                key_deltas[field] += delta * count
+        deltas = {key: d for key, d in deltas.items() if any(d.values())}
+        if not deltas or business_id is None:
+            return
+        if self._apply(business_id, deltas) < len(deltas):
+            existing = set(
+                self.filter(business_id=business_id, date__in={d for d, _ in deltas})
+                .values_list('date', 'service_id')
+            )
+            missing = [key for key in deltas if key not in existing]
+            capacities = day_capacities(business_id, missing)
+            self.bulk_create(
+                [
+                    DailyOccupancy(business_id=business_id, date=date, service_id=service_id,
+                                   capacity=capacities[date, service_id])
+                    for date, service_id in missing
+                ],
+                ignore_conflicts=True,
+            )
+            self._apply(business_id, {key: deltas[key] for key in missing})
+    
+    def _apply(self, business_id, deltas):
+        keys = models.Q()
+        for date, service_id in deltas:
+            keys |= models.Q(date=date, service_id=service_id)
+        updates = {}
+        for field in self.COUNTERS:
+            whens = [
+                models.When(date=date, service_id=service_id, then=models.Value(d[field]))
+                for (date, service_id), d in deltas.items() if d[field]
+            ]
+            if whens:
+                updates[field] = models.F(field) + models.Case(*whens, default=models.Value(0))
+        return self.filter(keys, business_id=business_id).update(**updates)
+
+
+def day_capacities(business_id, keys):
+    """
+    Spots offered per (date, service_id) in `keys`: schedule slots with concrete
+    overrides applied. One ServiceSlot query and one compiled schedule for all keys.
+    """
+    from .schedule import get_schedule
+    from pets.models import Business
+    keys = set(keys)
+    if not keys:
+        return {}
+    capacities = dict.fromkeys(keys, 0)
+    concrete = set()
+    slots = ServiceSlot.objects.filter(
+        business_id=business_id, date__in={d for d, _ in keys}, service_id__in={s for _, s in keys},
+    ).values_list('date', 'service_id', 'start_time', 'max_capacity', 'is_available')
+    for date, service_id, start_time, max_capacity, is_available in slots:
+        if (date, service_id) in keys:
+            concrete.add((date, service_id, start_time))
+            if is_available:
+                capacities[date, service_id] += max_capacity
+    schedule = get_schedule(Business(id=business_id))
+    for date in {d for d, _ in keys}:
+        for spec in schedule.slots_on(date):
+            key = (date, spec.service_id)
+            if key in keys and (date, spec.service_id, spec.start_time) not in concrete:
+                capacities[key] += spec.max_capacity
+    return capacities
+
+
+class DailyOccupancy(models.Model):
+    """Per-day, per-service booking rollup, updated on every booking status transition"""
+    business = models.ForeignKey('pets.Business', on_delete=models.CASCADE, related_name='daily_occupancy')
+    date = models.DateField()
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='daily_occupancy')
+    capacity = models.IntegerField(default=0)  # Refreshed by rebuild_occupancy
+    booked = models.IntegerField(default=0)  # Spots held by confirmed bookings
+    pending = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = DailyOccupancyQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['date', 'service']
+        unique_together = ('business', 'date', 'service')
+        verbose_name_plural = "Daily occupancy"
+    
+    def __str__(self):
+        return f"{self.business.name} - {self.service} on {self.date}: {self.booked}/{self.capacity}"
+    
+    @property
+    def fill_pct(self):
+        return (self.booked / self.capacity * 100) if self.capacity else 0
+
+
+class LiveOccupancy(models.Model):
+    """
+    Pets in house right now, per business. Adjusted in the same transaction as
+    every check-in/check-out (CheckIn.set_presence) and cached, so the dashboard
+    headline is one cache hit; reconcile_live_occupancy recomputes it nightly from
+    CheckIn.is_present to repair drift from bulk writes.
+    """
+    business = models.OneToOneField('pets.Business', on_delete=models.CASCADE, primary_key=True, related_name='live_occupancy')
+    in_house = models.IntegerField(default=0)
+    pets = models.IntegerField(default=0)  # Pets registered with the business
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Per-process caches (the default LocMemCache) may lag a write in another worker by this long
+    CACHE_SECONDS = 10
+    
+    class Meta:
+        verbose_name_plural = "Live occupancy"
+    
+    def __str__(self):
+        return f"{self.business.name}: {self.in_house}/{self.pets} in house"
+    
+    @property
+    def occupancy_pct(self):
+        return (self.in_house / self.pets * 100) if self.pets else 0
+    
+    @staticmethod
+    def cache_key(business_id):
+        return f'live-occupancy:{business_id}'
+    
+    @classmethod
+    def count(cls, business_id):
+        """Recompute from the source rows: {'in_house': n, 'pets': n}"""
+        from pets.models import Pet
+        return {
+            'in_house': CheckIn.objects.filter(pet__business_id=business_id, is_present=True).count(),
+            'pets': Pet.objects.filter(business_id=business_id).count(),
+        }
+    
+    @classmethod
+    def current(cls, business_id):
+        """The business's counters: a cache hit, else one primary-key read (created on first use)"""
+        key = cls.cache_key(business_id)
+        live = cache.get(key)
+        if live is None:
+            live = cls.objects.filter(business_id=business_id).first()
+            if live is None:
+                live = cls.objects.get_or_create(business_id=business_id, defaults=cls.count(business_id))[0]
+            cache.set(key, live, cls.CACHE_SECONDS)
+        return live
+    
+    @classmethod
+    def adjust(cls, business_id, in_house=0, pets=0, create=True):
+        """
+        Add deltas with one conditional UPDATE. A missing row is created from a fresh
+        count, which already includes the caller's uncommitted change; create=False
+        (delete signals) never recreates a row mid-cascade.
+        """
+        updated = cls.objects.filter(business_id=business_id).update(
+            in_house=models.F('in_house') + in_house, pets=models.F('pets') + pets, updated_at=timezone.now(),
+        )
+        if not updated and create:
+            live, created = cls.objects.get_or_create(business_id=business_id, defaults=cls.count(business_id))
+            if not created:
+                cls.objects.filter(business_id=business_id).update(
+                    in_house=models.F('in_house') + in_house, pets=models.F('pets') + pets, updated_at=timezone.now(),
+                )
+        key = cls.cache_key(business_id)
+        transaction.on_commit(lambda: cache.delete(key))
+    
+    @classmethod
+    def reconcile(cls, business_ids=None):
+        """
+        Recompute every business's counters (or those in business_ids) with two grouped
+        queries and upsert them. Returns {business_id: (old, new)} for rows that had
+        drifted, old being None for a business that had no row yet.
+        """
+        from pets.models import Business, Pet
+        businesses = Business.objects.all()
+        if business_ids is not None:
+            businesses = businesses.filter(id__in=business_ids)
+        ids = list(businesses.values_list('id', flat=True))
+        pets = dict(
+            Pet.objects.filter(business_id__in=ids).values('business_id')
+            .annotate(n=models.Count('id')).values_list('business_id', 'n')
+        )
+        in_house = dict(
+            CheckIn.objects.filter(pet__business_id__in=ids, is_present=True).values('pet__business_id')
+            .annotate(n=models.Count('id')).values_list('pet__business_id', 'n')
+        )
+        existing = {row.business_id: row for row in cls.objects.filter(business_id__in=ids)}
+        drift = {}
+        rows = []
+        now = timezone.now()
+        for business_id in ids:
+            new = (in_house.get(business_id, 0), pets.get(business_id, 0))
+            row = existing.get(business_id)
+            old = (row.in_house, row.pets) if row else None
+            if old != new:
+                drift[business_id] = (old, new)
+                rows.append(cls(business_id=business_id, in_house=new[0], pets=new[1], updated_at=now))
+        cls.objects.bulk_create(
+            rows, batch_size=500, update_conflicts=True,
+            unique_fields=['business'], update_fields=['in_house', 'pets', 'updated_at'],
+        )
+        cache.delete_many([cls.cache_key(business_id) for business_id in drift])
+        return drift
@@ -0,0 +1,268 @@
+"""
+Compiled per-business schedules.
+
+A business's ScheduleConfig (opening hours), active SlotTemplates and upcoming
+BusinessUnavailableDay entries are compiled into an immutable Schedule that is
+cached per process and keyed by ScheduleConfig.version. Any change to those rows
+bumps the version (see reservations.signals), so every process recompiles on its
+next lookup while unchanged businesses cost a single config query.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from types import MappingProxyType
+from django.db.models import F
+from pets.models import Business
+from .models import BusinessUnavailableDay, ScheduleConfig, Service, SlotTemplate
+
+
+# Default weekly grid seeded for a business that has no templates yet:
+# (start_time, end_time, capacity) per service type, every day of the week
+SLOT_CONFIG = {
+    'daycare': [
+        (time(8, 0), time(12, 0), 5),    # Morning: 8am-12pm, 5 spots
+        (time(14, 0), time(18, 0), 5),   # Afternoon: 2pm-6pm, 5 spots
+    ],
+    'grooming': [
+        (time(9, 0), time(11, 0), 1),    # Slot 1: 9am-11am, 1 spot
+        (time(11, 0), time(13, 0), 1),   # Slot 2: 11am-1pm, 1 spot
+        (time(14, 0), time(16, 0), 1),   # Slot 3: 2pm-4pm, 1 spot
+        (time(16, 0), time(18, 0), 1),   # Slot 4: 4pm-6pm, 1 spot
+    ],
+    'training': [
+        (time(10, 0), time(11, 0), 2),   # Slot 1: 10am-11am, 2 spots
+        (time(14, 0), time(15, 0), 2),   # Slot 2: 2pm-3pm, 2 spots
+        (time(15, 0), time(16, 0), 2),   # Slot 3: 3pm-4pm, 2 spots
+    ],
+    'walk': [
+        (time(8, 0), time(9, 0), 3),     # Slot 1: 8am-9am, 3 spots
+        (time(10, 0), time(11, 0), 3),   # Slot 2: 10am-11am, 3 spots
+        (time(14, 0), time(15, 0), 3),   # Slot 3: 2pm-3pm, 3 spots
+        (time(16, 0), time(17, 0), 3),   # Slot 4: 4pm-5pm, 3 spots
+    ],
+}
+
+# BusinessUnavailableDay types that close the business for the whole day
+CLOSED_DAY_TYPES = ('closed', 'holiday', 'strike')
+
+
+@dataclass(frozen=True)
+class SlotSpec:
+    """One recurring slot of a compiled schedule"""
+    template_id: int
+    service: Service
+    start_time: time
+    end_time: time
+    max_capacity: int
+
+    @property
+    def service_id(self):
+        return self.service.id
+
+
+@dataclass(frozen=True)
+class Schedule:
+    business_id: int
+    version: int
+    weekly: tuple            # 7 tuples of SlotSpec, Monday first
+    closed_dates: frozenset
+    half_day_dates: frozenset
+    half_day_closes_at: time
+    by_template: MappingProxyType  # template_id -> SlotSpec
+
+    def slots_on(self, date):
+        """SlotSpecs offered on a date, honouring closures and half days"""
+        if date in self.closed_dates:
+            return ()
+        specs = self.weekly[date.weekday()]
+        if date in self.half_day_dates:
+            return tuple(s for s in specs if s.end_time <= self.half_day_closes_at)
+        return specs
+
+    def spec_for(self, template_id, date):
+        """The SlotSpec for a template on a date, or None if it isn't offered that day"""
+        spec = self.by_template.get(template_id)
+        if spec is None or spec not in self.slots_on(date):
+            return None
+        return spec
+
+
+# business_id -> Schedule; plain dict assignment is atomic under the GIL
+_schedules = {}
+
+
+def get_schedule(business):
+    return get_schedules([business])[business.id]
+
+
+def get_schedules(businesses):
+    """
+    {business_id: Schedule} for many businesses with one version query; only
+    businesses whose version moved since the cached compile are rebuilt.
+    """
+    businesses = list(businesses)
+    configs = {
+        c.business_id: c
+        for c in ScheduleConfig.objects.filter(business__in=businesses)
+    }
+    # Read only: a business without a config row yet (see seed_defaults) gets the
+    # defaults. Version 0 is older than any saved row, so saving one recompiles
+    for biz in businesses:
+        if biz.id not in configs:
+            configs[biz.id] = ScheduleConfig(business_id=biz.id, version=0)
+
+    stale = [
+        c for c in configs.values()
+        if c.business_id not in _schedules or _schedules[c.business_id].version != c.version
+    ]
+    if stale:
+        for schedule in compile_schedules(stale):
+            _schedules[schedule.business_id] = schedule
+    return {biz.id: _schedules[biz.id] for biz in businesses}
+
+
+def unavailable_days(business_ids, start_date, end_date=None):
+    """
+    ({business_id: closed dates}, {business_id: half-day dates}) recorded from
+    start_date through end_date (open-ended if None), in one query.
+    """
+    closed, half_days = {}, {}
+    days = BusinessUnavailableDay.objects.filter(business_id__in=business_ids, date__gte=start_date)
+    if end_date is not None:
+        days = days.filter(date__lte=end_date)
+    for business_id, date, day_type in days.values_list('business_id', 'date', 'type'):
+        if day_type in CLOSED_DAY_TYPES:
+            closed.setdefault(business_id, set()).add(date)
+        elif day_type == 'half_day':
+            half_days.setdefault(business_id, set()).add(date)
+    return closed, half_days
+
+
+def compile_schedules(configs, closures_from=None):
+    """
+    Schedules for the given ScheduleConfigs. Only closures from closures_from on
+    are loaded (default yesterday: the cached schedules serve upcoming dates);
+    callers looking at older dates pass their own start, or use unavailable_days.
+    """
+    business_ids = [c.business_id for c in configs]
+    weekly = templates_for(business_ids)
+    if closures_from is None:
+        closures_from = datetime.now().date() - timedelta(days=1)
+    closed, half_days = unavailable_days(business_ids, closures_from)
+
+    for config in configs:
+        days = [() for _ in range(7)]
+        by_template = {}
+        for weekday, templates in weekly[config.business_id].items():
+            if not config.is_open_on(weekday):
+                continue
+            specs = []
+            for template in templates:
+                spec = _compile_template(template, config)
+                if spec:
+                    specs.append(spec)
+                    by_template[spec.template_id] = spec
+            days[weekday] = tuple(specs)
+        yield Schedule(
+            business_id=config.business_id,
+            version=config.version,
+            weekly=tuple(days),
+            closed_dates=frozenset(closed.get(config.business_id, ())),
+            half_day_dates=frozenset(half_days.get(config.business_id, ())),
+            half_day_closes_at=config.half_day_closes_at,
+            by_template=MappingProxyType(by_template),
+        )
+
+
+def _compile_template(template, config):
+    end_time = template.end_time
+    if end_time is None:
+        start = datetime.combine(datetime.min, template.start_time)
+        end_time = (start + timedelta(minutes=template.service.duration_minutes)).time()
+    if template.start_time < config.opens_at or end_time > config.closes_at or end_time <= template.start_time:
+        return None  # Outside opening hours (or wraps past midnight)
+    return SlotSpec(
+        template_id=template.id,
+        service=template.service,
+        start_time=template.start_time,
+        end_time=end_time,
+        max_capacity=template.max_capacity,
+    )
+
+
+def templates_for(business_ids):
+    """
+    Active templates grouped as {business_id: {weekday: [template, ...]}}, in one query.
+    Read only: default templates are saved by seed_defaults(), never here.
+    """
+    business_ids = list(business_ids)
+    templates = SlotTemplate.objects.filter(business_id__in=business_ids).select_related('service')
+
+    grouped = {bid: {} for bid in business_ids}
+    for template in templates:
+        if template.is_active:
+            grouped[template.business_id].setdefault(template.weekday, []).append(template)
+    return grouped
+
+
+def seed_defaults(business_ids=None):
+    """
+    Save the default ScheduleConfig of businesses that have none, and the SLOT_CONFIG
+    grid for every (business, service) pair without templates, so a service added
+    later reaches existing businesses too; None checks all businesses. Returns the
+    number of templates created.
+    """
+    businesses = Business.objects.all()
+    if business_ids is not None:
+        businesses = businesses.filter(id__in=list(business_ids))
+    ScheduleConfig.objects.bulk_create(
+        [
+            ScheduleConfig(business_id=business_id)
+            for business_id in businesses.filter(schedule_config__isnull=True).values_list('id', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    services = [s for s in Service.objects.all() if SLOT_CONFIG.get(s.type)]
+    if not services:
+        return 0
+    # Inactive templates count: deactivating a service's grid must not re-seed it
+    seeded = set(
+        SlotTemplate.objects.filter(business__in=businesses)
+        .values_list('business_id', 'service_id').distinct()
+    )
+    missing = [
+        (business_id, service)
+        for business_id in businesses.values_list('id', flat=True)
+        for service in services
+        if (business_id, service.id) not in seeded
+    ]
+    new_templates = [
+        SlotTemplate(
+            business_id=business_id,
+            service=service,
+            weekday=weekday,
+            start_time=start_time,
+            end_time=end_time,
+            max_capacity=capacity,
+        )
+        for business_id, service in missing
+        for weekday in range(7)
+        for start_time, end_time, capacity in SLOT_CONFIG[service.type]
+    ]
+    # ignore_conflicts: a concurrent pass may seed the same pair
+    SlotTemplate.objects.bulk_create(new_templates, ignore_conflicts=True)
+    if new_templates:
+        # bulk_create sends no signals
+        bump_schedule_version({business_id for business_id, _ in missing})
+    return len(new_templates)
+
+
+def bump_schedule_version(business_ids=None):
+    """Invalidate compiled schedules everywhere; None bumps every business"""
+    configs = ScheduleConfig.objects.all()
+    if business_ids is not None:
+        configs = configs.filter(business_id__in=business_ids)
+        for business_id in business_ids:
+            _schedules.pop(business_id, None)
+    else:
+        _schedules.clear()
+    configs.update(version=F('version') + 1)
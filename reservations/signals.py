@@ -0,0 +1,77 @@
+"""
+Keep derived state in step with the rows it is built from: compiled schedules
+(reservations.schedule) and the per-business availability version. Bulk writes and
+queryset updates don't send signals; those paths bump explicitly. New businesses
+get their default schedule here (and from the slot scheduler), not on reads.
+"""
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from pets.models import Business, Pet
+from .models import (
+    AvailabilityVersion, BusinessUnavailableDay, CheckIn, LiveOccupancy, Service, ServiceBooking, ServiceSlot, SlotTemplate,
+)
+from .schedule import bump_schedule_version, seed_defaults
+
+
+@receiver(post_save, sender=SlotTemplate)
+@receiver(post_delete, sender=SlotTemplate)
+@receiver(post_save, sender=BusinessUnavailableDay)
+@receiver(post_delete, sender=BusinessUnavailableDay)
+def invalidate_business_schedule(sender, instance, **kwargs):
+    bump_schedule_version([instance.business_id])
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_all_schedules(sender, instance, **kwargs):
+    # duration_minutes feeds every template without an explicit end time
+    bump_schedule_version()
+
+
+@receiver(post_save, sender=Business)
+def seed_new_business(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        seed_defaults([instance.id])
+
+
+@receiver(post_save, sender=Service)
+def seed_waiting_businesses(sender, instance, created, raw=False, **kwargs):
+    # Existing businesses get the new service's default grid
+    if created and not raw:
+        seed_defaults()
+
+
+@receiver(post_save, sender=ServiceSlot)
+def bump_slot_availability(sender, instance, **kwargs):
+    AvailabilityVersion.bump(instance.business_id)
+
+
+@receiver(post_delete, sender=ServiceSlot)
+def bump_deleted_slot_availability(sender, instance, **kwargs):
+    # Update only: when the business itself is being deleted, its version row is
+    # already gone and must not be recreated mid-cascade
+    AvailabilityVersion.objects.filter(business_id=instance.business_id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=ServiceBooking)
+@receiver(post_delete, sender=ServiceBooking)
+def bump_booking_availability(sender, instance, **kwargs):
+    AvailabilityVersion.bump_for_slot(instance.slot_id)
+
+
+@receiver(post_delete, sender=CheckIn)
+def release_deleted_checkin(sender, instance, **kwargs):
+    if instance.is_present:
+        LiveOccupancy.adjust(instance.pet.business_id, in_house=-1, create=False)
+
+
+@receiver(post_save, sender=Pet)
+def count_new_pet(sender, instance, created, **kwargs):
+    if created:
+        LiveOccupancy.adjust(instance.business_id, pets=1, create=False)
+
+
+@receiver(post_delete, sender=Pet)
+def count_deleted_pet(sender, instance, **kwargs):
+    LiveOccupancy.adjust(instance.business_id, pets=-1, create=False)
@@ -1,3 +1,220 @@
-from django.test import TestCase
+from datetime import date, time
+from unittest import mock
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from pets.models import Business, Pet, Tutor
+from .booking import insert_bookings, join_waitlists
+from .management.commands.stress_booking_capacity import stress
+from .forecast import forecast_capacity, load_slot_history
+from .schedule import compile_schedules, seed_defaults, unavailable_days
+from .utils import extend_slot_horizon
+from .models import BusinessUnavailableDay, CapacityMismatch, DashboardChange, ScheduleConfig, Service, ServiceBooking, ServiceSlot, SlotTemplate, WaitlistEntry
 
-# Create your tests here.
+
+class ForecastHistoryTests(TestCase):
+    """Slots nobody booked are observations too, or demand is overstated"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Forecast')
+        cls.service, _ = Service.objects.get_or_create(type='daycare')
+        # One morning slot a day instead of the default grid
+        SlotTemplate.objects.filter(business=cls.business).delete()
+        SlotTemplate.objects.bulk_create([
+            SlotTemplate(business=cls.business, service=cls.service, weekday=weekday,
+                         start_time=time(8, 0), end_time=time(12, 0), max_capacity=2)
+            for weekday in range(7)
+        ])
+        # Monday 5 Jan 2026 is the first day with a concrete slot: both spots requested
+        slot = ServiceSlot.objects.create(
+            business=cls.business, service=cls.service, date=date(2026, 1, 5),
+            start_time=time(8, 0), end_time=time(12, 0), max_capacity=2,
+        )
+        tutor = Tutor.objects.create(name='Forecast Tutor', business=cls.business)
+        pets = Pet.objects.bulk_create([Pet(name=f'Forecast Pet {n}', business=cls.business) for n in range(2)])
+        ServiceBooking.objects.bulk_create([
+            ServiceBooking(slot=slot, business=cls.business, pet=pet, tutor=tutor) for pet in pets
+        ])
+        BusinessUnavailableDay.objects.create(business=cls.business, date=date(2026, 1, 10), type='closed')
+
+    def test_empty_slots_are_observed(self):
+        history = load_slot_history([self.business.id], date(2026, 1, 1), date(2026, 1, 18))
+        # 5-18 Jan, less the closed Saturday; nothing before the first concrete slot
+        self.assertEqual(len(history.demand), 13)
+        self.assertEqual(sorted(history.demand.tolist()), [0] * 12 + [2])
+        self.assertEqual(history.weekday[0], 0)
+
+        mondays = next(
+            row for row in forecast_capacity([self.business.id], date(2026, 1, 1), date(2026, 1, 18)).rows()
+            if row['weekday'] == 0
+        )
+        self.assertEqual(mondays['slots_observed'], 2)
+        self.assertEqual(mondays['mean_demand'], 1.0)
+        self.assertEqual(mondays['current_overflow'], 0.0)
+
+    def test_past_closures_on_request(self):
+        config = ScheduleConfig.objects.get(business=self.business)
+        schedule, = compile_schedules([config], closures_from=date(2026, 1, 1))
+        self.assertEqual(schedule.slots_on(date(2026, 1, 10)), ())
+        closed, _ = unavailable_days([self.business.id], date(2026, 1, 11), date(2026, 1, 18))
+        self.assertEqual(closed, {})
+
+
+class SeedDefaultsTests(TestCase):
+    """Default schedules are saved when a business is created, not when it is first read"""
+
+    def test_created_and_bulk_inserted_businesses(self):
+        Service.objects.get_or_create(type='daycare')
+        created = Business.objects.create(name='Created')
+        self.assertTrue(ScheduleConfig.objects.filter(business=created).exists())
+        self.assertEqual(SlotTemplate.objects.filter(business=created).count(), 14)
+
+        # No signal: left to the slot scheduler
+        inserted, = Business.objects.bulk_create([Business(name='Inserted')])
+        self.assertFalse(SlotTemplate.objects.filter(business=inserted).exists())
+        self.assertEqual(seed_defaults(), 14)
+        self.assertTrue(ScheduleConfig.objects.filter(business=inserted).exists())
+        self.assertEqual(seed_defaults(), 0)
+
+    def test_service_added_later(self):
+        Service.objects.get_or_create(type='daycare')
+        business = Business.objects.create(name='Existing')
+        walk = Service.objects.create(type='walk')
+        self.assertEqual(SlotTemplate.objects.filter(business=business, service=walk).count(), 28)
+
+        # A deactivated grid stays deactivated; a deleted one comes back
+        SlotTemplate.objects.filter(business=business, service=walk).update(is_active=False)
+        self.assertEqual(seed_defaults([business.id]), 0)
+        SlotTemplate.objects.filter(business=business, service=walk).delete()
+        self.assertEqual(seed_defaults([business.id]), 28)
+
+
+class EagerSlotsTests(TestCase):
+    """Only businesses that opt in get their slot horizon stored ahead of time"""
+
+    def test_scheduler_extends_eager_businesses_only(self):
+        Service.objects.get_or_create(type='daycare')
+        lazy, eager = Business.objects.create(name='Lazy'), Business.objects.create(name='Eager')
+        ScheduleConfig.objects.filter(business=eager).update(eager_slots=True)
+
+        created = extend_slot_horizon(today=date(2030, 1, 7))
+        self.assertEqual(list(created), [eager.id])
+        self.assertTrue(created[eager.id])
+        self.assertFalse(ServiceSlot.objects.filter(business=lazy).exists())
+
+
+class BookingConflictTests(TestCase):
+    """A pet booked on a slot by a concurrent submit fails that slot, not the request"""
+
+    def test_taken_slots_are_left_out(self):
+        business = Business.objects.create(name='Conflicts')
+        service, _ = Service.objects.get_or_create(type='daycare')
+        slots = [
+            ServiceSlot.objects.create(business=business, service=service, date=date(2030, 1, day),
+                                       start_time=time(8, 0), end_time=time(12, 0), max_capacity=2)
+            for day in (1, 2)
+        ]
+        tutor = Tutor.objects.create(name='Conflict Tutor', business=business)
+        pet = Pet.objects.create(name='Conflict Pet', business=business)
+        ServiceBooking.objects.create(slot=slots[0], business=business, pet=pet, tutor=tutor)
+
+        created, taken = insert_bookings([
+            ServiceBooking(slot=slot, business=business, pet=pet, tutor=tutor) for slot in slots
+        ])
+        self.assertEqual([b.slot_id for b in created], [slots[1].id])
+        self.assertIsNotNone(created[0].id)
+        self.assertEqual([b.slot_id for b in taken], [slots[0].id])
+        self.assertEqual(ServiceBooking.objects.filter(pet=pet).count(), 2)
+
+
+class WaitlistJoinTests(TestCase):
+    """Two joins can't share a queue position"""
+
+    def test_stale_position_is_read_again(self):
+        business = Business.objects.create(name='Waitlist')
+        service, _ = Service.objects.get_or_create(type='daycare')
+        slot = ServiceSlot.objects.create(business=business, service=service, date=date(2030, 1, 1),
+                                          start_time=time(8, 0), end_time=time(12, 0), max_capacity=1)
+        tutor = Tutor.objects.create(name='Waitlist Tutor', business=business)
+        first, second = Pet.objects.bulk_create([Pet(name=f'Waitlist Pet {n}', business=business) for n in range(2)])
+        WaitlistEntry.objects.join(slot, first, tutor)
+
+        # As if the first join had not committed when the second read the queue
+        reads = []
+        real_first = QuerySet.first
+        def stale_first(queryset):
+            reads.append(queryset)
+            return None if len(reads) == 1 else real_first(queryset)
+        with mock.patch.object(QuerySet, 'first', stale_first):
+            entry = WaitlistEntry.objects.join(slot, second, tutor)
+        self.assertEqual(entry.position, 2)
+        self.assertEqual(len(reads), 2)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            WaitlistEntry.objects.create(slot=slot, pet=Pet.objects.create(name='Third', business=business),
+                                         tutor=tutor, position=1)
+
+    def test_bulk_join_losing_a_position_race(self):
+        business = Business.objects.create(name='Bulk Waitlist')
+        service, _ = Service.objects.get_or_create(type='daycare')
+        slot = ServiceSlot.objects.create(business=business, service=service, date=date(2030, 1, 1),
+                                          start_time=time(8, 0), end_time=time(12, 0), max_capacity=1)
+        tutor = Tutor.objects.create(name='Bulk Tutor', business=business)
+        ours, theirs = Pet.objects.bulk_create([Pet(name=f'Bulk Pet {n}', business=business) for n in range(2)])
+
+        # A concurrent join takes the position after it was read
+        bulk_create = WaitlistEntry.objects.bulk_create
+        def racing(entries, **kwargs):
+            WaitlistEntry.objects.create(slot=slot, pet=theirs, tutor=tutor, position=entries[0].position)
+            return bulk_create(entries, **kwargs)
+        with mock.patch.object(WaitlistEntry.objects, 'bulk_create', racing):
+            queued = join_waitlists([slot], tutor, ours)
+        self.assertEqual(queued, [slot])
+        self.assertEqual(WaitlistEntry.objects.get(slot=slot, pet=ours).position, 2)
+
+
+
+class ReleaseTests(TestCase):
+    """Giving back a spot the slot never counted rolls the cancellation back"""
+
+    def test_cancel_without_booked_spot(self):
+        business = Business.objects.create(name='Release')
+        service, _ = Service.objects.get_or_create(type='daycare')
+        slot = ServiceSlot.objects.create(business=business, service=service, date=date(2030, 1, 1),
+                                          start_time=time(8, 0), end_time=time(12, 0), max_capacity=1)
+        tutor = Tutor.objects.create(name='Release Tutor', business=business)
+        pet = Pet.objects.create(name='Release Pet', business=business)
+        booking = ServiceBooking.objects.create(slot=slot, business=business, pet=pet, tutor=tutor)
+        self.assertTrue(booking.confirm())
+        ServiceSlot.objects.filter(pk=slot.pk).update(booked_count=0)
+
+        with self.assertRaises(CapacityMismatch):
+            booking.cancel()
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
+
+
+class DashboardChangeTests(TestCase):
+    """Clients that cannot be caught up from the change log are told to reload"""
+
+    def test_since(self):
+        business = Business.objects.create(name='Changes')
+        DashboardChange.record(business.id, 'checkin', [1, 2, 3])
+        self.assertEqual([e.object_id for e in DashboardChange.since(business.id, 1, 10)], [2, 3])
+        self.assertEqual([e.object_id for e in DashboardChange.since(business.id, 0, 10)], [1, 2, 3])
+        self.assertEqual(DashboardChange.since(business.id, 3, 10), [])
+        self.assertIsNone(DashboardChange.since(business.id, 0, 2))
+        # A version from before a reset, or from another business's page
+        self.assertIsNone(DashboardChange.since(business.id, 7, 10))
+
+
+class CapacityStressTests(TransactionTestCase):
+    """Threads confirming and cancelling bookings of one slot never overbook it (manage.py stress_booking_capacity)"""
+
+    def test_concurrent_confirm_cancel(self):
+        result = stress(threads=4, bookings=60, capacity=20)
+        self.assertEqual(result['errors'], [])
+        self.assertTrue(result['confirmed'])
+        self.assertLessEqual(result['booked_count'], result['max_capacity'])
+        self.assertEqual(result['booked_count'], result['confirmed_rows'])
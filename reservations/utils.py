@@ -1,75 +1,207 @@
 """Utility functions for reservations"""
-from datetime import datetime, timedelta, time
-from .models import ServiceSlot, Service
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Count
+from .models import AvailabilityVersion, DailyOccupancy, ServiceBooking, ServiceSlot, SlotHorizon
+from .schedule import get_schedules
 from pets.models import Business
+from petcrm import metrics
+
+
+# How many days ahead slots are materialized
+SLOT_HORIZON_DAYS = 30
+
+
+def materialize_service_slots(businesses, start_date, days=SLOT_HORIZON_DAYS):
+    """
+    Set-based slot generation for a window of days, from each business's compiled Schedule.
+    The booking path materializes single slots on demand; this eager pass is only
+    needed for businesses that want every slot stored ahead of time.
+
+    Existing (business, service, date, start_time) keys for the whole window are
+    fetched in one query, missing keys are computed in memory and inserted with a
+    single bulk_create per business. Returns {business_id: slots_created}, counting
+    rows that appeared in the window during the call (see below).
+    """
+    businesses = list(businesses)
+    if not businesses:
+        return {}
+    end_date = start_date + timedelta(days=days - 1)
+    schedules = get_schedules(businesses)
+
+    window = ServiceSlot.objects.filter(
+        business__in=businesses,
+        date__gte=start_date,
+        date__lte=end_date,
+    )
+    existing = set(window.values_list('business_id', 'service_id', 'date', 'start_time'))
+    counts_before = _count_by_business(window)
+
+    for biz in businesses:
+        missing = []
+        for i in range(days):
+            date = start_date + timedelta(days=i)
+            for spec in schedules[biz.id].slots_on(date):
+                if (biz.id, spec.service_id, date, spec.start_time) in existing:
+                    continue
+                missing.append(ServiceSlot(
+                    business=biz,
+                    service=spec.service,
+                    date=date,
+                    start_time=spec.start_time,
+                    end_time=spec.end_time,
+                    max_capacity=spec.max_capacity,
+                    booked_count=0,
+                    is_available=True,
+                ))
+        if missing:
+            # ignore_conflicts makes concurrent generators safe on the unique key
+            ServiceSlot.objects.bulk_create(missing, ignore_conflicts=True)
+
+    # Count again rather than trusting len(missing): keys another worker inserted
+    # first are skipped by ignore_conflicts. The difference is every row that appeared
+    # in the window meanwhile, ours or a concurrent worker's (ignore_conflicts can't
+    # tell them apart), so concurrent generators may both report the same slots.
+    counts_after = _count_by_business(window)
+    created = {
+        biz.id: counts_after.get(biz.id, 0) - counts_before.get(biz.id, 0)
+        for biz in businesses
+    }
+    for business_id, n in created.items():
+        if n:
+            AvailabilityVersion.bump(business_id)
+            metrics.inc('petcrm_slots_generated_total', n, business=business_id, source='horizon')
+    return created
+
+
+def _count_by_business(queryset):
+    rows = queryset.order_by().values('business_id').annotate(n=Count('id'))
+    return {row['business_id']: row['n'] for row in rows}
 
 
 def ensure_service_slots_exist(business=None):
     """
-    Automatically create service slots for the next 30 days if they don't exist.
-    This is called automatically when tutors load the dashboard.
-    
+    Create service slots for the next 30 days if they don't exist.
+    Used by the create_service_slots command; dashboards read templates instead.
+
     If business is None, creates slots for all businesses.
+    Returns the number of slots created (0 if everything already existed).
     """
     today = datetime.now().date()
-    end_date = today + timedelta(days=29)
-    
+
     # Get businesses to create slots for
     if business:
         businesses = [business]
     else:
         businesses = Business.objects.all()
-    
-    services = Service.objects.all()
-    
-    # Define time slots for each service type
-    slot_config = {
-        'daycare': [
-            (time(8, 0), time(12, 0), 5),    # Morning: 8am-12pm, 5 spots
-            (time(14, 0), time(18, 0), 5),   # Afternoon: 2pm-6pm, 5 spots
-        ],
-        'grooming': [
-            (time(9, 0), time(11, 0), 1),    # Slot 1: 9am-11am, 1 spot
-            (time(11, 0), time(13, 0), 1),   # Slot 2: 11am-1pm, 1 spot
-            (time(14, 0), time(16, 0), 1),   # Slot 3: 2pm-4pm, 1 spot
-            (time(16, 0), time(18, 0), 1),   # Slot 4: 4pm-6pm, 1 spot
-        ],
-        'training': [
-            (time(10, 0), time(11, 0), 2),   # Slot 1: 10am-11am, 2 spots
-            (time(14, 0), time(15, 0), 2),   # Slot 2: 2pm-3pm, 2 spots
-            (time(15, 0), time(16, 0), 2),   # Slot 3: 3pm-4pm, 2 spots
-        ],
-        'walk': [
-            (time(8, 0), time(9, 0), 3),     # Slot 1: 8am-9am, 3 spots
-            (time(10, 0), time(11, 0), 3),   # Slot 2: 10am-11am, 3 spots
-            (time(14, 0), time(15, 0), 3),   # Slot 3: 2pm-3pm, 3 spots
-            (time(16, 0), time(17, 0), 3),   # Slot 4: 4pm-5pm, 3 spots
-        ],
+
+    businesses = list(businesses)
+    created = materialize_service_slots(businesses, today, SLOT_HORIZON_DAYS)
+    _record_horizon(businesses, horizon_target(today))
+    return sum(created.values())
+
+
+def horizon_target(today=None):
+    """Last date that must have slots for the rolling window to be complete"""
+    today = today or datetime.now().date()
+    return today + timedelta(days=SLOT_HORIZON_DAYS - 1)
+
+
+def extend_slot_horizon(businesses=None, today=None):
+    """
+    Extend each business's slot horizon to the full rolling window and record
+    the watermark. Only days past the current watermark are generated, so a daily
+    run touches a single day per business. None means the businesses that opted in
+    with ScheduleConfig.eager_slots; the rest get slot rows only when booked.
+
+    Returns {business_id: slots_created}.
+    """
+    today = today or datetime.now().date()
+    target = horizon_target(today)
+    if businesses is None:
+        businesses = Business.objects.filter(schedule_config__eager_slots=True)
+    businesses = list(businesses)
+    horizons = {
+        h.business_id: h
+        for h in SlotHorizon.objects.filter(business__in=businesses)
     }
-    
-    slots_created = 0
-    
-    # Create slots for next 30 days for each business
+
+    # Group businesses by the first missing day so each group is one set-based pass
+    pending = {}
+    for biz in businesses:
+        horizon = horizons.get(biz.id)
+        if horizon and not horizon.is_stale(target):
+            continue
+        start = today
+        if horizon and horizon.materialized_through >= today:
+            start = horizon.materialized_through + timedelta(days=1)
+        pending.setdefault(start, []).append(biz)
+
+    created = {}
+    for start, group in pending.items():
+        created.update(materialize_service_slots(group, start, (target - start).days + 1))
+        _record_horizon(group, target)
+    return created
+
+
+def _record_horizon(businesses, target):
+    SlotHorizon.objects.bulk_create(
+        [SlotHorizon(business=biz, materialized_through=target) for biz in businesses],
+        update_conflicts=True,
+        unique_fields=['business'],
+        update_fields=['materialized_through', 'updated_at'],
+    )
+
+
+def rebuild_daily_occupancy(businesses, start_date, end_date):
+    """
+    Recompute the DailyOccupancy rollup from scratch for a date range (inclusive).
+
+    Booking counts come from one grouped query over ServiceBooking; capacity is the
+    concrete ServiceSlot rows plus, from today on, schedule slots that have no row yet.
+    The range is replaced in one transaction. Returns the number of rows written.
+    """
+    businesses = list(businesses)
+    today = datetime.now().date()
+    schedules = get_schedules(businesses)
+    rows = {}
+
+    def row(business_id, date, service_id):
+        key = (business_id, date, service_id)
+        if key not in rows:
+            rows[key] = DailyOccupancy(business_id=business_id, date=date, service_id=service_id)
+        return rows[key]
+
+    concrete = ServiceSlot.objects.filter(
+        business__in=businesses, date__gte=start_date, date__lte=end_date,
+    ).values_list('business_id', 'date', 'service_id', 'start_time', 'max_capacity', 'is_available')
+    overridden = set()
+    for business_id, date, service_id, start_time, max_capacity, is_available in concrete:
+        overridden.add((business_id, date, service_id, start_time))
+        if is_available:
+            row(business_id, date, service_id).capacity += max_capacity
+
     for biz in businesses:
-        for i in range(30):
-            date = today + timedelta(days=i)
-            
-            for service in services:
-                config = slot_config.get(service.type, [])
-                for start_time, end_time, capacity in config:
-                    _, created = ServiceSlot.objects.get_or_create(
-                        business=biz,
-                        service=service,
-                        date=date,
-                        start_time=start_time,
-                        defaults={
-                            'end_time': end_time,
-                            'max_capacity': capacity,
-                            'booked_count': 0,
-                            'is_available': True,
-                        }
-                    )
-                    if created:
-                        slots_created += 1
-    
-    return slots_created > 0  # Return True if new slots were created
+        date = max(start_date, today)
+        while date <= end_date:
+            for spec in schedules[biz.id].slots_on(date):
+                if (biz.id, date, spec.service_id, spec.start_time) not in overridden:
+                    row(biz.id, date, spec.service_id).capacity += spec.max_capacity
+            date += timedelta(days=1)
+
+    counts = ServiceBooking.objects.filter(
+        slot__business__in=businesses, slot__date__gte=start_date, slot__date__lte=end_date,
+    ).order_by().values_list('slot__business_id', 'slot__date', 'slot__service_id', 'status').annotate(n=Count('id'))
+    for business_id, date, service_id, status, n in counts:
+        if status in ('pending', 'confirmed', 'cancelled'):
+            occupancy = row(business_id, date, service_id)
+            setattr(occupancy, status, n)
+            if status == 'confirmed':
+                occupancy.booked = n
+
+    with transaction.atomic():
+        DailyOccupancy.objects.filter(
+            business__in=businesses, date__gte=start_date, date__lte=end_date,
+        ).delete()
+        DailyOccupancy.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
@@ -0,0 +1,220 @@
+"""
+Full-text search over woofs, pet notes and allergies, and training entries: one
+SQLite FTS5 table (search_document) with a row per searchable object.
+
+- rowid is object id * len(KINDS) + kind index, so keeping a row in sync is two
+  rowid statements (search.signals).
+- The business is an indexed column holding a single token ('b<id>'). Every
+  search ANDs it with the user's terms, so FTS5 intersects posting lists and
+  never ranks another tenant's matches.
+- Text is stemmed (porter): 'allergy' finds 'allergies'. Results are ranked by
+  BM25, titles (pet names, training titles) weighing more than bodies.
+
+Bulk inserts send no signals; `manage.py rebuild_search_index` rebuilds the table.
+FTS5 is SQLite only: elsewhere indexing does nothing and available() is False.
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from django.db import connection
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from pets.models import Pet, TrainingProgress
+from tutor.models import Woof
+
+TABLE = 'search_document'
+KINDS = ('woof', 'pet', 'training')
+RESULTS = 20
+# Terms beyond this are ignored: each one is another posting list to merge
+MAX_TERMS = 8
+# Question words that would otherwise have to appear in every result
+STOP_WORDS = frozenset(
+    'a an and any are did do does for from had has have in is it of on or that the this to was were '
+    'what when where which who whom why with'.split()
+)
+# BM25 weights per column: business, title, body (the rest are UNINDEXED)
+WEIGHTS = (0.0, 4.0, 1.0)
+
+_TERM = re.compile(r'\w+\*?')
+# Snippets come from the body: the business column matches every search, and
+# titles are shown whole. Markers are control characters that survive escaping,
+# then become <mark>
+_SNIPPET_COLUMN = 2
+_OPEN, _CLOSE = '\x02', '\x03'
+
+CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+    business, title, body, kind UNINDEXED, pet_id UNINDEXED, created UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+DROP_SQL = f'DROP TABLE IF EXISTS {TABLE}'
+_COLUMNS = 'rowid, business, kind, title, body, pet_id, created'
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+@dataclass
+class Hit:
+    kind: str               # One of KINDS
+    id: int                 # Woof, Pet or TrainingProgress id
+    pet_id: int
+    snippet: str            # Safe HTML: the best matching passage, terms in <mark>
+    score: float            # BM25, lower is better
+    obj: object = None      # The Woof, Pet or TrainingProgress
+
+    @property
+    def pet(self):
+        return self.obj if self.kind == 'pet' else self.obj.pet
+
+    @property
+    def created(self):
+        """When the woof was posted or the training entry dated; None for pet notes"""
+        if self.kind == 'woof':
+            return self.obj.created_at
+        if self.kind == 'training':
+            return self.obj.date
+        return None
+
+
+def documents(kind):
+    """values_list() of (rowid, business, kind, title, body, pet_id, created) for every object of `kind`"""
+    k = KINDS.index(kind)
+    if kind == 'woof':
+        rows = Woof.objects.filter(business__isnull=False).annotate(
+            doc_business=F('business_id'), doc_title=Value(''), doc_body=F('message'), doc_created=F('created_at'),
+        )
+    elif kind == 'pet':
+        rows = Pet.objects.annotate(
+            doc_business=F('business_id'), doc_title=F('name'),
+            doc_body=Concat('notes', Value('\n'), 'allergies', output_field=CharField()),
+            doc_created=Value(None, output_field=CharField()),
+        )
+    else:
+        rows = TrainingProgress.objects.annotate(
+            doc_business=F('pet__business_id'), doc_title=F('title'), doc_body=F('notes'), doc_created=F('date'),
+        )
+    return rows.annotate(
+        doc_rowid=F('id') * len(KINDS) + k,
+        doc_business_token=Concat(Value('b'), Cast('doc_business', CharField()), output_field=CharField()),
+        doc_kind=Value(kind, output_field=CharField()),
+        doc_pet=F('pet_id') if kind != 'pet' else F('id'),
+    ).values_list('doc_rowid', 'doc_business_token', 'doc_kind', 'doc_title', 'doc_body', 'doc_pet', 'doc_created')
+
+
+def index(kind, pk):
+    """(Re)index one object; a missing object just leaves its row deleted"""
+    if not available():
+        return
+    select, params = documents(kind).filter(pk=pk).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [pk * len(KINDS) + KINDS.index(kind)])
+        cursor.execute(f'INSERT INTO {TABLE} ({_COLUMNS}) {select}', params)
+
+
+def unindex(kind, pk):
+    if available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [pk * len(KINDS) + KINDS.index(kind)])
+
+
+def rebuild(business_id=None):
+    """Reindex everything (or one business) with an INSERT ... SELECT per kind; returns rows written"""
+    if not available():
+        return 0
+    written = 0
+    with connection.cursor() as cursor:
+        if business_id is None:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        else:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN (SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)',
+                [f'business : b{int(business_id)}'],
+            )
+        for kind in KINDS:
+            rows = documents(kind)
+            if business_id is not None:
+                rows = rows.filter(doc_business=business_id)
+            select, params = rows.query.sql_with_params()
+            cursor.execute(f'INSERT INTO {TABLE} ({_COLUMNS}) {select}', params)
+            written += cursor.rowcount
+    return written
+
+
+def terms(query):
+    """The searchable terms of a query: words, optionally with a trailing * for prefixes"""
+    words = [t for t in _TERM.findall(query.lower()) if t.rstrip('*') not in STOP_WORDS]
+    return words[:MAX_TERMS]
+
+
+def _match(business_id, words, operator):
+    quoted = f' {operator} '.join(f'"{w.rstrip("*")}"' + ('*' if w.endswith('*') else '') for w in words)
+    return f'business : b{int(business_id)} AND {{title body}} : ({quoted})'
+
+
+def search(business_id, query, kinds=None, since=None, limit=RESULTS):
+    """
+    Best matches first, as Hits with their objects loaded. Every term must match;
+    when no document has them all, documents with any of them are ranked instead.
+    `kinds` limits the sources; `since` (a datetime) drops older woofs and training
+    entries, and pet notes, which are undated.
+    """
+    words = terms(query)
+    if not words or not available():
+        return []
+    rows = _ranked(_match(business_id, words, 'AND'), kinds, since, limit)
+    if not rows and len(words) > 1:
+        rows = _ranked(_match(business_id, words, 'OR'), kinds, since, limit)
+    return _load(rows)
+
+
+def _ranked(match, kinds, since, limit):
+    sql = (
+        f'SELECT kind, rowid, pet_id, snippet({TABLE}, {_SNIPPET_COLUMN}, %s, %s, %s, 16), '
+        f'bm25({TABLE}, {", ".join(map(str, WEIGHTS))}) AS score '
+        f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+    )
+    params = [_OPEN, _CLOSE, '…', match]
+    if kinds:
+        sql += f' AND kind IN ({", ".join(["%s"] * len(kinds))})'
+        params += list(kinds)
+    if since is not None:
+        # Stored as the database's own text form, so it compares as text. Training
+        # entries hold a date: compare it to the local date of `since`, or entries
+        # dated on the cutoff day would sort before its time of day
+        sql += " AND CASE kind WHEN 'training' THEN created >= %s ELSE created >= %s END"
+        if isinstance(since, datetime):
+            day = timezone.localdate(since) if timezone.is_aware(since) else since.date()
+            params += [str(day), connection.ops.adapt_datetimefield_value(since)]
+        else:
+            params += [str(since), str(since)]
+    sql += ' ORDER BY score LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _load(rows):
+    """Hits with their objects: at most one query per kind; rows of deleted objects are dropped"""
+    hits = [
+        Hit(kind, rowid // len(KINDS), pet_id, mark_safe(escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')), score)
+        for kind, rowid, pet_id, snippet, score in rows
+    ]
+    querysets = {
+        'woof': Woof.objects.select_related('pet', 'staff', 'tutor'),
+        'pet': Pet.objects.all(),
+        'training': TrainingProgress.objects.select_related('pet'),
+    }
+    objects = {}
+    for kind, queryset in querysets.items():
+        ids = [hit.id for hit in hits if hit.kind == kind]
+        objects[kind] = queryset.in_bulk(ids) if ids else {}
+    for hit in hits:
+        hit.obj = objects[hit.kind].get(hit.id)
+    return [hit for hit in hits if hit.obj is not None]
@@ -0,0 +1,23 @@
+import time as timer
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from pets.models import Business
+from search import index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index (woofs, pet notes and allergies, training entries): after bulk imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help='Business id (default: all businesses)')
+
+    def handle(self, *args, **options):
+        if not index.available():
+            raise CommandError('Full-text search needs SQLite (FTS5)')
+        if options['business'] and not Business.objects.filter(id=options['business']).exists():
+            raise CommandError(f'Business {options["business"]} not found')
+
+        started = timer.perf_counter()
+        with transaction.atomic():
+            written = index.rebuild(options['business'])
+        self.stdout.write(f'✓ Indexed {written} documents in {timer.perf_counter() - started:.1f}s')
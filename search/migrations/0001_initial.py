@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite only (search.index.available())
+    if schema_editor.connection.vendor == 'sqlite':
+        from search.index import CREATE_SQL
+        schema_editor.execute(CREATE_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        from search.index import DROP_SQL
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('tutor', '0009_woof_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
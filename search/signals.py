@@ -0,0 +1,28 @@
+"""
+Keeps the search index (search.index) in step with saved and deleted woofs, pets
+and training entries. Bulk inserts and queryset updates send no signals; reindex
+with `manage.py rebuild_search_index`.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from pets.models import Pet, TrainingProgress
+from tutor.models import Woof
+from . import index
+
+KIND = {Woof: 'woof', Pet: 'pet', TrainingProgress: 'training'}
+
+
+@receiver(post_save, sender=Woof)
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=TrainingProgress)
+def index_saved(sender, instance, raw=False, **kwargs):
+    # Fixtures load rows in any order: the business of a woof may not exist yet
+    if not raw:
+        index.index(KIND[sender], instance.pk)
+
+
+@receiver(post_delete, sender=Woof)
+@receiver(post_delete, sender=Pet)
+@receiver(post_delete, sender=TrainingProgress)
+def unindex_deleted(sender, instance, **kwargs):
+    index.unindex(KIND[sender], instance.pk)
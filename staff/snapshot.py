@@ -0,0 +1,179 @@
+"""
+Everything the staff dashboard shows about a business, built in a fixed number of
+queries whatever the number of pets. Parts are computed on first access, so views
+that only need the in-house headline (the feed) don't pay for the booking matrix.
+"""
+from datetime import timedelta
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.functional import cached_property
+from pets.models import Pet, Tutor
+from reservations.booking import pending_queue
+from reservations.models import CheckIn, DailyOccupancy, DashboardVersion, LiveOccupancy, ServiceBooking
+
+
+def occupancy_by_day(business, start_date, end_date):
+    """
+    Per-day booking load from the DailyOccupancy rollup: one indexed range query,
+    grouped in Python into [{date, services, capacity, booked, pending, fill_pct}, ...].
+    """
+    days = {}
+    for row in DailyOccupancy.objects.for_range(business, start_date, end_date):
+        day = days.setdefault(row.date, {'date': row.date, 'services': [], 'capacity': 0, 'booked': 0, 'pending': 0})
+        day['services'].append(row)
+        day['capacity'] += row.capacity
+        day['booked'] += row.booked
+        day['pending'] += row.pending
+    for day in days.values():
+        day['fill_pct'] = (day['booked'] / day['capacity'] * 100) if day['capacity'] else 0
+    return [days[date] for date in sorted(days)]
+
+
+class DashboardSnapshot:
+    # Mini calendars show 15 days starting on the Sunday of the current week
+    CALENDAR_DAYS = 15
+    # Booking load table on the dashboard
+    OCCUPANCY_DAYS = 14
+    # Reservations listed on each pet card
+    UPCOMING_PER_PET = 3
+
+    def __init__(self, business, today=None, pending_cursor=None):
+        self.business = business
+        self.today = today or timezone.now().date()
+        self.pending_cursor = pending_cursor
+
+    @cached_property
+    def pets(self):
+        """Pets with check-in state (joined) and tutors (one prefetch query)"""
+        pets = list(
+            Pet.objects.filter(business=self.business)
+            .select_related('checkin')
+            .order_by('name')
+            .prefetch_related(Prefetch('tutors', queryset=Tutor.objects.order_by('id'), to_attr='tutor_list'))
+        )
+        for pet in pets:
+            pet.primary_tutor = pet.tutor_list[0] if pet.tutor_list else None
+        return pets
+
+    @cached_property
+    def pet_checkins(self):
+        return {pet.id: getattr(pet, 'checkin', None) for pet in self.pets}
+
+    @cached_property
+    def live(self):
+        """Maintained in-house/pet counters: the headline doesn't need the pet list"""
+        return LiveOccupancy.current(self.business.id)
+
+    @property
+    def in_house_count(self):
+        return self.live.in_house
+
+    @property
+    def pet_total(self):
+        return self.live.pets
+
+    @property
+    def occupancy_pct(self):
+        return self.live.occupancy_pct
+
+    @cached_property
+    def _pending_page(self):
+        return pending_queue(self.business, self.pending_cursor)
+
+    @property
+    def pending_bookings(self):
+        return self._pending_page[0]
+
+    @property
+    def pending_next(self):
+        return self._pending_page[1]
+
+    @cached_property
+    def pending_count(self):
+        return ServiceBooking.objects.filter(business=self.business, status='pending').count()
+
+    @cached_property
+    def calendar_start(self):
+        return self.today - timedelta(days=(self.today.weekday() + 1) % 7)
+
+    @cached_property
+    def booking_matrix(self):
+        """
+        {pet_id: {iso_date: [booking, ...]}} for the mini calendars, from one query
+        over the business's pending and confirmed bookings in the calendar window.
+        Also attaches each pet's first upcoming bookings as pet.upcoming_bookings.
+        """
+        bookings = ServiceBooking.objects.filter(
+            business=self.business,
+            status__in=['pending', 'confirmed'],
+            slot__date__gte=self.calendar_start,
+            slot__date__lt=self.calendar_start + timedelta(days=self.CALENDAR_DAYS),
+        ).select_related('slot__service').order_by('slot__date', 'slot__start_time')
+
+        matrix, upcoming = {}, {}
+        for booking in bookings:
+            slot = booking.slot
+            matrix.setdefault(booking.pet_id, {}).setdefault(slot.date.isoformat(), []).append({
+                'id': booking.id,
+                'status': booking.status,
+                'service': slot.service.type,
+                'time': slot.start_time.strftime('%H:%M'),
+            })
+            if slot.date >= self.today:
+                upcoming.setdefault(booking.pet_id, []).append(booking)
+        for pet in self.pets:
+            pet.upcoming_bookings = upcoming.get(pet.id, [])[:self.UPCOMING_PER_PET]
+        return matrix
+
+    @cached_property
+    def occupancy_days(self):
+        return occupancy_by_day(self.business, self.today, self.today + timedelta(days=self.OCCUPANCY_DAYS - 1))
+
+    @cached_property
+    def changes_version(self):
+        """DashboardChange version this snapshot is current for (read before the data it covers)"""
+        return DashboardVersion.current(self.business.id)
+
+    def changes(self, entries):
+        """
+        What a dashboard rendered before `entries` (DashboardChange rows, oldest first)
+        needs to patch itself: check-in state of the pets that flipped with the live
+        headline, and the current state of the bookings that moved with the pending
+        count and booking load. Each part costs queries only when it changed.
+        """
+        delta = {'version': entries[-1].version}
+        pet_ids = {entry.object_id for entry in entries if entry.kind == 'checkin'}
+        booking_ids = {entry.object_id for entry in entries if entry.kind == 'booking'}
+        if pet_ids:
+            present = dict(
+                CheckIn.objects.filter(pet_id__in=pet_ids, pet__business=self.business).values_list('pet_id', 'is_present')
+            )
+            delta['checkins'] = {pet_id: present.get(pet_id, False) for pet_id in pet_ids}
+            delta['live'] = self.live
+        if booking_ids:
+            delta['bookings'] = list(
+                ServiceBooking.objects.filter(business=self.business, id__in=booking_ids)
+                .select_related('pet', 'tutor', 'slot__service').order_by('requested_at', 'id')
+            )
+            delta['pending_count'] = self.pending_count
+            delta['occupancy_days'] = self.occupancy_days
+        return delta
+
+    def context(self):
+        """Template context for staff/dashboard_new.html"""
+        changes_version = self.changes_version
+        return {
+            'business': self.business,
+            'changes_version': changes_version,
+            'pets': self.pets,
+            'pet_checkins': self.pet_checkins,
+            'in_house_count': self.in_house_count,
+            'occupancy_pct': self.occupancy_pct,
+            'pet_total': self.pet_total,
+            'pending_bookings': self.pending_bookings,
+            'pending_count': self.pending_count,
+            'pending_next': self.pending_next,
+            'pending_cursor': self.pending_cursor or '',
+            'pet_bookings': self.booking_matrix,
+            'occupancy_days': self.occupancy_days,
+        }
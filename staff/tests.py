@@ -1,3 +1,156 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from pets.models import Business, Pet, Staff, TrainingProgress, Tutor
+from reservations.models import Service, ServiceBooking, ServiceSlot
+from search import index as search_index
+from testing.perf import SIZES, PerfTestCase
+from tutor import feed
+from tutor.models import GlobalWoof, Woof
 
-# Create your tests here.
+
+class StaffViewPerformanceTests(PerfTestCase):
+    """Query budgets and latency baselines for the staff views at every tenant size"""
+
+    def client_for(self, tenant):
+        client = Client()
+        client.force_login(tenant.manager)
+        return client
+
+    def test_dashboard(self):
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            response, counts[size] = self.measure('staff:dashboard', size, lambda: client.get(reverse('staff:dashboard')))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['pets']), SIZES[size]['tutors'] * SIZES[size]['pets_per_tutor'])
+        self.assertQueryBudget('staff:dashboard', counts, 10)
+
+    def test_feed(self):
+        """Built from the database (as after every woof), then from the page cache"""
+        counts, cached = {}, {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            response, counts[size] = self.measure(
+                'staff:feed', size, lambda: client.get(reverse('staff:feed')),
+                before=lambda: feed.invalidate(tenant.business.id),
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, f'{tenant.business.live_occupancy.in_house}/{SIZES[size]["tutors"] * SIZES[size]["pets_per_tutor"]} in house')
+            _, cached[size] = self.measure('staff:feed:cached', size, lambda: client.get(reverse('staff:feed')))
+        self.assertQueryBudget('staff:feed', counts, 8)
+        self.assertQueryBudget('staff:feed:cached', cached, 4)
+
+    def test_feed_json_poll(self):
+        counts, cached = {}, {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            url = reverse('staff:feed') + '?format=json'
+            response, counts[size] = self.measure(
+                'staff:feed:json', size, lambda: client.get(url), before=lambda: feed.invalidate(tenant.business.id),
+            )
+            self.assertEqual(response.status_code, 200)
+            _, cached[size] = self.measure('staff:feed:json:cached', size, lambda: client.get(url))
+        self.assertQueryBudget('staff:feed:json', counts, 6)
+        self.assertQueryBudget('staff:feed:json:cached', cached, 3)
+
+    def test_feed_json_poll_after_write(self):
+        """A woof invalidates the cached polls of its business: the next one reads it"""
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            url = reverse('staff:feed') + '?format=json'
+            client.get(url)
+            with self.captureOnCommitCallbacks(execute=True):
+                GlobalWoof.objects.create(business=tenant.business, staff=tenant.manager, message='Closing early')
+            response, counts[size] = self.measure('staff:feed:json', size, lambda: client.get(url), warm=False)
+            self.assertEqual(response.json()['items'][0]['message'], 'Closing early')
+        self.assertQueryBudget('staff:feed:json:after_write', counts, 6)
+
+    def test_feed_json_poll_cursors(self):
+        """Positions on the newest page share cached answers, any other cursor is not cached"""
+        tenant = self.tenants['small']
+        client = self.client_for(tenant)
+        url = reverse('staff:feed')
+
+        def poll(since):
+            client.get(url, {'format': 'json', 'since': since})
+            return self.measure('staff:feed:json:since', 'small', lambda: client.get(url, {'format': 'json', 'since': since}), warm=False)
+
+        newest = client.get(url, {'format': 'json'}).json()['cursor']
+        micros, kind, entry_id = newest.split('-')
+        _, head = poll(newest)
+        # The same position spelled differently reads the same cached answer
+        response, aliased = poll(f'00{micros}-{kind}-00{entry_id}')
+        self.assertEqual(response.json()['items'], [])
+        self.assertEqual(aliased, head)
+        _, made_up = poll(f'{int(micros) + 1}-{kind}-{entry_id}')
+        self.assertGreater(made_up, head)
+
+    def test_search(self):
+        """Ranked matches of the staff member's business only, kept in sync by the signals"""
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            url = reverse('staff:search') + '?format=json&q=updates'
+            response, counts[size] = self.measure('staff:search', size, lambda: client.get(url))
+            results = response.json()['results']
+            self.assertTrue(results)
+            self.assertTrue(all(r['pet'].startswith(f'perf-{size} ') for r in results))
+            self.assertIn('<mark>update</mark>', results[0]['snippet'])
+
+            woof = Woof.objects.create(pet=tenant.pets[0], staff=tenant.manager, message='Sneezing after the walk')
+            found = client.get(reverse('staff:search'), {'q': 'sneeze', 'kind': 'woof', 'format': 'json'}).json()['results']
+            self.assertEqual([r['id'] for r in found], [woof.id])
+            woof.delete()
+            self.assertEqual(client.get(reverse('staff:search'), {'q': 'sneeze', 'format': 'json'}).json()['results'], [])
+        self.assertQueryBudget('staff:search', counts, 6)
+
+    def test_search_days(self):
+        """Training entries dated on the cutoff day are kept; huge windows are clamped"""
+        tenant = self.tenants['small']
+        client = self.client_for(tenant)
+        entry = TrainingProgress.objects.create(pet=tenant.pets[0], title='Recall drills')
+        TrainingProgress.objects.filter(pk=entry.pk).update(date=timezone.localdate() - timedelta(days=1))
+        search_index.index('training', entry.pk)
+        for days in (1, 10 ** 12):
+            response = client.get(reverse('staff:search'), {'q': 'recall', 'days': days, 'format': 'json'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([r['id'] for r in response.json()['results']], [entry.id])
+
+    def test_pet_sheet(self):
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            url = reverse('staff:pet_sheet', args=[tenant.pets[0].id])
+            response, counts[size] = self.measure('staff:pet_sheet', size, lambda: client.get(url))
+            self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget('staff:pet_sheet', counts, 12)
+
+
+class BookingActionTests(TestCase):
+    """A transition rolled back for a spot-count mismatch is reported, not a 500"""
+
+    def test_reject_with_out_of_sync_slot(self):
+        business = Business.objects.create(name='Mismatch')
+        manager = User.objects.create_user(username='mismatch-manager')
+        Staff.objects.create(user=manager, business=business, role='manager')
+        service, _ = Service.objects.get_or_create(type='daycare')
+        slot = ServiceSlot.objects.create(business=business, service=service, date=date(2030, 1, 1),
+                                          start_time=time(8, 0), end_time=time(12, 0), max_capacity=1)
+        tutor = Tutor.objects.create(name='Mismatch Tutor', business=business)
+        pet = Pet.objects.create(name='Mismatch Pet', business=business)
+        booking = ServiceBooking.objects.create(slot=slot, business=business, pet=pet, tutor=tutor)
+        self.assertTrue(booking.confirm())
+        ServiceSlot.objects.filter(pk=slot.pk).update(booked_count=0)
+
+        client = Client()
+        client.force_login(manager)
+        response = client.post(reverse('staff:dashboard'), {'action': 'reject_booking', 'booking_id': booking.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('out of sync', str(list(get_messages(response.wsgi_request))[0]))
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
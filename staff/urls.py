@@ -6,4 +6,10 @@ app_name = 'staff'
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('feed/', views.feed, name='feed'),
-    path('pet/<int:pet_id>/sheet/', views.pet_sheet, name='pet_sheet'),]
\ No newline at end of file
+    path('changes/', views.changes, name='changes'),
+    path('pet/<int:pet_id>/sheet/', views.pet_sheet, name='pet_sheet'),
+    path('occupancy/', views.occupancy, name='occupancy'),
+    path('occupancy/live/', views.occupancy_live, name='occupancy_live'),
+    path('forecast/', views.forecast, name='forecast'),
+    path('search/', views.search, name='search'),
+]
\ No newline at end of file
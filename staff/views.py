@@ -5,57 +5,62 @@ from django.utils import timezone
 from django.http import JsonResponse
 from datetime import datetime, timedelta
 import json
-from pets.models import Business, Pet
-from reservations.models import CheckIn, ServiceBooking
+from pets.models import Business, Pet, Staff
+from reservations.booking import decide_bookings
+from reservations.forecast import DEFAULT_CANDIDATES, DEFAULT_TARGET_OVERFLOW, forecast_capacity
+from reservations.models import CapacityMismatch, CheckIn, DashboardChange, LiveOccupancy, Service, ServiceBooking
+from search import index as search_index
+from tutor.feed import cached, cached_fragment, feed_page, feed_since, page_key
 from tutor.models import Woof, WoofLog, GlobalWoof
+from .snapshot import DashboardSnapshot, occupancy_by_day
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from pets.models import TrainingProgress
 
 
+# Most dashboard changes sent in one poll; a tablet further behind reloads the page
+CHANGES_LIMIT = 200
+# Longest window the occupancy report reads in one go
+OCCUPANCY_MAX_DAYS = 366
+# Longest booking history the capacity forecast looks back over
+FORECAST_MAX_DAYS = 3 * 365
+# Longest search query read; the index only uses its first terms anyway
+SEARCH_MAX_LENGTH = 200
+# Longest ?days= window searched; larger values would overflow timedelta
+SEARCH_MAX_DAYS = 10 * 365
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
 def dashboard(request):
     """Staff dashboard - requires authentication"""
     if not request.user.is_authenticated:
         messages.error(request, 'Please log in to access the staff dashboard.')
         return redirect('account_login')
     
-    # Get staff record from authenticated user
-    if hasattr(request.user, 'staff_profile') and request.user.staff_profile:
-        business = request.user.staff_profile.business
+    # Get staff record (and its business) from authenticated user
+    staff_profile = Staff.objects.select_related('business').filter(user=request.user).first()
+    if staff_profile:
+        business = staff_profile.business
     else:
         messages.error(request, 'You are not authorized to access the staff dashboard.')
         return redirect('home:index')
     
-    pets = Pet.objects.filter(business=business)
-    pet_checkins = {pet.id: CheckIn.objects.filter(pet=pet).first() for pet in pets}
-    # Recent public community woofs for staff feed preview (optional)
-    recent_woofs = Woof.objects.filter(parent_woof__isnull=True, visibility='public').order_by('-created_at')[:10]
-    
-    # ADD STATS
-    in_house_count = sum(1 for checkin in pet_checkins.values() if checkin and checkin.is_present)
-    occupancy_pct = (in_house_count / len(pets) * 100) if pets else 0
-    
     if request.method == 'POST':
         action = request.POST.get('action')
         pet_id = request.POST.get('pet_id')
         pet = None
-        checkin = None
-        created = False
         if action in ['checkin', 'checkout', 'woof']:
             if not pet_id:
                 messages.error(request, 'Pet ID is required for this action.')
                 return redirect('staff:dashboard')
             try:
-                pet = Pet.objects.get(id=pet_id)
+                pet = Pet.objects.get(id=pet_id, business=business)
             except Pet.DoesNotExist:
                 messages.error(request, 'Pet not found.')
                 return redirect('staff:dashboard')
-            checkin, created = CheckIn.objects.get_or_create(pet=pet)
         
         if action == 'checkin':
-            checkin.is_present = True
-            checkin.checkin_time = timezone.now()
-            checkin.checkout_time = None
-            checkin.save()
+            checkin, created, changed = CheckIn.set_presence(pet, True)
             
             if created:
                 try:
@@ -75,9 +80,7 @@ def dashboard(request):
             
             messages.success(request, f"✅ {pet.name} checked IN at {timezone.now().strftime('%H:%M')}")
         elif action == 'checkout':
-            checkin.is_present = False
-            checkin.checkout_time = timezone.now()
-            checkin.save()
+            CheckIn.set_presence(pet, False)
             messages.success(request, f"❌ {pet.name} checked OUT at {timezone.now().strftime('%H:%M')}")
         elif action == 'woof':
             message = request.POST.get('woof_message', '').strip()
@@ -102,71 +105,253 @@ def dashboard(request):
             message = request.POST.get('global_message', '').strip()
             attachment = request.FILES.get('global_attachment')
             if message or attachment:
-                GlobalWoof.objects.create(message=message, staff=request.user, attachment=attachment)
+                GlobalWoof.objects.create(business=business, message=message, staff=request.user, attachment=attachment)
                 messages.success(request, 'Global woof sent to all tutors!')
         elif action == 'confirm_booking':
             booking_id = request.POST.get('booking_id')
             try:
-                booking = ServiceBooking.objects.get(id=booking_id)
-                booking.confirm()
-                messages.success(request, f'✅ Confirmed booking for {booking.pet.name} - {booking.slot.service.type} on {booking.slot.date}')
+                booking = ServiceBooking.objects.get(id=booking_id, business=business)
+                if booking.confirm():
+                    messages.success(request, f'✅ Confirmed booking for {booking.pet.name} - {booking.slot.service.type} on {booking.slot.date}')
+                elif booking.status == 'pending':
+                    messages.error(request, f'Slot is full: could not confirm {booking.pet.name} - {booking.slot.service.type} on {booking.slot.date}')
+                else:
+                    messages.warning(request, f'Booking for {booking.pet.name} was already {booking.status}.')
             except ServiceBooking.DoesNotExist:
                 messages.error(request, 'Booking not found.')
+            except CapacityMismatch:
+                # Rolled back: the slot's booked_count disagrees with its bookings
+                messages.error(request, f'Could not update the booking for {booking.pet.name}: the slot\'s spot count is out of sync.')
         elif action == 'reject_booking':
             booking_id = request.POST.get('booking_id')
             try:
-                booking = ServiceBooking.objects.get(id=booking_id)
-                booking.cancel()
-                messages.success(request, f'❌ Rejected booking for {booking.pet.name} - {booking.slot.service.type}')
+                booking = ServiceBooking.objects.get(id=booking_id, business=business)
+                if booking.cancel():
+                    messages.success(request, f'❌ Rejected booking for {booking.pet.name} - {booking.slot.service.type}')
+                else:
+                    messages.warning(request, f'Booking for {booking.pet.name} was already {booking.status}.')
             except ServiceBooking.DoesNotExist:
                 messages.error(request, 'Booking not found.')
+            except CapacityMismatch:
+                # Rolled back: the slot's booked_count disagrees with its bookings
+                messages.error(request, f'Could not update the booking for {booking.pet.name}: the slot\'s spot count is out of sync.')
+        elif action == 'bulk_bookings':
+            decision = request.POST.get('decision')
+            booking_ids = []
+            for value in request.POST.getlist('booking_ids'):
+                try:
+                    booking_ids.append(int(value))
+                except ValueError:
+                    pass
+            if not booking_ids or decision not in ('confirm', 'reject'):
+                messages.error(request, 'Select at least one booking to approve or reject.')
+                return redirect('staff:dashboard')
+            try:
+                summary = decide_bookings(business, booking_ids, decision)
+            except CapacityMismatch:
+                messages.error(request, 'No bookings were changed: a slot\'s spot count is out of sync.')
+                return redirect('staff:dashboard')
+            verb = 'Confirmed' if decision == 'confirm' else 'Rejected'
+            text = f"{'✅' if decision == 'confirm' else '❌'} {verb} {summary['done']} booking{'s' if summary['done'] != 1 else ''}"
+            if summary['full']:
+                text += f", {summary['full']} left pending (slot full)"
+            if summary['skipped']:
+                text += f", {summary['skipped']} already handled"
+            if summary['done']:
+                messages.success(request, text)
+            else:
+                messages.warning(request, text)
         
         return redirect('staff:dashboard')
     
-    # Get pending service booking requests
-    pending_bookings = ServiceBooking.objects.filter(status='pending').select_related('pet', 'tutor', 'slot__service').order_by('-requested_at')
+    # Check-ins, pending queue, booking calendars and occupancy in a fixed number of queries
+    snapshot = DashboardSnapshot(business, pending_cursor=request.GET.get('pending_cursor'))
+    context = snapshot.context()
+    context.update({
+        'staff_profile': staff_profile,
+        'is_manager': staff_profile.is_manager,
+        'can_manage_staff': staff_profile.can_manage_staff(),
+        'can_manage_payments': staff_profile.can_manage_payments(),
+        'pet_bookings_json': json.dumps(context['pet_bookings']),
+    })
+    return render(request, 'staff/dashboard_new.html', context)
+
+
+@login_required
+def occupancy(request):
+    """Manager occupancy report over a multi-month window (?start=YYYY-MM-DD&days=N)"""
+    staff_profile = getattr(request.user, 'staff_profile', None)
+    if not staff_profile or not staff_profile.is_manager:
+        messages.error(request, 'Only managers can view the occupancy report.')
+        return redirect('staff:dashboard')
+    business = staff_profile.business
     
-    # Generate booking data for mini calendars (next 15 days)
-    pet_bookings_json = {}
-    today = timezone.now().date()
+    try:
+        start_date = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else timezone.now().date()
+        days = max(1, min(int(request.GET.get('days', 90)), OCCUPANCY_MAX_DAYS))
+    except ValueError:
+        messages.error(request, 'Invalid date range.')
+        return redirect('staff:occupancy')
+    end_date = start_date + timedelta(days=days - 1)
+    occupancy_days = occupancy_by_day(business, start_date, end_date)
     
-    for pet in pets:
-        pet_bookings = ServiceBooking.objects.filter(
-            pet=pet,
-            status__in=['pending', 'confirmed']
-        ).select_related('slot').order_by('slot__date')
-        
-        pet_bookings_by_date = {}
-        for booking in pet_bookings:
-            date_str = booking.slot.date.isoformat()
-            if date_str not in pet_bookings_by_date:
-                pet_bookings_by_date[date_str] = []
-            
-            pet_bookings_by_date[date_str].append({
+    return render(request, 'staff/occupancy.html', {
+        'business': business,
+        'occupancy_days': occupancy_days,
+        'start_date': start_date,
+        'end_date': end_date,
+        'days': days,
+        'total_capacity': sum(d['capacity'] for d in occupancy_days),
+        'total_booked': sum(d['booked'] for d in occupancy_days),
+        'total_pending': sum(d['pending'] for d in occupancy_days),
+    })
+
+
+def changes(request):
+    """
+    Dashboard delta poll (?since=<version>): check-in flips, booking status changes
+    and the figures they moved since the version the page was rendered at. An idle
+    business is answered from one range scan of the change log.
+    """
+    staff_profile = getattr(request.user, 'staff_profile', None)
+    if not staff_profile:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'since must be a change version'}, status=400)
+    
+    entries = DashboardChange.since(staff_profile.business_id, since, CHANGES_LIMIT)
+    if entries is None:
+        return JsonResponse({'reload': True})
+    if not entries:
+        return JsonResponse({'version': since})
+    
+    delta = DashboardSnapshot(staff_profile.business).changes(entries)
+    data = {'version': delta['version']}
+    if 'checkins' in delta:
+        live = delta['live']
+        data['checkins'] = delta['checkins']
+        data['occupancy'] = {'in_house': live.in_house, 'pets': live.pets, 'occupancy_pct': round(live.occupancy_pct)}
+    if 'bookings' in delta:
+        data['bookings'] = [
+            {
                 'id': booking.id,
                 'status': booking.status,
-                'service': booking.slot.service.type,
-                'time': booking.slot.start_time.strftime('%H:%M'),
-            })
-        
-        pet_bookings_json[pet.id] = pet_bookings_by_date
+                'html': render_to_string('staff/_pending_booking.html', {'booking': booking}, request)
+                if booking.status == 'pending' else '',
+            }
+            for booking in delta['bookings']
+        ]
+        data['pending_count'] = delta['pending_count']
+        data['occupancy_html'] = render_to_string(
+            'staff/_occupancy_table.html', {'occupancy_days': delta['occupancy_days']}, request,
+        )
+    return JsonResponse(data)
+
+
+def occupancy_live(request):
+    """In-house headline as JSON for dashboard polling: one cache hit, no pet list"""
+    staff_profile = getattr(request.user, 'staff_profile', None)
+    if not staff_profile:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    live = LiveOccupancy.current(staff_profile.business_id)
+    return JsonResponse({
+        'in_house': live.in_house,
+        'pets': live.pets,
+        'occupancy_pct': round(live.occupancy_pct, 1),
+        'updated_at': live.updated_at.isoformat(),
+    })
+
+
+@login_required
+def forecast(request):
+    """Manager capacity simulator: demand and projected overflow per recurring slot (?days=N&candidates=1,2,3)"""
+    staff_profile = getattr(request.user, 'staff_profile', None)
+    if not staff_profile or not staff_profile.is_manager:
+        messages.error(request, 'Only managers can view the capacity forecast.')
+        return redirect('staff:dashboard')
+    business = staff_profile.business
     
-    # Get staff profile for role-based permissions
-    staff_profile = request.user.staff_profile
+    try:
+        days = max(7, min(int(request.GET.get('days', 365)), FORECAST_MAX_DAYS))
+        candidates = [int(c) for c in request.GET.get('candidates', '').split(',') if c.strip()] or list(DEFAULT_CANDIDATES)
+    except ValueError:
+        messages.error(request, 'Invalid forecast parameters.')
+        return redirect('staff:forecast')
+    candidates = sorted({c for c in candidates if c > 0})[:10] or list(DEFAULT_CANDIDATES)
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=days)
+    
+    result = forecast_capacity([business.id], start_date, end_date, candidates)
+    services = dict(Service.objects.values_list('id', 'type'))
+    rows = []
+    for row in result.rows():
+        row['service'] = services.get(row['service_id'], '')
+        row['weekday_name'] = WEEKDAY_NAMES[row['weekday']]
+        row['p90_fill'] = row['fill_percentiles'].get(90)
+        row['overflow_by_candidate'] = [row['overflow'][c] for c in result.candidates.tolist()]
+        rows.append(row)
     
-    return render(request, 'staff/dashboard_new.html', {
+    return render(request, 'staff/forecast.html', {
         'business': business,
-        'staff_profile': staff_profile,
-        'is_manager': staff_profile.is_manager,
-        'can_manage_staff': staff_profile.can_manage_staff(),
-        'can_manage_payments': staff_profile.can_manage_payments(),
-        'pets': pets,
-        'pet_checkins': pet_checkins,
-        'in_house_count': in_house_count,
-        'occupancy_pct': occupancy_pct,
-        'recent_woofs': recent_woofs,
-        'pending_bookings': pending_bookings,
-        'pet_bookings_json': json.dumps(pet_bookings_json),
+        'rows': rows,
+        'candidates': result.candidates.tolist(),
+        'days': days,
+        'start_date': start_date,
+        'end_date': end_date,
+        'target_pct': DEFAULT_TARGET_OVERFLOW * 100,
+    })
+
+
+@login_required
+def search(request):
+    """Full-text search of the business's woofs, pet notes and allergies and training entries (?q=&kind=&days=)"""
+    staff_profile = getattr(request.user, 'staff_profile', None)
+    as_json = request.GET.get('format') == 'json'
+    if not staff_profile:
+        if as_json:
+            return JsonResponse({'error': 'forbidden'}, status=403)
+        messages.error(request, 'You are not authorized to search this business.')
+        return redirect('home:index')
+    business = staff_profile.business
+
+    query = request.GET.get('q', '').strip()[:SEARCH_MAX_LENGTH]
+    kind = request.GET.get('kind', '')
+    if kind not in search_index.KINDS:
+        kind = ''
+    try:
+        days = max(0, min(int(request.GET.get('days') or 0), SEARCH_MAX_DAYS))
+    except ValueError:
+        days = 0
+    since = timezone.now() - timedelta(days=days) if days else None
+    hits = search_index.search(business.id, query, kinds=[kind] if kind else None, since=since) if query else []
+
+    if as_json:
+        return JsonResponse({
+            'query': query,
+            'results': [
+                {
+                    'kind': hit.kind,
+                    'id': hit.id,
+                    'pet_id': hit.pet_id,
+                    'pet': hit.pet.name,
+                    'title': getattr(hit.obj, 'title', ''),
+                    'snippet': hit.snippet,
+                    'created': hit.created.isoformat() if hit.created else None,
+                }
+                for hit in hits
+            ],
+        })
+    if query and not search_index.available():
+        messages.error(request, 'Search is not available on this database.')
+    return render(request, 'staff/search.html', {
+        'business': business,
+        'query': query,
+        'kind': kind,
+        'days': days or '',
+        'kinds': search_index.KINDS,
+        'hits': hits,
     })
 
 
@@ -177,104 +362,47 @@ def feed(request):
         messages.error(request, 'Please log in to access the staff feed.')
         return redirect('account_login')
     
-    # Get staff record from authenticated user
-    if hasattr(request.user, 'staff_profile') and request.user.staff_profile:
-        business = request.user.staff_profile.business
+    # Get staff record (and its business) from authenticated user
+    staff_profile = Staff.objects.select_related('business').filter(user=request.user).first()
+    if staff_profile:
+        business = staff_profile.business
     else:
         messages.error(request, 'You are not authorized to access the staff feed.')
         return redirect('home:index')
     
-    pets = Pet.objects.filter(business=business).order_by('name')
-    pet_checkins = {pet.id: CheckIn.objects.filter(pet=pet).first() for pet in pets}
-
-    # Unified feed: pet woofs (all, top-level) + global woofs
-    pet_woofs = Woof.objects.filter(parent_woof__isnull=True).select_related('pet', 'staff').order_by('-created_at')
-    global_woofs = GlobalWoof.objects.select_related('staff').order_by('-created_at')
-
-    # Normalize to unified list with label and type for rendering
-    feed_items = []
-    for gw in global_woofs:
-        feed_items.append({
-            'type': 'global',
-            'label': 'BUSINESS',
-            'created_at': gw.created_at,
-            'author': gw.staff,
-            'message': gw.message,
-            'attachment': gw.attachment,
-            'obj': gw,
-        })
-    for w in pet_woofs:
-        feed_items.append({
-            'type': 'pet',
-            'label': w.pet.name if w.pet else 'PET',
-            'created_at': w.created_at,
-            'author': w.staff or w.tutor,
-            'message': w.message,
-            'attachment': w.attachment,
-            'obj': w,
-        })
-
-    feed_items.sort(key=lambda x: x['created_at'], reverse=True)
-
-    # Pagination
-    try:
-        page = int(request.GET.get('page', '1'))
-    except ValueError:
-        page = 1
-    page_size = 20
-    start = (page - 1) * page_size
-    end = start + page_size
-    total = len(feed_items)
-    page_items = feed_items[start:end]
-
-    # JSON for auto-refresh
+    # JSON for auto-refresh: entries newer than the client's newest cursor. Tablets
+    # that are up to date share one cached answer until the next woof is written
     if request.GET.get('format') == 'json':
-        since = request.GET.get('since')
-        new_items = []
-        from django.utils.dateparse import parse_datetime
-        since_dt = parse_datetime(since) if since else None
-        for item in feed_items:
-            if since_dt and item['created_at'] <= since_dt:
-                break
-            new_items.append({
-                'type': item['type'],
-                'label': item['label'],
-                'created_at': item['created_at'].isoformat(),
-                'author': getattr(item['author'], 'first_name', getattr(item['author'], 'name', '')) if item['author'] else '',
-                'message': item['message'] or '',
-                'attachment_url': item['attachment'].url if item['attachment'] else '',
-            })
-        from django.http import JsonResponse
-        return JsonResponse({'items': new_items})
-
+        since = page_key(request.GET.get('since'))
+        head = cached(business.id, 'staff-json', '', lambda: _feed_json(business, ''))
+        if not since:
+            return JsonResponse(head)
+        # Only positions on the newest page are cached, so made-up cursors can't
+        # fill the cache; clients further behind are answered from the database
+        if since in {item['cursor'] for item in head['items']}:
+            return JsonResponse(cached(business.id, 'staff-json', since, lambda: _feed_json(business, since)))
+        return JsonResponse(_feed_json(business, since))
+    
     # POST handling: allow actions (checkin/checkout/woof/global_woof) from the same page
     if request.method == 'POST':
         action = request.POST.get('action')
         pet_id = request.POST.get('pet_id')
         pet = None
-        checkin = None
-        created = False
         if action in ['checkin', 'checkout', 'woof']:
             if not pet_id:
                 messages.error(request, 'Pet ID is required for this action.')
                 return redirect('staff:feed')
             try:
-                pet = Pet.objects.get(id=pet_id)
+                pet = Pet.objects.get(id=pet_id, business=business)
             except Pet.DoesNotExist:
                 messages.error(request, 'Pet not found.')
                 return redirect('staff:feed')
-            checkin, created = CheckIn.objects.get_or_create(pet=pet)
 
         if action == 'checkin':
-            checkin.is_present = True
-            checkin.checkin_time = timezone.now()
-            checkin.checkout_time = None
-            checkin.save()
+            checkin, created, changed = CheckIn.set_presence(pet, True)
             messages.success(request, f"✅ {pet.name} checked IN at {timezone.now().strftime('%H:%M')}")
         elif action == 'checkout':
-            checkin.is_present = False
-            checkin.checkout_time = timezone.now()
-            checkin.save()
+            CheckIn.set_presence(pet, False)
             messages.success(request, f"❌ {pet.name} checked OUT at {timezone.now().strftime('%H:%M')}")
         elif action == 'woof':
             message = request.POST.get('woof_message', '').strip()
@@ -299,7 +427,7 @@ def feed(request):
             message = request.POST.get('global_message', '').strip()
             attachment = request.FILES.get('global_attachment')
             if message or attachment:
-                GlobalWoof.objects.create(message=message, staff=request.user, attachment=attachment)
+                GlobalWoof.objects.create(business=business, message=message, staff=request.user, attachment=attachment)
                 messages.success(request, 'Global woof sent to all tutors!')
         elif action == 'woof_reply_staff':
             parent_id = request.POST.get('parent_woof_id')
@@ -324,16 +452,61 @@ def feed(request):
 
         return redirect('staff:feed')
 
+    # One keyset page of pet woofs and global woofs merged in SQL, replies prefetched,
+    # rendered once per write and shared by every staff member of the business
+    cursor = page_key(request.GET.get('cursor'))
     return render(request, 'staff/feed.html', {
         'business': business,
-        'pets': pets,
-        'pet_checkins': pet_checkins,
-        'feed_items': page_items,
-        'page': page,
-        'has_next': end < total,
-        'next_page': page + 1,
+        # The dashboard's in-house headline; only the cached live counters are read
+        'snapshot': DashboardSnapshot(business),
+        'feed_html': cached_fragment(
+            request, business.id, 'staff', cursor, 'staff/_feed_page.html', lambda: _feed_page(business, cursor),
+        ),
     })
 
+
+def _feed_page(business, cursor):
+    entries, next_cursor = feed_page(business, cursor or None)
+    return {'feed_items': [_feed_item(entry) for entry in entries], 'next_cursor': next_cursor}
+
+
+def _feed_json(business, since):
+    entries = feed_since(business, since or None)
+    return {
+        'items': [
+            {
+                'type': item['type'],
+                'label': item['label'],
+                'cursor': item['cursor'],
+                'created_at': item['created_at'].isoformat(),
+                'author': getattr(item['author'], 'first_name', getattr(item['author'], 'name', '')) if item['author'] else '',
+                'message': item['message'] or '',
+                'attachment_url': item['attachment'].url if item['attachment'] else '',
+            }
+            for item in map(_feed_item, entries)
+        ],
+        'cursor': entries[0].cursor if entries else since,
+    }
+
+
+def _feed_item(entry):
+    """Template/JSON shape of a tutor.feed entry"""
+    obj = entry.obj
+    if entry.kind == 'global':
+        label, author = 'BUSINESS', obj.staff
+    else:
+        label, author = obj.pet.name if obj.pet else 'PET', obj.staff or obj.tutor
+    return {
+        'type': entry.kind,
+        'label': label,
+        'cursor': entry.cursor,
+        'created_at': entry.created_at,
+        'author': author,
+        'message': obj.message,
+        'attachment': obj.attachment,
+        'obj': obj,
+    }
+
 @login_required
 def pet_sheet(request, pet_id):
     """Pet sheet view - requires authentication"""
@@ -0,0 +1,207 @@
+"""
+Shared pieces of the performance regression tests (staff/tests.py, tutor/tests.py).
+
+seed_tenant() builds a synthetic business of a given size with bulk inserts.
+PerfTestCase drives views through the test client and asserts query-count budgets
+that must hold at every size. Best-of-N wall times are compared against
+perf_baseline.json on every run; the baseline was recorded on one machine, so the
+default limit is generous (PERF_TOLERANCE/PERF_SLACK tighten it, PERF_TIMINGS=0
+turns timing off on slow or busy hosts). PERF_UPDATE_BASELINE=1 re-records it.
+"""
+import json
+import os
+import time as timer
+from dataclasses import dataclass, field
+from datetime import date, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from petcrm.metrics import QueryCounter
+from pets.models import Business, Pet, Staff, Tutor
+from reservations import schedule
+from reservations.models import CheckIn, Service, ServiceBooking, ServiceSlot
+from search import index as search_index
+from tutor.models import GlobalWoof, TimelineEntry, Woof
+
+BASELINE_PATH = os.environ.get('PERF_BASELINE', os.path.join(settings.BASE_DIR, 'perf_baseline.json'))
+# A run fails when it is slower than baseline * TOLERANCE + SLACK seconds
+TOLERANCE = float(os.environ.get('PERF_TOLERANCE', '4.0'))
+SLACK = float(os.environ.get('PERF_SLACK', '0.1'))
+REPEAT = int(os.environ.get('PERF_REPEAT', '3'))
+# Free slots per tenant for booking POSTs: two per request of a measure()
+BOOKING_SLOTS = 2 * (REPEAT + 2)
+CHECK_TIMINGS = os.environ.get('PERF_TIMINGS', '1') != '0'
+UPDATE_BASELINE = bool(os.environ.get('PERF_UPDATE_BASELINE'))
+
+# Tenant sizes driven by every view test: the main tutor owns pets_per_tutor pets
+SIZES = {
+    'small': {'tutors': 2, 'pets_per_tutor': 2, 'woofs_per_pet': 2},
+    'medium': {'tutors': 10, 'pets_per_tutor': 8, 'woofs_per_pet': 4},
+    'large': {'tutors': 25, 'pets_per_tutor': 20, 'woofs_per_pet': 6},
+}
+
+
+@dataclass
+class Tenant:
+    business: Business
+    manager: User
+    tutor_user: User
+    tutor: Tutor
+    pets: list            # The main tutor's pets
+    booking_slots: list = field(default_factory=list)  # Free slots for booking POSTs
+
+
+def seed_tenant(name, tutors, pets_per_tutor, woofs_per_pet):
+    """
+    One business with a manager, `tutors` tutors owning `pets_per_tutor` pets each,
+    check-ins for half the pets, `woofs_per_pet` staff woofs per pet (each with a
+    tutor reply), as many global woofs, the tutors' timelines and search index, and a
+    pending booking for every pet of the main tutor. Everything except the two login users is bulk
+    inserted.
+    """
+    business = Business.objects.create(name=name)
+    manager = User.objects.create_user(username=f'{name}-manager', email=f'{name}-manager@example.com')
+    Staff.objects.create(user=manager, business=business, role='manager')
+    tutor_user = User.objects.create_user(username=f'{name}-tutor', email=f'{name}-tutor@example.com')
+
+    all_tutors = Tutor.objects.bulk_create(
+        [Tutor(name=f'{name} Tutor {i}', business=business, user=tutor_user if i == 0 else None) for i in range(tutors)]
+    )
+    pets = Pet.objects.bulk_create(
+        [Pet(name=f'{name} Pet {t}-{p}', business=business) for t in range(tutors) for p in range(pets_per_tutor)]
+    )
+    owners = [all_tutors[i // pets_per_tutor] for i in range(len(pets))]
+    Pet.tutors.through.objects.bulk_create(
+        [Pet.tutors.through(pet_id=pet.id, tutor_id=owner.id) for pet, owner in zip(pets, owners)]
+    )
+    CheckIn.objects.bulk_create(
+        [CheckIn(pet=pet, is_present=True, checkin_time=None) for pet in pets[::2]]
+    )
+
+    woofs = Woof.objects.bulk_create(
+        [
+            # Every woof gets one reply below
+            Woof(business=business, pet=pet, staff=manager, message=f'{pet.name} update {n}', reply_count=1)
+            for pet in pets for n in range(woofs_per_pet)
+        ]
+    )
+    Woof.objects.bulk_create(
+        [
+            Woof(business=business, pet=woof.pet, tutor=owner, parent_woof=woof, root=woof, depth=1, message='Thanks!')
+            for woof, owner in zip(woofs, [o for o in owners for _ in range(woofs_per_pet)])
+        ]
+    )
+    GlobalWoof.objects.bulk_create(
+        [GlobalWoof(business=business, staff=manager, message=f'News {n}') for n in range(woofs_per_pet)]
+    )
+    # Bulk inserts skip the fan-out signals
+    TimelineEntry.objects.rebuild(tutor.id for tutor in all_tutors)
+    search_index.rebuild(business.id)
+
+    service, _ = Service.objects.get_or_create(type='daycare')
+    tomorrow = date.today() + timedelta(days=1)
+    slots = ServiceSlot.objects.bulk_create(
+        [
+            ServiceSlot(business=business, service=service, date=tomorrow + timedelta(days=n),
+                        start_time=time(6, 0), end_time=time(7, 0), max_capacity=len(pets))
+            for n in range(BOOKING_SLOTS + 1)
+        ]
+    )
+    main_pets = pets[:pets_per_tutor]
+    ServiceBooking.objects.bulk_create(
+        [ServiceBooking(slot=slots[0], business=business, pet=pet, tutor=all_tutors[0]) for pet in main_pets]
+    )
+    return Tenant(business, manager, tutor_user, all_tutors[0], main_pets, slots[1:])
+
+
+class PerfTestCase(TestCase):
+    """Seeds one tenant per SIZES entry and checks query budgets and wall-time baselines"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenants = {size: seed_tenant(f'perf-{size}', **shape) for size, shape in SIZES.items()}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.timings = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINE:
+            _write_baseline(cls.timings)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Compiled schedules are cached per process by business id, and ids are
+        # reused once each test's transaction rolls back
+        schedule._schedules.clear()
+        # Same for cached counters such as LiveOccupancy
+        cache.clear()
+
+    def measure(self, label, size, request, warm=True, before=None):
+        """
+        Run `request()` (a test client call) once to warm caches, then once under
+        query capture and REPEAT times for timing. `before()` runs ahead of the
+        measured and timed calls, e.g. to invalidate a cache the warm-up filled.
+        Returns (response, query_count).
+        """
+        if warm:
+            request()
+        if before:
+            before()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = request()
+        best = None
+        for _ in range(REPEAT if warm and (CHECK_TIMINGS or UPDATE_BASELINE) else 0):
+            if before:
+                before()
+            started = timer.perf_counter()
+            request()
+            elapsed = timer.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        if best is not None:
+            self.check_timing(label, size, best)
+        return response, queries.count
+
+    def check_timing(self, label, size, seconds):
+        self.timings.setdefault(label, {})[size] = seconds
+        baseline = _load_baseline().get(label, {}).get(size)
+        if baseline is not None and CHECK_TIMINGS and not UPDATE_BASELINE:
+            limit = baseline * TOLERANCE + SLACK
+            self.assertLessEqual(
+                seconds, limit,
+                f'{label} [{size}] took {seconds * 1000:.1f}ms, baseline {baseline * 1000:.1f}ms (limit {limit * 1000:.1f}ms)',
+            )
+
+    def assertQueryBudget(self, label, counts, budget):
+        """Every size stays within budget and no size needs more queries than the smallest"""
+        for size, count in counts.items():
+            self.assertLessEqual(count, budget, f'{label} [{size}] ran {count} queries, budget is {budget}')
+        smallest = counts[next(iter(SIZES))]
+        for size, count in counts.items():
+            self.assertEqual(count, smallest, f'{label} query count grows with tenant size: {counts}')
+
+
+def _load_baseline():
+    try:
+        with open(BASELINE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_baseline(timings):
+    """Replace the baseline of every timing measured by this test class"""
+    if not timings:
+        return
+    baseline = _load_baseline()
+    for label, sizes in timings.items():
+        for size, seconds in sizes.items():
+            baseline.setdefault(label, {})[size] = round(seconds, 5)
+    with open(BASELINE_PATH, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,250 @@
+"""
+The woof feed: a business's top-level pet woofs and its GlobalWoofs, newest first.
+
+The two tables are merged in SQL: one UNION ALL over a common (created_at, kind, id)
+projection, ordered and cut to a page by the database, each branch read backwards
+through a (..., created_at, id) index. Only the rows of the page are then loaded.
+Pages are keyset paginated on (created_at, kind, id), so page N and the JSON poll
+cost the same whatever the length of the history.
+
+A tutor's feed is also materialized per tutor (TimelineEntry, fan-out on write);
+timeline_page() reads it with one range scan and returns the same entries and
+cursors as feed_page(business, pets=tutor's pets).
+
+Rendered pages and JSON polls are cached per business, audience and page under a
+per-business generation number (cached()). Saving or deleting a woof bumps the
+generation (tutor.signals), so polls that find nothing new never reach the
+database. The cache is settings.CACHES['default'].
+"""
+import time as timer
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import CharField, Q, Value
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.safestring import mark_safe
+from petcrm import metrics
+from .models import GlobalWoof, TimelineEntry, Woof
+from .threads import attach_threads
+
+# Feed items per page (and most items returned by one poll)
+PAGE_SIZE = 20
+# kind values, in their sort order within one created_at
+KINDS = ('global', 'pet')
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Upper bound on a cached page's age: covers what no woof signal reports (a pet
+# renamed, an author's name changed)
+CACHE_SECONDS = 300
+# Stands in for the CSRF token in cached fragments; each response gets its own
+_CSRF_PLACEHOLDER = '__feed_csrf_token__'
+
+
+@dataclass
+class FeedEntry:
+    kind: str               # 'pet' (a top-level Woof) or 'global' (a GlobalWoof)
+    id: int
+    created_at: datetime
+    obj: object = None      # The Woof or GlobalWoof, loaded with its authors
+
+    @property
+    def cursor(self):
+        """Opaque position of this entry, for ?cursor= (older) or ?since= (newer)"""
+        return f'{(self.created_at - _EPOCH) // timedelta(microseconds=1)}-{self.kind}-{self.id}'
+
+
+def parse_cursor(value):
+    """
+    (created_at, kind, id) from a cursor. An ISO timestamp (what older clients poll
+    with) gives (created_at, None, None), meaning strictly after it. None if invalid.
+    """
+    if not value:
+        return None
+    parts = value.split('-')
+    if len(parts) == 3 and parts[1] in KINDS:
+        try:
+            return _EPOCH + timedelta(microseconds=int(parts[0])), parts[1], int(parts[2])
+        except ValueError:
+            return None
+    try:
+        created_at = parse_datetime(value)
+    except ValueError:
+        return None
+    if created_at is None:
+        return None
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return created_at, None, None
+
+
+def feed_page(business, cursor=None, pets=None, limit=PAGE_SIZE):
+    """
+    One page of the feed, newest first, starting after `cursor` (the next_cursor of
+    the previous page). `pets` limits pet woofs to those pets (a tutor's feed).
+    The page's woofs come with their reply threads (tutor.threads).
+    Returns (entries, next_cursor or None).
+    """
+    position = parse_cursor(cursor)
+    if position and position[1] is None:
+        position = None
+    entries = _load(_merged(business, pets, position, newer=False, limit=limit + 1), replies=True)
+    if len(entries) <= limit:
+        return entries, None
+    return entries[:limit], entries[limit - 1].cursor
+
+
+def feed_since(business, since=None, pets=None, limit=PAGE_SIZE):
+    """
+    Entries newer than `since` (a cursor or ISO timestamp), newest first. When more
+    than `limit` are new, the oldest `limit` are returned and the next poll, from
+    the newest of them, continues. Without `since`, the newest page.
+    """
+    position = parse_cursor(since)
+    if position is None:
+        return _load(_merged(business, pets, None, newer=False, limit=limit), replies=False)
+    entries = _load(_merged(business, pets, position, newer=True, limit=limit), replies=False)
+    entries.reverse()
+    return entries
+
+
+def timeline_page(tutor, cursor=None, limit=PAGE_SIZE):
+    """feed_page() for one tutor, read from the tutor's materialized timeline"""
+    entries = TimelineEntry.objects.filter(tutor=tutor)
+    position = parse_cursor(cursor)
+    if position and position[1] is not None:
+        created_at, kind, entry_id = position
+        entries = entries.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, kind__lt=kind)
+            | Q(created_at=created_at, kind=kind, **{'woof_id__lt' if kind == 'pet' else 'global_woof_id__lt': entry_id})
+        )
+    rows = entries.order_by('-created_at', '-kind', '-woof_id', '-global_woof_id').values_list(
+        'created_at', 'kind', 'woof_id', 'global_woof_id',
+    )[:limit + 1]
+    loaded = _load([(created_at, kind, woof_id or global_id) for created_at, kind, woof_id, global_id in rows], replies=True)
+    if len(loaded) <= limit:
+        return loaded, None
+    return loaded[:limit], loaded[limit - 1].cursor
+
+
+def _branches(business, pets):
+    """(kind, queryset) for each branch of the UNION ALL"""
+    woofs = Woof.objects.filter(business=business, parent_woof__isnull=True)
+    if pets is None:
+        yield 'pet', woofs
+    else:
+        # A branch per pet keeps each one an ordered scan of woof_pet_feed_idx
+        for pet in pets:
+            yield 'pet', woofs.filter(pet=pet)
+    yield 'global', GlobalWoof.objects.filter(business=business)
+
+
+def _keyset(kind, position, newer):
+    """Rows of a branch of constant `kind` after `position` in (created_at, kind, id) order"""
+    created_at, cursor_kind, cursor_id = position
+    strict = Q(created_at__gt=created_at) if newer else Q(created_at__lt=created_at)
+    if cursor_kind is None:
+        return strict
+    if kind == cursor_kind:
+        return strict | Q(created_at=created_at, **{'id__gt' if newer else 'id__lt': cursor_id})
+    if (kind > cursor_kind) == newer:
+        # This kind sorts on the far side of the cursor's: ties on created_at count
+        return strict | Q(created_at=created_at)
+    return strict
+
+
+def _merged(business, pets, position, newer, limit):
+    """[(created_at, kind, id), ...] of up to `limit` entries after `position`, in walking order"""
+    direction = '' if newer else '-'
+    parts = []
+    for kind, queryset in _branches(business, pets):
+        if position:
+            queryset = queryset.filter(_keyset(kind, position, newer))
+        part = queryset.annotate(kind=Value(kind, output_field=CharField())).values_list('created_at', 'kind', 'id')
+        if connection.features.supports_slicing_ordering_in_compound:
+            # PostgreSQL: stop every branch at a page too. SQLite merges the ordered
+            # branches itself (MERGE (UNION ALL)) and stops at the LIMIT.
+            part = part.order_by(f'{direction}created_at', f'{direction}id')[:limit]
+        parts.append(part)
+    merged = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    return list(merged.order_by(f'{direction}created_at', f'{direction}kind', f'{direction}id')[:limit])
+
+
+def _load(rows, replies):
+    """FeedEntry per row with its object attached: one query per kind present (and the threads)"""
+    entries = [FeedEntry(kind, entry_id, created_at) for created_at, kind, entry_id in rows]
+    woof_ids = [e.id for e in entries if e.kind == 'pet']
+    global_ids = [e.id for e in entries if e.kind == 'global']
+    woofs = Woof.objects.select_related('pet', 'staff', 'tutor').in_bulk(woof_ids) if woof_ids else {}
+    globals_ = GlobalWoof.objects.select_related('staff').in_bulk(global_ids) if global_ids else {}
+    if replies:
+        attach_threads(woofs.values())
+    for entry in entries:
+        entry.obj = woofs.get(entry.id) if entry.kind == 'pet' else globals_.get(entry.id)
+    # Deleted between the two reads
+    return [entry for entry in entries if entry.obj is not None]
+
+
+def page_key(cursor):
+    """
+    `cursor` as part of a cache key: '' for the first page and anything that falls
+    back to it, otherwise the canonical form of its position, so spellings of the
+    same position (leading zeros, timezones) share one key.
+    """
+    position = parse_cursor(cursor)
+    if position is None:
+        return ''
+    created_at, kind, entry_id = position
+    if kind is None:
+        return created_at.astimezone(dt_timezone.utc).isoformat()
+    return FeedEntry(kind, entry_id, created_at).cursor
+
+
+def generation(business_id):
+    """The business's current feed generation; cached pages of older ones are never read"""
+    key = f'feed-generation:{business_id}'
+    value = cache.get(key)
+    if value is None:
+        # Start from the clock: a counter that was evicted can't come back to an old value
+        cache.add(key, timer.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def invalidate(business_id):
+    """Drop every cached feed page of the business (call once the write has committed)"""
+    key = f'feed-generation:{business_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, timer.time_ns(), timeout=None)
+
+
+def cached(business_id, audience, page, build):
+    """
+    build() once per (business generation, audience, page). `audience` names who
+    the value is for ('staff', 'staff-json', 'tutor-<id>'); `page` is a page_key().
+    """
+    key = f'feed:{business_id}:{generation(business_id)}:{audience}:{page}'
+    value = cache.get(key)
+    hit = value is not None
+    if not hit:
+        value = build()
+        cache.set(key, value, CACHE_SECONDS)
+    metrics.inc('petcrm_feed_cache_requests_total', audience=audience.rstrip('0123456789-'), result='hit' if hit else 'miss')
+    return value
+
+
+def cached_fragment(request, business_id, audience, page, template_name, context):
+    """
+    `template_name` rendered with context() through cached(). The fragment is shared
+    between users, so it is rendered without the request and the CSRF token of its
+    reply forms is filled in per response.
+    """
+    html = cached(business_id, audience, page, lambda: render_to_string(
+        template_name, {**context(), 'csrf_token': _CSRF_PLACEHOLDER},
+    ))
+    return mark_safe(html.replace(_CSRF_PLACEHOLDER, get_token(request)))
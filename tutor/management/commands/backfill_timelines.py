@@ -0,0 +1,32 @@
+import time as timer
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from pets.models import Business, Tutor
+from tutor.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild tutor timelines (TimelineEntry) from woofs and global woofs: after migrating or bulk imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help='Business id (default: all businesses)')
+        parser.add_argument('--chunk', type=int, default=500, help='Tutors rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        tutors = Tutor.objects.order_by('id')
+        if options['business']:
+            if not Business.objects.filter(id=options['business']).exists():
+                raise CommandError(f'Business {options["business"]} not found')
+            tutors = tutors.filter(business_id=options['business'])
+        tutor_ids = list(tutors.values_list('id', flat=True))
+
+        started = timer.perf_counter()
+        written = 0
+        for n in range(0, len(tutor_ids), options['chunk']):
+            chunk = tutor_ids[n:n + options['chunk']]
+            with transaction.atomic():
+                written += TimelineEntry.objects.rebuild(chunk)
+            self.stdout.write(f'  {n + len(chunk)}/{len(tutor_ids)} tutors, {written} entries')
+        self.stdout.write(
+            f'✓ Rebuilt {len(tutor_ids)} timelines: {written} entries in {timer.perf_counter() - started:.1f}s'
+        )
@@ -0,0 +1,139 @@
+import random
+import statistics
+import time as timer
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from home.management.commands.generate_load_data import batched, explicit_timestamps
+from petcrm.metrics import QueryCounter
+from pets.models import Business, Pet, Tutor
+from tutor.feed import feed_page, timeline_page
+from tutor.models import GlobalWoof, TimelineEntry, Woof
+
+
+class Rollback(Exception):
+    pass
+
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark tutor feed reads: fan-out on read (feed_page over the woof tables) vs '
+        'the materialized timeline (runs in a rolled-back transaction)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tutors', type=int, default=10_000)
+        parser.add_argument('--pets-per-tutor', type=int, default=1)
+        parser.add_argument('--woofs-per-pet', type=int, default=10)
+        parser.add_argument('--global-woofs', type=int, default=50)
+        parser.add_argument('--days', type=int, default=90, help='History the woofs are spread over')
+        parser.add_argument('--samples', type=int, default=200, help='Tutors whose feed is read')
+        parser.add_argument('--depth', type=int, default=5, help='Also read this page of each sampled feed')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                business, tutors = self.seed(options)
+                self.measure_writes(business, tutors)
+                self.measure_reads(business, tutors, options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def seed(self, options):
+        started = timer.perf_counter()
+        now = timezone.now()
+        span = options['days'] * 86400
+        business = Business.objects.create(name='Bench Timeline Business')
+        staff = User.objects.create_user(username='bench-timeline-staff', email='bench-timeline-staff@example.com')
+        tutors = []
+        for batch in batched((Tutor(name=f'Tutor {i}', business=business) for i in range(options['tutors'])), 2000):
+            tutors += Tutor.objects.bulk_create(batch)
+        pets = []
+        for batch in batched(
+            (Pet(name=f'Pet {i}-{n}', business=business) for i in range(len(tutors)) for n in range(options['pets_per_tutor'])),
+            2000,
+        ):
+            pets += Pet.objects.bulk_create(batch)
+        for batch in batched(
+            (Pet.tutors.through(pet_id=pet.id, tutor_id=tutors[i // options['pets_per_tutor']].id) for i, pet in enumerate(pets)),
+            2000,
+        ):
+            Pet.tutors.through.objects.bulk_create(batch)
+
+        def moment():
+            return now - timedelta(seconds=self.rng.randrange(span))
+
+        with explicit_timestamps(Woof._meta.get_field('created_at'), GlobalWoof._meta.get_field('created_at')):
+            woofs = (
+                Woof(business=business, pet_id=pet.id, staff=staff, message='Update', created_at=moment())
+                for pet in pets for _ in range(options['woofs_per_pet'])
+            )
+            for batch in batched(woofs, 2000):
+                Woof.objects.bulk_create(batch)
+            GlobalWoof.objects.bulk_create(
+                [GlobalWoof(business=business, staff=staff, message='News', created_at=moment())
+                 for _ in range(options['global_woofs'])]
+            )
+        self.stdout.write(
+            f'🌱 {len(tutors)} tutors, {len(pets)} pets, {len(pets) * options["woofs_per_pet"]} woofs, '
+            f'{options["global_woofs"]} global woofs ({timer.perf_counter() - started:.1f}s)'
+        )
+
+        started = timer.perf_counter()
+        entries = TimelineEntry.objects.rebuild(tutor.id for tutor in tutors)
+        self.stdout.write(f'📰 Backfilled {entries} timeline entries in {timer.perf_counter() - started:.1f}s')
+        self.staff = staff
+        return business, tutors
+
+    def measure_writes(self, business, tutors):
+        """The price of fan-out on write: one pet woof and one global woof to every tutor"""
+        pet = Pet.objects.filter(business=business).first()
+        for label, create in (
+            ('pet woof', lambda: Woof.objects.create(business=business, pet=pet, staff=self.staff, message='Live')),
+            ('global woof', lambda: GlobalWoof.objects.create(business=business, staff=self.staff, message='Live')),
+        ):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = timer.perf_counter()
+                create()
+                elapsed = timer.perf_counter() - started
+            self.stdout.write(f'✍️  Posting a {label}: {elapsed * 1000:.1f}ms, {counter.count} queries')
+
+    def measure_reads(self, business, tutors, options):
+        sample = self.rng.sample(tutors, min(options['samples'], len(tutors)))
+        pets_of = {}
+        for pet_id, tutor_id in Pet.tutors.through.objects.filter(tutor__in=sample).values_list('pet_id', 'tutor_id'):
+            pets_of.setdefault(tutor_id, []).append(Pet(id=pet_id, business=business))
+
+        paths = {
+            'read': lambda tutor, cursor: feed_page(business, cursor, pets=pets_of.get(tutor.id, [])),
+            'timeline': lambda tutor, cursor: timeline_page(tutor, cursor),
+        }
+        self.stdout.write(f'\n📊 Feed reads, {len(sample)} tutors of {len(tutors)} (fan-out on read vs timeline)')
+        self.stdout.write(f'{"path":>10} {"page":>5} {"queries":>8} {"mean ms":>9} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8}')
+        for name, read in paths.items():
+            for page in (1, options['depth']):
+                timings, queries = [], 0
+                for tutor in sample:
+                    cursor = None
+                    for _ in range(page - 1):
+                        cursor = read(tutor, cursor)[1]
+                        if cursor is None:
+                            break
+                    counter = QueryCounter()
+                    with connection.execute_wrapper(counter):
+                        started = timer.perf_counter()
+                        read(tutor, cursor)
+                        timings.append((timer.perf_counter() - started) * 1000)
+                    queries = max(queries, counter.count)
+                timings.sort()
+                self.stdout.write(
+                    f'{name:>10} {page:>5} {queries:>8} {statistics.fmean(timings):>9.2f} '
+                    f'{timings[len(timings) // 2]:>8.2f} {timings[int(len(timings) * 0.95)]:>8.2f} {timings[-1]:>8.2f}'
+                )
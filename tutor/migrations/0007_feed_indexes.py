@@ -0,0 +1,44 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_business(apps, schema_editor):
+    """Woofs take their pet's business; global woofs their author's (staff) business"""
+    Woof = apps.get_model('tutor', 'Woof')
+    GlobalWoof = apps.get_model('tutor', 'GlobalWoof')
+    Pet = apps.get_model('pets', 'Pet')
+    Staff = apps.get_model('pets', 'Staff')
+    Woof.objects.filter(business__isnull=True).update(
+        business=Subquery(Pet.objects.filter(pk=OuterRef('pet_id')).values('business_id')[:1])
+    )
+    GlobalWoof.objects.filter(business__isnull=True).update(
+        business=Subquery(Staff.objects.filter(user_id=OuterRef('staff_id')).values('business_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('tutor', '0006_globalwoof_business_woof_business'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_business, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='globalwoof',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='globalwoof_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='woof',
+            index=models.Index(condition=models.Q(('parent_woof__isnull', True)), fields=['business', 'created_at', 'id'], name='woof_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='woof',
+            index=models.Index(condition=models.Q(('parent_woof__isnull', True)), fields=['pet', 'created_at', 'id'], name='woof_pet_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('tutor', '0007_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('kind', models.CharField(choices=[('pet', 'Pet woof'), ('global', 'Global woof')], max_length=10)),
+                ('global_woof', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tutor.globalwoof')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='pets.tutor')),
+                ('woof', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tutor.woof')),
+            ],
+            options={
+                'verbose_name_plural': 'Timeline entries',
+                'indexes': [models.Index(fields=['tutor', 'created_at', 'kind', 'woof', 'global_woof'], name='timeline_read_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tutor', 'woof'), name='timeline_unique_woof'), models.UniqueConstraint(fields=('tutor', 'global_woof'), name='timeline_unique_global')],
+            },
+        ),
+    ]
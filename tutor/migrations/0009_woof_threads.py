@@ -0,0 +1,55 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def thread_replies(apps, schema_editor):
+    """Root and depth of existing replies, one level at a time, then every woof's reply count"""
+    Woof = apps.get_model('tutor', 'Woof')
+    parent = Woof.objects.filter(pk=OuterRef('parent_woof_id'))
+    level = Woof.objects.filter(parent_woof__isnull=False, parent_woof__parent_woof__isnull=True)
+    depth = 1
+    while level.update(root=Subquery(parent.values(root_or_self=Coalesce('root_id', 'id'))[:1]), depth=depth):
+        # Replies to the level just placed: only placed replies have a depth above 0
+        level = Woof.objects.filter(parent_woof__depth=depth)
+        depth += 1
+    replies = Woof.objects.filter(parent_woof=OuterRef('pk')).order_by().values('parent_woof').annotate(n=Count('pk')).values('n')
+    Woof.objects.filter(pk__in=Woof.objects.filter(parent_woof__isnull=False).values('parent_woof')).update(
+        reply_count=Subquery(replies[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_remove_business_user_staff'),
+        ('tutor', '0008_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woof',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='woof',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='woof',
+            name='root',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tutor.woof'),
+        ),
+        migrations.AddIndex(
+            model_name='woof',
+            index=models.Index(condition=models.Q(('root__isnull', False)), fields=['root', 'created_at', 'id'], name='woof_thread_idx'),
+        ),
+        migrations.RunPython(thread_replies, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
-from django.db import models
-from pets.models import Pet, Business
+from django.db import connections, models
+from pets.models import Business, Pet, Tutor
 
 # Create your models here.
 class PetPhoto(models.Model):
@@ -23,6 +23,34 @@ class Woof(models.Model):
         ('private', 'Private (to pet tutor)')
     )
     visibility = models.CharField(max_length=10, choices=VISIBILITY_CHOICES, default='public')
+    # Threads (tutor.threads): a reply's top-level woof and how deep it sits under
+    # it, and every woof's number of direct replies
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='+', db_index=False)
+    depth = models.PositiveSmallIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Feed keyset scans (tutor.feed): newest top-level woofs of a business or of one pet
+            models.Index(fields=['business', 'created_at', 'id'], condition=models.Q(parent_woof__isnull=True), name='woof_feed_idx'),
+            models.Index(fields=['pet', 'created_at', 'id'], condition=models.Q(parent_woof__isnull=True), name='woof_pet_feed_idx'),
+            # Whole threads of a page of woofs, in posting order (tutor.threads)
+            models.Index(fields=['root', 'created_at', 'id'], condition=models.Q(root__isnull=False), name='woof_thread_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # The feed is read by business, so every woof carries its pet's
+        if self.business_id is None and self.pet_id is not None:
+            self.business_id = self.pet.business_id
+        reply = self._state.adding and self.parent_woof_id is not None
+        if reply:
+            parent = self.parent_woof
+            self.root_id = parent.root_id or parent.id
+            self.depth = parent.depth + 1
+        super().save(*args, **kwargs)
+        if reply:
+            # Removed again by tutor.signals when the reply is deleted
+            Woof.objects.filter(pk=self.parent_woof_id).update(reply_count=models.F('reply_count') + 1)
 
 class WoofLog(models.Model):
     woof = models.ForeignKey(Woof, on_delete=models.CASCADE)
@@ -37,3 +65,107 @@ class GlobalWoof(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     staff = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     attachment = models.FileField(upload_to='woof_attachments/', null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'created_at', 'id'], name='globalwoof_feed_idx'),
+        ]
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+    def fan_out_woof(self, woof):
+        """A new top-level woof goes to every tutor of its pet in the woof's business"""
+        tutor_ids = Pet.tutors.through.objects.filter(
+            pet_id=woof.pet_id, tutor__business_id=woof.business_id,
+        ).values_list('tutor_id', flat=True)
+        self.bulk_create(
+            [TimelineEntry(tutor_id=tutor_id, created_at=woof.created_at, kind='pet', woof=woof) for tutor_id in tutor_ids],
+            ignore_conflicts=True,
+        )
+    
+    def fan_out_global(self, global_woof):
+        """A new global woof goes to every tutor of the business, in one INSERT ... SELECT"""
+        self._insert_from(
+            Tutor.objects.filter(business_id=global_woof.business_id).annotate(
+                entry_created_at=models.Value(global_woof.created_at, output_field=models.DateTimeField()),
+                entry_kind=models.Value('global', output_field=models.CharField()),
+                entry_global_woof=models.Value(global_woof.id, output_field=models.IntegerField()),
+            ).values_list('id', 'entry_created_at', 'entry_kind', 'entry_global_woof'),
+            ('tutor', 'created_at', 'kind', 'global_woof'),
+        )
+    
+    def rebuild(self, tutor_ids):
+        """
+        Recompute these tutors' timelines from the woofs: the backfill, and the path
+        for changes that alter who sees what (a new tutor, pets changing tutors).
+        Returns the number of entries written.
+        """
+        tutor_ids = list(tutor_ids)
+        self.filter(tutor_id__in=tutor_ids).delete()
+        # Only pets of the tutor's own business, like the feed query it replaces
+        pets_of = {}
+        for pet_id, tutor_id in Pet.tutors.through.objects.filter(
+            tutor_id__in=tutor_ids, pet__business_id=models.F('tutor__business_id'),
+        ).values_list('pet_id', 'tutor_id'):
+            pets_of.setdefault(tutor_id, []).append(pet_id)
+        written = 0
+        # A statement per tutor: joined on the tutor list instead, SQLite (without
+        # ANALYZE statistics) probes the whole list for every woof it reads
+        for tutor_id, pet_ids in pets_of.items():
+            woofs = Woof.objects.filter(pet_id__in=pet_ids, parent_woof__isnull=True).annotate(
+                entry_tutor=models.Value(tutor_id, output_field=models.IntegerField()),
+                entry_kind=models.Value('pet', output_field=models.CharField()),
+            ).values_list('entry_tutor', 'created_at', 'entry_kind', 'id')
+            written += self._insert_from(woofs, ('tutor', 'created_at', 'kind', 'woof'))
+        global_woofs = GlobalWoof.objects.filter(business__tutors__in=tutor_ids).annotate(
+            entry_kind=models.Value('global', output_field=models.CharField()),
+        ).values_list('business__tutors', 'created_at', 'entry_kind', 'id')
+        return written + self._insert_from(global_woofs, ('tutor', 'created_at', 'kind', 'global_woof'))
+    
+    def _insert_from(self, rows, fields):
+        """
+        INSERT the rows of a values_list() queryset, column for column into `fields`,
+        as one statement: the rows never travel to Python. Returns the rows written.
+        """
+        connection = connections[self.db]
+        select, params = rows.query.get_compiler(self.db).as_sql()
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(self.model._meta.get_field(f).column) for f in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {table} ({columns}) {select}', params)
+            return cursor.rowcount
+
+
+class TimelineEntry(models.Model):
+    """
+    A tutor's feed, materialized on write: one row per top-level woof of the tutor's
+    pets and per global woof of the tutor's business, added when the woof is posted
+    (tutor.signals). Reading a page of it is one range scan of timeline_read_idx.
+    Bulk inserts skip the signals; `manage.py backfill_timelines` rebuilds.
+    """
+    KIND_CHOICES = [
+        ('pet', 'Pet woof'),
+        ('global', 'Global woof'),
+    ]
+    
+    tutor = models.ForeignKey('pets.Tutor', on_delete=models.CASCADE, related_name='timeline')
+    created_at = models.DateTimeField()  # The woof's, so the timeline sorts like the feed
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    woof = models.ForeignKey(Woof, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    global_woof = models.ForeignKey(GlobalWoof, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    
+    objects = TimelineEntryQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name_plural = "Timeline entries"
+        indexes = [
+            # Newest first per tutor, in the feed's (created_at, kind, id) order
+            models.Index(fields=['tutor', 'created_at', 'kind', 'woof', 'global_woof'], name='timeline_read_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['tutor', 'woof'], name='timeline_unique_woof'),
+            models.UniqueConstraint(fields=['tutor', 'global_woof'], name='timeline_unique_global'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tutor_id}: {self.kind} {self.woof_id or self.global_woof_id} at {self.created_at}"
@@ -0,0 +1,74 @@
+"""
+Domain counters for posted woofs (petcrm.metrics), reply counts of threads
+(tutor.threads), the fan-out of new woofs to tutor timelines (TimelineEntry) and
+invalidation of the cached feed pages (tutor.feed). Bulk inserts send no signals; rebuild those timelines with
+`manage.py backfill_timelines`.
+"""
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from petcrm import metrics
+from pets.models import Pet, Tutor
+from . import feed
+from .models import GlobalWoof, TimelineEntry, Woof
+
+
+def invalidate_feed(business_id):
+    # After commit: a page rebuilt before then would be cached under the new generation
+    if business_id is not None:
+        transaction.on_commit(lambda: feed.invalidate(business_id))
+
+
+@receiver(post_save, sender=Woof)
+@receiver(post_delete, sender=Woof)
+@receiver(post_save, sender=GlobalWoof)
+@receiver(post_delete, sender=GlobalWoof)
+def woof_changed(sender, instance, **kwargs):
+    invalidate_feed(instance.business_id)
+
+
+@receiver(post_save, sender=Woof)
+def count_woof(sender, instance, created, **kwargs):
+    if created:
+        metrics.inc('petcrm_woofs_created_total', business=instance.business_id or instance.pet.business_id)
+
+
+@receiver(post_delete, sender=Woof)
+def uncount_reply(sender, instance, **kwargs):
+    # Woof.save() counted the reply on its parent
+    if instance.parent_woof_id is not None:
+        Woof.objects.filter(pk=instance.parent_woof_id, reply_count__gt=0).update(reply_count=models.F('reply_count') - 1)
+
+
+@receiver(post_save, sender=Woof)
+def fan_out_woof(sender, instance, created, **kwargs):
+    if created and instance.parent_woof_id is None:
+        TimelineEntry.objects.fan_out_woof(instance)
+
+
+@receiver(post_save, sender=GlobalWoof)
+def fan_out_global_woof(sender, instance, created, **kwargs):
+    if created and instance.business_id is not None:
+        TimelineEntry.objects.fan_out_global(instance)
+
+
+@receiver(post_save, sender=Tutor)
+def start_timeline(sender, instance, created, **kwargs):
+    # A new tutor sees the business's earlier global woofs too
+    if created:
+        TimelineEntry.objects.rebuild([instance.id])
+
+
+@receiver(m2m_changed, sender=Pet.tutors.through)
+def rebuild_pet_timelines(sender, instance, action, reverse, pk_set, **kwargs):
+    """Pets gaining or losing tutors change which woofs those tutors see"""
+    if action == 'pre_clear':
+        # pk_set is None for clear(): remember who is about to lose the pet(s)
+        instance._timeline_tutor_ids = [instance.id] if reverse else list(instance.tutors.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            tutor_ids = getattr(instance, '_timeline_tutor_ids', [])
+        else:
+            tutor_ids = [instance.id] if reverse else pk_set
+        TimelineEntry.objects.rebuild(tutor_ids)
+        invalidate_feed(instance.business_id)
@@ -1,3 +1,112 @@
-from django.test import TestCase
+import json
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from testing.perf import SIZES, PerfTestCase
+from reservations.models import DailyOccupancy, ServiceBooking, SlotTemplate
+from tutor import feed
 
-# Create your tests here.
+
+class TutorViewPerformanceTests(PerfTestCase):
+    """Query budgets and latency baselines for the tutor views at every tenant size"""
+
+    def client_for(self, tenant):
+        client = Client()
+        client.force_login(tenant.tutor_user)
+        return client
+
+    def test_dashboard(self):
+        """Feed built from the timeline (as after every woof), then from the page cache"""
+        counts, cached = {}, {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            response, counts[size] = self.measure(
+                'tutor:dashboard', size, lambda: client.get(reverse('tutor:dashboard')),
+                before=lambda: feed.invalidate(tenant.business.id),
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['pets']), SIZES[size]['pets_per_tutor'])
+            _, cached[size] = self.measure('tutor:dashboard:cached', size, lambda: client.get(reverse('tutor:dashboard')))
+        self.assertQueryBudget('tutor:dashboard', counts, 14)
+        self.assertQueryBudget('tutor:dashboard:cached', cached, 10)
+
+    def test_dashboard_get_is_read_only(self):
+        """Not even a business without templates gets them seeded by a page view"""
+        tenant = self.tenants['small']
+        SlotTemplate.objects.filter(business=tenant.business).delete()
+        client = self.client_for(tenant)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('tutor:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q['sql'] for q in queries if not q['sql'].startswith('SELECT')], [])
+        self.assertFalse(SlotTemplate.objects.filter(business=tenant.business).exists())
+
+    def test_pet_sheet(self):
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            url = reverse('tutor:pet_sheet', args=[tenant.pets[0].id])
+            response, counts[size] = self.measure('tutor:pet_sheet', size, lambda: client.get(url))
+            self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget('tutor:pet_sheet', counts, 8)
+
+    def test_availability(self):
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            response, counts[size] = self.measure('tutor:availability', size, lambda: client.get(reverse('tutor:availability')))
+            self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget('tutor:availability', counts, 10)
+
+    def test_booking_post(self):
+        """Two slots per request, so the batched multi-slot path is what's budgeted"""
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            slots, posted = iter(tenant.booking_slots), []
+
+            def book():
+                posted.extend([next(slots), next(slots)])
+                return client.post(reverse('tutor:dashboard'), {
+                    'action': 'book_service',
+                    'pet_id': tenant.pets[0].id,
+                    'selected_slots': json.dumps([slot.id for slot in posted[-2:]]),
+                })
+
+            response, counts[size] = self.measure('tutor:book_service', size, book)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(
+                ServiceBooking.objects.filter(pet=tenant.pets[0], slot__in=tenant.booking_slots).count(),
+                len(posted),
+            )
+        self.assertQueryBudget('tutor:book_service', counts, 22)
+
+    def test_booking_post_many_slots(self):
+        """Booking many slots on days without a rollup row costs the queries of booking one"""
+        counts = {}
+        for size, tenant in self.tenants.items():
+            client = self.client_for(tenant)
+            warm, first, *rest = tenant.booking_slots
+
+            def book(pet, slots):
+                return lambda: client.post(reverse('tutor:dashboard'), {
+                    'action': 'book_service',
+                    'pet_id': pet.id,
+                    'selected_slots': json.dumps([slot.id for slot in slots]),
+                })
+
+            book(tenant.pets[0], [warm])()
+            _, one = self.measure('tutor:book_service:one', size, book(tenant.pets[1], [first]), warm=False)
+            response, counts[size] = self.measure('tutor:book_service:many', size, book(tenant.pets[1], rest), warm=False)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(counts[size], one)
+            self.assertEqual(
+                ServiceBooking.objects.filter(pet=tenant.pets[1], slot__in=tenant.booking_slots).count(),
+                len(rest) + 1,
+            )
+            self.assertEqual(
+                DailyOccupancy.objects.filter(business=tenant.business, date__in=[s.date for s in rest]).count(),
+                len(rest),
+            )
+        self.assertQueryBudget('tutor:book_service:many', counts, 22)
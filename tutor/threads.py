@@ -0,0 +1,40 @@
+"""
+Reply threads. A reply stores the top-level woof of its thread (Woof.root) and how
+deep it sits under it (Woof.depth); every woof counts its direct replies
+(Woof.reply_count). Woof.save() and tutor.signals keep the three up to date.
+
+The replies under a page of woofs are then one query on woof_thread_idx, and none
+at all when no woof of the page has replies. The trees are assembled in memory.
+"""
+from .models import Woof
+
+
+def attach_threads(woofs):
+    """
+    Give every top-level woof in `woofs` a `.thread`: all of its replies in reading
+    order (each reply followed by the replies to it, oldest first), and every reply
+    its `.replies` (direct replies). One query, O(n) in the number of replies.
+    """
+    roots = {woof.id: woof for woof in woofs}
+    for woof in roots.values():
+        woof.thread, woof.replies = [], []
+    answered = [woof.id for woof in roots.values() if woof.reply_count]
+    if not answered:
+        return
+    replies = Woof.objects.filter(root_id__in=answered).select_related('staff', 'tutor').order_by('created_at', 'id')
+    nodes = dict(roots)
+    for reply in replies:
+        reply.replies = []
+        nodes[reply.id] = reply
+    for reply in replies:
+        parent = nodes.get(reply.parent_woof_id)
+        if parent is not None:
+            parent.replies.append(reply)
+    for root_id in answered:
+        root = roots[root_id]
+        # Depth first, without recursion: threads can be arbitrarily deep
+        stack = root.replies[::-1]
+        while stack:
+            reply = stack.pop()
+            root.thread.append(reply)
+            stack.extend(reply.replies[::-1])
@@ -5,6 +5,7 @@ app_name = 'tutor'
 
 urlpatterns = [
     path('', views.tutor_dashboard, name='dashboard'),
+    path('availability/', views.tutor_availability, name='availability'),
     path('profile/', views.tutor_profile, name='profile'),
     path('pet/<int:pet_id>/', views.tutor_pet_sheet, name='pet_sheet'),
 ]
\ No newline at end of file
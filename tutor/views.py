@@ -1,12 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+import hashlib
 from django.core import serializers
 import json
 from pets.models import Tutor, Pet, TrainingProgress
-from reservations.models import CheckIn, TutorSchedule, Service, ServiceSlot, ServiceBooking
-from reservations.utils import ensure_service_slots_exist
+from reservations.models import CheckIn, TutorSchedule, Service, ServiceSlot, ServiceBooking, WaitlistEntry, AvailabilityVersion
+from reservations.schedule import get_schedule
+from reservations.availability import get_service_slots
+from reservations.booking import book_slots
+from .feed import cached_fragment, page_key, timeline_page
 from .models import Woof, GlobalWoof
 from pets.models import Business
 from datetime import datetime, timedelta
@@ -27,61 +31,15 @@ def tutor_dashboard(request):
     # Get tutor's business
     business = tutor.business
     
-    # Automatically ensure service slots exist for next 30 days (business-scoped)
-    ensure_service_slots_exist(business=business)
-    
-    pets = tutor.pets.all()
+    # tutor.pets only yields this tutor's pets; the business still has to match
+    pets = list(tutor.pets.all())
     
     # SECURITY: Verify all pets belong to this tutor and business
     for pet in pets:
-        if tutor not in pet.tutors.all() or pet.business != business:
+        if pet.business_id != business.id:
             messages.error(request, 'Security error: Pet access denied.')
             return redirect('home:index')
     
-    # MATCH STAFF LOGIC - create pet_checkins dict
-    pet_checkins = {}
-    for pet in pets:
-        checkins = CheckIn.objects.filter(pet=pet).order_by('-checkin_time')
-        pet_checkins[pet.id] = checkins.first() if checkins.exists() else None
-    
-    # Build unified feed: pet woofs + global woofs (business-scoped only!)
-    # Pet woofs: only for this tutor's pets
-    pet_woofs = Woof.objects.filter(
-        business=business,
-        pet__in=pets, 
-        parent_woof__isnull=True
-    ).filter(
-        Q(visibility='public') | Q(visibility='private')
-    )
-    
-    # Global woofs: only for this business!
-    global_woofs = GlobalWoof.objects.filter(business=business)
-    feed = []
-    for w in pet_woofs:
-        feed.append({
-            'kind': 'pet',
-            'label': w.pet.name,
-            'created_at': w.created_at,
-            'message': w.message,
-            'attachment': w.attachment,
-            'author_staff': w.staff,
-            'author_tutor': w.tutor,
-            'woof': w,
-        })
-    for gw in global_woofs:
-        feed.append({
-            'kind': 'business',
-            'label': 'BUSINESS',
-            'created_at': gw.created_at,
-            'message': gw.message,
-            'attachment': gw.attachment,
-            'author_staff': gw.staff,
-            'author_tutor': None,
-            'global': gw,
-            'woof': None,
-        })
-    feed.sort(key=lambda x: x['created_at'], reverse=True)
-
     # Tutor replies
     if request.method == 'POST' and request.POST.get('action') == 'woof_reply_tutor':
         parent_id = request.POST.get('parent_woof_id')
@@ -146,70 +104,53 @@ def tutor_dashboard(request):
                 messages.error(request, 'Please select at least one time slot.')
                 return redirect('tutor:dashboard')
             
-            pet = Pet.objects.get(id=pet_id)
-            
-            # SECURITY: Verify pet belongs to this tutor AND this business
-            if pet not in pets or pet.business != business:
+            # SECURITY: Only pets of this tutor AND this business can be booked
+            pet = Pet.objects.filter(id=pet_id, business=business, tutors=tutor).first()
+            if pet is None:
                 messages.error(request, 'Pet access denied or pet not in your business.')
                 return redirect('tutor:dashboard')
             
-            booked_count = 0
-            failed_slots = []
-            
-            for slot_id in slot_ids:
-                try:
-                    slot = ServiceSlot.objects.get(id=slot_id)
-                    
-                    # SECURITY: Verify slot belongs to this business!
-                    if slot.business != business:
-                        failed_slots.append(f'{slot.start_time} - {slot.end_time} (business mismatch)')
-                        continue
-                    
-                    if slot.is_fully_booked():
-                        failed_slots.append(f'{slot.start_time} - {slot.end_time}')
-                        continue
-                    
-                    # Check if already booked
-                    existing = ServiceBooking.objects.filter(slot=slot, pet=pet, status__in=['pending', 'confirmed']).exists()
-                    if existing:
-                        failed_slots.append(f'{slot.start_time} - {slot.end_time}')
-                        continue
-                    
-                    ServiceBooking.objects.create(
-                        slot=slot,
-                        pet=pet,
-                        tutor=tutor,
-                        notes=notes,
-                        status='pending'
-                    )
-                    booked_count += 1
-                except ServiceSlot.DoesNotExist:
-                    failed_slots.append('Unknown slot')
+            # Template slots get their ServiceSlot row only now, when booked
+            booked_count, failed_slots, waitlisted = book_slots(business, tutor, pet, slot_ids, notes)
             
             if booked_count > 0:
                 msg = f'✅ Booking request sent for {pet.name} ({booked_count} slot{"s" if booked_count != 1 else ""})! Staff will confirm shortly.'
                 messages.success(request, msg)
             
+            if waitlisted:
+                msg = f'⏳ {pet.name} joined the waitlist for: {", ".join(waitlisted)}. You will be booked automatically if a spot frees up.'
+                messages.info(request, msg)
+            
             if failed_slots:
                 msg = f'⚠️ Could not book: {", ".join(failed_slots)} (already booked or full)'
                 messages.warning(request, msg)
             
             return redirect('tutor:dashboard')
-        except (Pet.DoesNotExist, json.JSONDecodeError):
+        except (ValueError, TypeError):
             messages.error(request, 'Invalid request data.')
             return redirect('tutor:dashboard')
     
+    # MATCH STAFF LOGIC - create pet_checkins dict
+    # CheckIn is one row per pet, so a single query covers all of them
+    pet_checkins = {pet.id: None for pet in pets}
+    pet_checkins.update((c.pet_id, c) for c in CheckIn.objects.filter(pet__in=pets))
+    
+    # Unified feed, business-scoped: woofs of this tutor's pets + the business's global
+    # woofs, one keyset page of the tutor's materialized timeline (tutor.feed), rendered
+    # once per write to the business
+    feed_cursor = page_key(request.GET.get('feed_cursor'))
+    feed_html = cached_fragment(
+        request, business.id, f'tutor-{tutor.id}', feed_cursor, 'tutor/_feed_page.html',
+        lambda: _feed_page(tutor, feed_cursor),
+    )
+
     # Get available service slots for next 30 days (business-scoped)
     today = datetime.now().date()
     next_30_days = [today + timedelta(days=i) for i in range(30)]
     
-    # Get all available service slots for this business only
-    available_slots = ServiceSlot.objects.filter(
-        business=business,
-        date__gte=today,
-        date__lte=today + timedelta(days=29),
-        is_available=True
-    ).select_related('service').order_by('date', 'start_time')
+    # Get all available service slots for this business only: template slots
+    # computed on the fly plus concrete rows (booked or edited by staff)
+    available_slots = get_service_slots(business, today, today + timedelta(days=29))
     
     # Group slots by date
     slots_by_date = {}
@@ -222,10 +163,16 @@ def tutor_dashboard(request):
     tutor_bookings = ServiceBooking.objects.filter(
         tutor=tutor,
         slot__date__gte=today
-    ).select_related('slot', 'pet')
+    ).select_related('slot__service', 'pet')
     
     bookings_by_slot = {b.slot_id: b for b in tutor_bookings}
     
+    # Tutor's waitlist entries with their current place in each queue
+    waitlist_entries = WaitlistEntry.objects.filter(
+        tutor=tutor,
+        slot__date__gte=today
+    ).with_positions().select_related('slot__service', 'pet').order_by('slot__date', 'slot__start_time')
+    
     # Convert slots to JSON for JavaScript calendar
     slots_json = {}
     for date_obj, slots_list in slots_by_date.items():
@@ -264,17 +211,139 @@ def tutor_dashboard(request):
     return render(request, 'tutor/dashboard_new.html', {
         'tutor': tutor,
         'pets': pets,
-        'feed': feed,
+        'feed_html': feed_html,
         'pet_checkins': pet_checkins,
         'business': business,
         'slots_by_date': slots_by_date,
         'next_30_days': next_30_days,
         'today': today,
         'bookings_by_slot': bookings_by_slot,
+        'waitlist_entries': waitlist_entries,
         'slots_json': slots_json_str,
         'bookings_json': bookings_json_str,
     })
 
+
+def _feed_page(tutor, cursor):
+    entries, feed_next_cursor = timeline_page(tutor, cursor or None)
+    feed = []
+    for entry in entries:
+        if entry.kind == 'pet':
+            w = entry.obj
+            feed.append({
+                'kind': 'pet',
+                'label': w.pet.name,
+                'created_at': w.created_at,
+                'message': w.message,
+                'attachment': w.attachment,
+                'author_staff': w.staff,
+                'author_tutor': w.tutor,
+                'woof': w,
+            })
+        else:
+            gw = entry.obj
+            feed.append({
+                'kind': 'business',
+                'label': 'BUSINESS',
+                'created_at': gw.created_at,
+                'message': gw.message,
+                'attachment': gw.attachment,
+                'author_staff': gw.staff,
+                'author_tutor': None,
+                'global': gw,
+                'woof': None,
+            })
+    return {'business': tutor.business, 'feed': feed, 'feed_next_cursor': feed_next_cursor}
+
+
+AVAILABILITY_MAX_DAYS = 62
+
+
+def tutor_availability(request):
+    """
+    Calendar data as compact columnar JSON for a from/to window (default: next 30 days).
+
+    Each column is a list indexed by row; dates are day offsets from `from` and
+    services are indexes into `services`. The strong ETag is derived from the business
+    availability version and schedule version, so polling clients get 304 Not Modified
+    until a slot or booking actually changes.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    if hasattr(request.user, 'tutor_profile') and request.user.tutor_profile:
+        tutor = request.user.tutor_profile
+    else:
+        return JsonResponse({'error': 'Not authorized.'}, status=403)
+    business = tutor.business
+    
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') else today
+        end = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else start + timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD.'}, status=400)
+    if end < start or (end - start).days >= AVAILABILITY_MAX_DAYS:
+        return JsonResponse({'error': f'Window must be 1-{AVAILABILITY_MAX_DAYS} days.'}, status=400)
+    
+    schedule = get_schedule(business)
+    version = AvailabilityVersion.current(business.id)
+    etag = quote_etag(hashlib.sha1(
+        f'{business.id}:{version}:{schedule.version}:{tutor.id}:{start}:{end}'.encode()
+    ).hexdigest())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    slots = get_service_slots(business, start, end)
+    bookings = ServiceBooking.objects.filter(
+        tutor=tutor,
+        slot__date__gte=start,
+        slot__date__lte=end,
+    ).select_related('slot__service', 'pet').order_by('slot__date', 'slot__start_time')
+    
+    services = []
+    service_index = {}
+    def service_idx(service_type):
+        if service_type not in service_index:
+            service_index[service_type] = len(services)
+            services.append(service_type)
+        return service_index[service_type]
+    
+    slot_cols = {'id': [], 'day': [], 'service': [], 'start': [], 'end': [], 'available': [], 'full': []}
+    for slot in slots:
+        slot_cols['id'].append(slot.id)
+        slot_cols['day'].append((slot.date - start).days)
+        slot_cols['service'].append(service_idx(slot.service.type))
+        slot_cols['start'].append(slot.start_time.strftime('%H:%M'))
+        slot_cols['end'].append(slot.end_time.strftime('%H:%M'))
+        slot_cols['available'].append(slot.available_spots())
+        slot_cols['full'].append(int(slot.is_fully_booked()))
+    
+    booking_cols = {'id': [], 'slot_id': [], 'day': [], 'status': [], 'pet': [], 'service': [], 'start': [], 'end': [], 'requested_at': []}
+    for booking in bookings:
+        booking_cols['id'].append(booking.id)
+        booking_cols['slot_id'].append(booking.slot_id)
+        booking_cols['day'].append((booking.slot.date - start).days)
+        booking_cols['status'].append(booking.status)
+        booking_cols['pet'].append(booking.pet.name)
+        booking_cols['service'].append(service_idx(booking.slot.service.type))
+        booking_cols['start'].append(booking.slot.start_time.strftime('%H:%M'))
+        booking_cols['end'].append(booking.slot.end_time.strftime('%H:%M'))
+        booking_cols['requested_at'].append(booking.requested_at.isoformat())
+    
+    response = JsonResponse({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'services': services,
+        'slots': slot_cols,
+        'bookings': booking_cols,
+    })
+    response['ETag'] = etag
+    # Let the browser keep the body but revalidate every time
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 def tutor_profile(request):
     """Tutor profile view - requires authentication"""
     if not request.user.is_authenticated: